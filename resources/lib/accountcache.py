@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import calendar
+import json
+import os
+import time
+from typing import Dict, Optional
+
+# the payloads are dropped this long before the CMS signature in them expires, so requests never go out with a
+# signature that runs out on the way
+CMS_EXPIRY_MARGIN = 15 * 60  # seconds
+# validity of payloads without a CMS expiry
+DEFAULT_MAX_AGE = 12 * 60 * 60  # seconds
+
+
+def get_cms_expiry(index: Dict) -> Optional[float]:
+    """ expiry of the CMS policy in an index payload, as unix time """
+
+    expires = (index.get("cms") or {}).get("expires")
+    if not isinstance(expires, str):
+        return None
+
+    try:
+        return calendar.timegm(time.strptime(expires[:19], "%Y-%m-%dT%H:%M:%S"))
+    except ValueError:
+        return None
+
+
+class AccountPayloadCache:
+    """ Index and profile payloads of the session, reused across token refreshes
+
+    They rarely change, apart from the CMS signature in the index, so they are kept until shortly before that
+    expires. Entries are per account and profile, a profile switch never sees the payloads of another profile. The
+    file is read on every lookup, as other plugin processes refresh the session, too.
+    """
+
+    def __init__(self, storage_file: str):
+        self.storage_file: str = storage_file
+
+    def get(self, account_id: Optional[str], profile_id: Optional[str], now: float) -> Optional[Dict[str, Dict]]:
+        """ the payloads stored for account_id / profile_id, if still valid at now (server time) """
+
+        if not account_id:
+            return None
+
+        data = self._read()
+        if data.get("account_id") != account_id or data.get("profile_id") != profile_id:
+            return None
+        if now >= data.get("valid_until", 0):
+            return None
+
+        return data.get("payloads")
+
+    def store(self, account_id: Optional[str], profile_id: Optional[str], payloads: Dict[str, Dict], now: float) -> None:
+        if not account_id:
+            return
+
+        cms_expiry = get_cms_expiry(payloads.get("index", {}))
+        valid_until = cms_expiry - CMS_EXPIRY_MARGIN if cms_expiry else now + DEFAULT_MAX_AGE
+
+        self._write({
+            "account_id": account_id,
+            "profile_id": profile_id,
+            "valid_until": valid_until,
+            "payloads": payloads,
+        })
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.storage_file)
+        except OSError:
+            pass
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.storage_file, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data: Dict) -> None:
+        from .utils import crunchy_log, write_file_atomic
+
+        try:
+            write_file_atomic(self.storage_file, json.dumps(data))
+        except OSError as e:
+            crunchy_log(f"AccountPayloadCache: failed to save: {e}")
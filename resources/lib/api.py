@@ -16,9 +16,18 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+import codecs
+import contextvars
+import os
+import re
+import ssl
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime
-from typing import Optional, Dict
+from typing import Awaitable, Callable, Optional, Dict
+from urllib.parse import urlsplit
 
 import requests
 import xbmc
@@ -26,10 +35,50 @@ import xbmcgui
 from requests import HTTPError, Response
 
 from . import utils
+from .accountcache import AccountPayloadCache
+from .asynchttp import AsyncHTTPClient, is_cloudflare_challenge
+from .cancellation import RequestCancelled, get_cancel_token, shield_from_cancellation
+from .clockskew import ClockSkew
+from .deadline import ROUTE_LISTING, ROUTE_PLAYBACK, DeadlineExceeded, get_deadline
+from .dnscache import DNSCache
+from .executor import run_in_executor
+from .filelock import FileLock
 from .globals import G
-from .model import AccountData, CrunchyrollError, LoginError, ProfileData
+from .httpcache import CacheLookup, ResponseCache
+from .model import AccountData, Cacheable, CrunchyrollError, LoginError, ProfileData
+from .preconnect import Preconnector
+from .profilevault import ProfileVault
+from .ratelimit import RateLimiter
+from .resilience import CircuitOpenError, HostHealth, IDEMPOTENT_METHODS, MAX_RETRIES, get_retry_delay, is_retryable_status
+from .scheduler import RequestScheduler, get_request_priority
+from .singleflight import SingleFlight, make_request_key
+from .tlssession import ResumingHTTPAdapter, TLSSessionStore, create_ssl_context
+from .tokenrefresh import REFRESH_AHEAD, REFRESH_WAIT, TokenRefresher
 from ..modules import cloudscraper
 
+# use a faster JSON decoder if one is installed
+try:
+    from orjson import loads as _json_loads
+
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        from ujson import loads as _json_loads
+
+        JSON_BACKEND = "ujson"
+    except ImportError:
+        from json import loads as _json_loads
+
+        JSON_BACKEND = "json"
+
+# first non-whitespace byte of a response body, without copying the body
+_FIRST_CHAR = re.compile(rb"\s*(\S)")
+# path segments that are ids (e.g. GRMG8ZQZR, account uuids) or comma separated id lists
+_ID_SEGMENT = re.compile(r"/(?=[^/]*\d)[A-Za-z0-9_\-]{8,}(?:,[A-Za-z0-9_\-]+)*(?=/|$)")
+
+_decode_stats: Dict[str, Dict] = {}
+_decode_stats_lock = threading.Lock()
+
 
 class API:
     """Api documentation
@@ -56,6 +105,8 @@ class API:
     TOKEN_ENDPOINT_BETA = "https://beta-api.crunchyroll.com/auth/v1/token"
     DEVICE_CODE_ENDPOINT = "https://www.crunchyroll.com/auth/v1/device/code"
     DEVICE_TOKEN_ENDPOINT = "https://www.crunchyroll.com/auth/v1/device/token"
+    # upper bound for auth requests, the deadline of the invocation may cut it shorter
+    AUTH_TIMEOUT = 30
     SEARCH_ENDPOINT = "https://beta-api.crunchyroll.com/content/v1/search"
     STREAMS_ENDPOINT = "https://beta-api.crunchyroll.com/cms/v2{}/videos/{}/streams"
     STREAMS_ENDPOINT_DRM = "https://cr-play-service.prd.crunchyrollsvc.com/v1/{}/android/phone/play"
@@ -101,6 +152,42 @@ class API:
 
     LICENSE_ENDPOINT = "https://cr-license-proxy.prd.crunchyrollsvc.com/v1/license/widevine"
 
+    # content endpoints whose responses are cached on disk, with their TTL in seconds (see httpcache.py)
+    HTTP_CACHE_RULES = [
+        (r"https://beta-api\.crunchyroll\.com/cms/v2/.+/(seasons|episodes)$", 15 * 60),
+        (r"https://beta-api\.crunchyroll\.com/content/v2/cms/objects/", 15 * 60),
+        (r"https://beta-api\.crunchyroll\.com/content/v1/tenant_categories$", 24 * 60 * 60),
+        (r"https://beta-api\.crunchyroll\.com/content/v2/discover/seasonal_tags$", 24 * 60 * 60),
+    ]
+
+    # client side rate limits per endpoint family: (family, url pattern, requests per second, burst), see ratelimit.py
+    RATE_LIMITS = [
+        ("playheads", r"^https://[^/]+/content/v2/[^/]+/(playheads|watch-history)", 5, 10),
+        ("streams", r"^https://(cr-play-service\.prd\.crunchyrollsvc\.com/|[^/]+/playback/|[^/]+/cms/v2/.+/streams$)", 2, 4),
+        ("static", r"^https://(static|imgsrv)\.crunchyroll\.com/", 20, 40),
+        ("content", r"^https://(beta-api|www)\.crunchyroll\.com/(content|cms|index|accounts)/", 10, 20),
+    ]
+
+    # endpoints served by both API hosts. GETs to them are hedged, see _send_hedged_async()
+    HEDGE_HOSTS = {
+        "www.crunchyroll.com": "beta-api.crunchyroll.com",
+        "beta-api.crunchyroll.com": "www.crunchyroll.com",
+    }
+    HEDGE_PATHS = [
+        r"^/content/v2/[^/]+/playheads$",
+        r"^/content/v2/[^/]+/watchlist$",
+    ]
+
+    # hosts a route sends its first requests to, connected to speculatively on startup (see preconnect())
+    PRECONNECT_URLS = {
+        ROUTE_LISTING: ["https://beta-api.crunchyroll.com/"],
+        ROUTE_PLAYBACK: ["https://cr-play-service.prd.crunchyrollsvc.com/"],
+    }
+    # same, for hosts requested through the pooled CloudScraper of an auth type (see get_scraper())
+    PRECONNECT_SCRAPER_URLS = {
+        ROUTE_PLAYBACK: [("https://www.crunchyroll.com/", "device")],
+    }
+
     PROFILES_LIST_ENDPOINT = "https://beta-api.crunchyroll.com/accounts/v1/me/multiprofile"
     STATIC_IMG_PROFILE = "https://static.crunchyroll.com/assets/avatar/170x170/"
     STATIC_WALLPAPER_PROFILE = "https://static.crunchyroll.com/assets/wallpaper/720x180/"
@@ -109,16 +196,142 @@ class API:
             self,
             locale: str = "en-US"
     ) -> None:
-        self.http = requests.Session()
+        # one requests session per thread, as sessions are not guaranteed to be thread-safe (see executor.py)
+        self._local = threading.local()
+        # shared TLS context resuming sessions across connections, set up in start() if enabled (see tlssession.py)
+        self.tls_sessions: Optional[TLSSessionStore] = None
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        self._local.http = self._create_http_session()
         self.locale: str = locale
         self.account_data: AccountData = AccountData(dict())
         self.profile_data: ProfileData = ProfileData(dict())
         self.api_headers: Dict = default_request_headers()
         self.refresh_attempts = 0
+        # held while the refresh token is used or the session file written. the token rotates on every use, so only
+        # one refresh may run at a time, across threads and plugin processes (file set in start()). whoever waited
+        # for the lock picks up the new token instead of refreshing again.
+        self._refresh_lock: FileLock = FileLock()
+        # index and profile payloads kept across token refreshes, set up in start() (see accountcache.py)
+        self.account_payloads: Optional[AccountPayloadCache] = None
+        # sessions of recently used profiles, for switching back without a round trip (see profilevault.py)
+        self.profile_vault: Optional[ProfileVault] = None
+        # server time, which the expiry of tokens is relative to, seeded from the session (see clockskew.py)
+        self.clock_skew: ClockSkew = ClockSkew()
+        # renews the access token before it expires, off the request path
+        self.token_refresher: TokenRefresher = TokenRefresher(
+            self._refresh_ahead_of_expiry, self.get_token_lifetime_left
+        )
+        # long-lived CloudScraper sessions, keyed by auth type (see get_scraper)
+        self._scrapers: Dict = {}
+        self._scrapers_lock = threading.Lock()
+        self._async_client: Optional[AsyncHTTPClient] = None
+        # on-disk cache for content endpoints, set up in start() once the profile dir is known
+        self.http_cache: Optional[ResponseCache] = None
+        # identical requests in flight share one call, across worker threads and event loops
+        self.inflight: SingleFlight = SingleFlight()
+        # latency / error tracking per host, persisted in start() / close()
+        self.host_health: HostHealth = HostHealth()
+        # connections opened speculatively while the invocation starts up
+        self.preconnector: Preconnector = Preconnector()
+        # foreground requests never queue behind enrichment or background work
+        self.scheduler: RequestScheduler = RequestScheduler()
+        # requests queue here instead of running into 429s
+        self.rate_limiter: RateLimiter = RateLimiter(self.RATE_LIMITS)
+        # set up in _init_transport()
+        self.dns_cache: Optional[DNSCache] = None
+
+    @property
+    def http(self) -> requests.Session:
+        """ HTTP session of the calling thread """
+        session = getattr(self._local, 'http', None)
+        if session is None:
+            session = self._create_http_session()
+            self._local.http = session
+        return session
+
+    def _create_http_session(self) -> requests.Session:
+        session = requests.Session()
+        if self._ssl_context is not None:
+            session.mount("https://", ResumingHTTPAdapter(self._ssl_context))
+        return session
+
+    def _init_transport(self) -> None:
+        """ set up the transport state kept in the profile dir, once """
+
+        if self.http_cache is not None:
+            return
+
+        self.http_cache = ResponseCache(
+            os.path.join(Cacheable.get_storage_path(), "http_cache"),
+            self.HTTP_CACHE_RULES
+        )
+        self.host_health = HostHealth(os.path.join(Cacheable.get_storage_path(), "host_health.json"))
+        self.host_health.load()
+
+        # resolver below all HTTP clients, answers are kept across invocations
+        self.dns_cache = DNSCache(os.path.join(Cacheable.get_storage_path(), "dns_cache.json"))
+        self.dns_cache.load()
+        self.dns_cache.install()
+
+        self._refresh_lock.path = os.path.join(Cacheable.get_storage_path(), "session_data.lock")
+        self.account_payloads = AccountPayloadCache(os.path.join(Cacheable.get_storage_path(), "account_payloads.json"))
+        self.profile_vault = ProfileVault(os.path.join(Cacheable.get_storage_path(), "profile_vault.json"))
+        cloudscraper.user_agent.setIndexStore(Cacheable.get_storage_path(), utils.write_file_atomic)
+
+        if G.args.addon.getSetting("tls_session_resumption") == "true":
+            self.enable_tls_session_resumption()
+
+    def preconnect(self, route: str) -> None:
+        """ connect to the hosts of route in the background, while the invocation is still starting up
+
+        The connections go to the pool of the session sending the first requests: the calling thread's session, or
+        the pooled CloudScraper for hosts behind Cloudflare.
+        """
+
+        # the TLS setup has to be in place before, it replaces the connection pools
+        self._init_transport()
+
+        targets = [(self.http, url) for url in self.PRECONNECT_URLS.get(route, [])]
+
+        # skip hosts this installation hasn't connected to lately, e.g. the stream host of the other session type.
+        # without any warm state yet (first run, TLS resumption off) all hosts of the route are connected to.
+        warm_hosts = self.tls_sessions.get_warm_hosts() if self.tls_sessions is not None else []
+        if warm_hosts:
+            targets = [(session, url) for session, url in targets if urlsplit(url).hostname in warm_hosts]
+
+        for url, auth_type in self.PRECONNECT_SCRAPER_URLS.get(route, []):
+            scraper = self.get_scraper(auth_type)
+            if scraper is not None:
+                targets.append((scraper, url))
+
+        for session, url in targets:
+            host = urlsplit(url).hostname
+            if requests.utils.get_environ_proxies(url):
+                continue
+            try:
+                self.host_health.check(host)
+            except CircuitOpenError:
+                continue
+            self.preconnector.start(session, url, self.host_health.get_timeout(host))
+
+    def enable_tls_session_resumption(self) -> None:
+        """ resume TLS sessions on new connections to known hosts, and keep their warm state in the profile """
+
+        if self.tls_sessions is not None:
+            return
+
+        self.tls_sessions = TLSSessionStore(os.path.join(Cacheable.get_storage_path(), "tls_warm_state.json"))
+        self.tls_sessions.load()
+        self._ssl_context = create_ssl_context(self.tls_sessions)
+
+        # the session of the calling thread already exists
+        self.http.mount("https://", ResumingHTTPAdapter(self._ssl_context))
 
     def start(self) -> None:
         session_restart = G.args.get_arg('session_restart', False)
 
+        self._init_transport()
+
         # restore account data from file (if any)
         account_data = self.account_data.load_from_storage()
 
@@ -126,27 +339,16 @@ class API:
         self.profile_data = ProfileData(self.profile_data.load_from_storage())
 
         if account_data and not session_restart:
-            self.account_data = AccountData(account_data)
-            account_auth = {"Authorization": f"{self.account_data.token_type} {self.account_data.access_token}"}
-            self.api_headers.update(account_auth)
-
-            # Restore User-Agent from session data for persistent authentication compatibility
-            user_agent_type = getattr(self.account_data, 'user_agent_type', 'mobile')
-            if user_agent_type == "device":
-                API.CRUNCHYROLL_UA = self.CRUNCHYROLL_UA_DEVICE
-                utils.crunchy_log(f"Session restored: AndroidTV User-Agent set: {API.CRUNCHYROLL_UA}", xbmc.LOGDEBUG)
-            else:
-                API.CRUNCHYROLL_UA = self.CRUNCHYROLL_UA_MOBILE
-                utils.crunchy_log(f"Session restored: Mobile User-Agent set: {API.CRUNCHYROLL_UA}", xbmc.LOGDEBUG)
-
-            # Update headers with restored User-Agent
-            self.api_headers = default_request_headers()
-            self.api_headers.update(account_auth)
-            utils.crunchy_log(f"Session start: User-Agent type '{user_agent_type}' restored from session data", xbmc.LOGDEBUG)
+            self._restore_account_data(account_data)
 
             # Use new token validation method
             if self.is_token_valid():
                 utils.crunchy_log("Existing session is valid, skipping authentication")
+                if self.account_data.pending_profile_id:
+                    # finish a profile switch an earlier invocation started from the vault
+                    self.token_refresher.schedule(0, force=True)
+                else:
+                    self.token_refresher.schedule()
                 return
             else:
                 utils.crunchy_log("Existing session expired, will attempt refresh")
@@ -155,6 +357,55 @@ class API:
         # session management - always use "login" action for automatic flow
         self.create_session(action="refresh" if session_restart else "login")
 
+    def _restore_account_data(self, account_data: Dict) -> None:
+        """ use a session loaded from the session file """
+
+        self.account_data = AccountData(account_data)
+        account_auth = {"Authorization": f"{self.account_data.token_type} {self.account_data.access_token}"}
+        if self.account_data.clock_offset is not None:
+            self.clock_skew.set_offset(self.account_data.clock_offset)
+
+        # Restore User-Agent from session data for persistent authentication compatibility
+        user_agent_type = getattr(self.account_data, 'user_agent_type', 'mobile')
+        if user_agent_type == "device":
+            API.CRUNCHYROLL_UA = self.CRUNCHYROLL_UA_DEVICE
+            utils.crunchy_log(f"Session restored: AndroidTV User-Agent set: {API.CRUNCHYROLL_UA}", xbmc.LOGDEBUG)
+        else:
+            API.CRUNCHYROLL_UA = self.CRUNCHYROLL_UA_MOBILE
+            utils.crunchy_log(f"Session restored: Mobile User-Agent set: {API.CRUNCHYROLL_UA}", xbmc.LOGDEBUG)
+
+        # Update headers with restored User-Agent
+        self.api_headers = default_request_headers()
+        self.api_headers.update(account_auth)
+        utils.crunchy_log(f"Session start: User-Agent type '{user_agent_type}' restored from session data", xbmc.LOGDEBUG)
+
+    def _adopt_stored_session(self) -> bool:
+        """ switch to the session another plugin process stored since ours was loaded, must hold the refresh lock
+
+        Returns True if the stored session differs from ours, i.e. ours might have been used up by the other process.
+        """
+
+        try:
+            account_data = self.account_data.load_from_storage()
+        except Exception as e:
+            utils.crunchy_log(f"Can't read stored session: {e}", xbmc.LOGWARNING)
+            return False
+
+        if not account_data or (
+                account_data.get("refresh_token") == self.account_data.refresh_token
+                and account_data.get("access_token") == self.account_data.access_token
+        ):
+            return False
+
+        utils.crunchy_log("Session was renewed by another process, using it", xbmc.LOGINFO)
+        self._restore_account_data(account_data)
+        # the other process might have switched profiles
+        try:
+            self.profile_data = ProfileData(self.profile_data.load_from_storage())
+        except Exception as e:
+            utils.crunchy_log(f"Can't read stored profile: {e}", xbmc.LOGWARNING)
+        return True
+
     def create_session(self, action: str = "login", profile_id: Optional[str] = None) -> None:
         """
         Create or refresh authentication session
@@ -172,7 +423,10 @@ class API:
         elif action == "refresh":
             # Refresh existing token, fall back to device auth if refresh token expired
             try:
-                return self._handle_refresh_flow()
+                with self._refresh_lock:
+                    if self._adopt_stored_session() and self.is_token_valid():
+                        return
+                    return self._renew_session()
             except LoginError as e:
                 if e.error_code == "REFRESH_TOKEN_EXPIRED":
                     xbmcgui.Dialog().ok(
@@ -186,7 +440,12 @@ class API:
 
         elif action == "refresh_profile":
             # Switch profile using existing refresh token
-            return self._handle_profile_refresh_flow(profile_id)
+            with self._refresh_lock:
+                self._adopt_stored_session()
+                if self._swap_to_profile(profile_id):
+                    return None
+                with shield_from_cancellation():
+                    return self._handle_profile_refresh_flow(profile_id)
 
         else:
             raise LoginError(f"Unknown action: {action}")
@@ -206,7 +465,9 @@ class API:
         if self.account_data.refresh_token:
             try:
                 utils.crunchy_log("Attempting token refresh", xbmc.LOGDEBUG)
-                self._handle_refresh_flow()
+                with self._refresh_lock:
+                    if not (self._adopt_stored_session() and self.is_token_valid()):
+                        self._renew_session()
                 return  # Success, exit flow
             except LoginError as e:
                 utils.crunchy_log(f"Token refresh failed: {e}, continuing to device flow", xbmc.LOGDEBUG)
@@ -248,15 +509,15 @@ class API:
         }
 
         # Try www endpoint with cloudscraper first
-        scraper = self.create_auth_scraper()
+        scraper = self.get_scraper("device")
         if scraper:
             try:
                 utils.crunchy_log("Trying token refresh via www endpoint with cloudscraper")
-                r = scraper.post(
+                r = self._send_auth_request(
                     url=self.TOKEN_ENDPOINT,
+                    session=scraper,
                     headers=headers,
-                    data=data,
-                    timeout=30
+                    data=data
                 )
 
                 if r.ok:
@@ -279,8 +540,9 @@ class API:
             headers["Authorization"] = self.AUTHORIZATION_LEGACY
             headers["User-Agent"] = self.CRUNCHYROLL_UA
 
-            r = self.http.post(
+            r = self._send_auth_request(
                 url=self.TOKEN_ENDPOINT_BETA,
+                session=self.http,
                 headers=headers,
                 data=data
             )
@@ -303,6 +565,9 @@ class API:
         except LoginError:
             # Re-raise LoginErrors with error_code intact (e.g., REFRESH_TOKEN_EXPIRED from line 294)
             raise
+        except (RequestCancelled, DeadlineExceeded):
+            # no network error, the invocation ended or ran out of time
+            raise
         except requests.exceptions.RequestException as e:
             # Network connectivity issues
             utils.crunchy_log(f"Network error during token refresh: {e}", xbmc.LOGERROR)
@@ -339,15 +604,15 @@ class API:
         }
 
         # Try www endpoint with cloudscraper first
-        scraper = self.create_auth_scraper()
+        scraper = self.get_scraper("device")
         if scraper:
             try:
                 utils.crunchy_log("Trying profile refresh via www endpoint with cloudscraper", xbmc.LOGDEBUG)
-                r = scraper.post(
+                r = self._send_auth_request(
                     url=self.TOKEN_ENDPOINT,
+                    session=scraper,
                     headers=headers,
-                    data=data,
-                    timeout=30
+                    data=data
                 )
 
                 if r.ok:
@@ -369,8 +634,9 @@ class API:
             headers["Authorization"] = self.AUTHORIZATION_LEGACY
             headers["User-Agent"] = self.CRUNCHYROLL_UA
 
-            r = self.http.post(
+            r = self._send_auth_request(
                 url=self.TOKEN_ENDPOINT_BETA,
+                session=self.http,
                 headers=headers,
                 data=data
             )
@@ -386,6 +652,9 @@ class API:
         except LoginError:
             # Re-raise LoginErrors with error_code intact
             raise
+        except (RequestCancelled, DeadlineExceeded):
+            # see _handle_refresh_flow()
+            raise
         except requests.exceptions.RequestException as e:
             # Network connectivity issues
             utils.crunchy_log(f"Network error during profile refresh: {e}", xbmc.LOGERROR)
@@ -443,11 +712,51 @@ class API:
             raise LoginError(f"Device authentication error: {str(e)}")
 
 
+    def finish_token_refresh(self) -> None:
+        """ stop background token refreshes, waiting for one in progress. call before ending the invocation. """
+
+        self.token_refresher.stop(REFRESH_WAIT)
+
     def close(self) -> None:
         """Saves cookies and session
         """
         # no longer required, data is saved upon session update already
 
+        # normally done by finish_token_refresh() already
+        self.token_refresher.stop(REFRESH_WAIT)
+
+        # release pooled scraper connections
+        with self._scrapers_lock:
+            scrapers = list(self._scrapers.values())
+            self._scrapers.clear()
+
+        for scraper in scrapers:
+            try:
+                scraper.close()
+            except Exception as e:
+                utils.crunchy_log(f"Failed to close pooled CloudScraper: {e}", xbmc.LOGDEBUG)
+
+        if self._async_client is not None:
+            self._async_client.close()
+            self._async_client = None
+
+        if self.http_cache is not None:
+            self.http_cache.prune()
+
+        utils.crunchy_log(f"Host health: {self.host_health.get_all_stats()}", xbmc.LOGDEBUG)
+        utils.crunchy_log(f"JSON decode: {get_decode_stats()}", xbmc.LOGDEBUG)
+        self.host_health.save()
+
+        if self.tls_sessions is not None:
+            self.tls_sessions.save()
+
+        utils.crunchy_log(f"Rate limits: {self.rate_limiter.get_state()}", xbmc.LOGDEBUG)
+        utils.crunchy_log(f"Request scheduler: {self.scheduler.get_state()}", xbmc.LOGDEBUG)
+
+        if self.dns_cache is not None:
+            utils.crunchy_log(f"DNS cache: {self.dns_cache.get_stats()}", xbmc.LOGDEBUG)
+            self.dns_cache.save()
+
     def delete_account_data(self):
         self.account_data.delete_storage()
 
@@ -456,6 +765,12 @@ class API:
         """
         self.account_data.delete_storage()
         self.profile_data.delete_storage()
+        if self.http_cache is not None:
+            self.http_cache.clear()
+        if self.account_payloads is not None:
+            self.account_payloads.clear()
+        if self.profile_vault is not None:
+            self.profile_vault.clear()
 
     def is_token_valid(self) -> bool:
         """
@@ -464,39 +779,49 @@ class API:
         Returns:
             bool: True if token exists and is not expired (with 60s buffer)
         """
-        utils.crunchy_log("Checking token validity", xbmc.LOGDEBUG)
+        # runs before every request, keep it to a comparison and only log when the token is not usable
+        account_data = self.account_data
+        expires_at = account_data.get_expires_at()
 
-        if not self.account_data.access_token:
+        # Add 60 second buffer to avoid edge cases (network delays, clock skew)
+        if account_data.access_token and expires_at is not None and self.clock_skew.now() < expires_at - 60:
+            return True
+
+        if not account_data.access_token:
             utils.crunchy_log("Token validation failed - no access token", xbmc.LOGDEBUG)
-            return False
+        elif expires_at is None:
+            utils.crunchy_log(f"Token validation failed - invalid expiration date: {account_data.expires}", xbmc.LOGDEBUG)
+        else:
+            utils.crunchy_log(f"Token expired or expiring within 60s (expires {account_data.expires})", xbmc.LOGDEBUG)
 
-        if not self.account_data.expires:
-            utils.crunchy_log("Token validation failed - no expiration date", xbmc.LOGDEBUG)
-            return False
+        return False
 
-        try:
-            current_time = get_date()
-            expiry_time = str_to_date(self.account_data.expires)
-            time_until_expiry = expiry_time - current_time
+    def get_token_lifetime_left(self) -> Optional[float]:
+        """ seconds until the access token expires, None if there is none """
 
-            utils.crunchy_log(f"Current time: {current_time}", xbmc.LOGDEBUG)
-            utils.crunchy_log(f"Expiry time: {expiry_time}", xbmc.LOGDEBUG)
-            utils.crunchy_log(f"Time until expiry: {time_until_expiry}", xbmc.LOGDEBUG)
+        expires_at = self.account_data.get_expires_at()
+        if not self.account_data.access_token or expires_at is None:
+            return None
 
-            # Add 60 second buffer to avoid edge cases (network delays, clock skew)
-            is_valid = current_time < (expiry_time - timedelta(seconds=60))
-            utils.crunchy_log(f"Token is valid (with 60s buffer): {is_valid}", xbmc.LOGDEBUG)
+        return expires_at - self.clock_skew.now()
 
-            return is_valid
-        except Exception as e:
-            # If we can't parse expiration date, assume token is invalid
-            utils.crunchy_log(f"Token validation exception: {e}", xbmc.LOGDEBUG)
-            return False
+    def _get_server_date(self) -> datetime:
+        """ like get_date(), in server time """
+
+        return datetime.utcfromtimestamp(self.clock_skew.now())
+
+    def _expire_token(self) -> None:
+        """ mark the access token expired, so the next request refreshes the session """
 
-    def create_auth_scraper(self):
+        self.account_data.expires = date_to_str(self._get_server_date() - timedelta(seconds=1))
+
+    def create_auth_scraper(self, user_agent: Optional[str] = None):
         """
         Create cloudscraper instance for www auth endpoints
 
+        Args:
+            user_agent: User-Agent the scraper should send by default (defaults to the AndroidTV UA)
+
         Returns:
             CloudScraper instance configured for Crunchyroll auth endpoints
             None if cloudscraper initialization fails
@@ -504,7 +829,7 @@ class API:
         try:
             scraper = cloudscraper.create_scraper(
                 delay=10,
-                browser={'custom': self.CRUNCHYROLL_UA_DEVICE}
+                browser={'custom': user_agent or self.CRUNCHYROLL_UA_DEVICE}
             )
             utils.crunchy_log("CloudScraper initialized for auth endpoints", xbmc.LOGDEBUG)
             return scraper
@@ -512,6 +837,52 @@ class API:
             utils.crunchy_log(f"CloudScraper initialization failed: {e}", xbmc.LOGDEBUG)
             return None
 
+    def get_scraper(self, auth_type: Optional[str] = "device"):
+        """
+        Get the pooled CloudScraper for the given auth type, creating it on first use
+
+        The scraper is kept for the lifetime of this API instance, so its keep-alive connections, TLS context and
+        Cloudflare cookies are shared by all requests of the same auth type instead of paying a new handshake
+        per request. Worker threads (see executor.py) use it concurrently: its connection pool handles that, and
+        CloudScraper solves one Cloudflare challenge at a time, counting solve attempts per thread.
+
+        Args:
+            auth_type: Authorization type ("device", "legacy", "mobile", or None)
+
+        Returns:
+            CloudScraper instance or None if cloudscraper initialization fails
+        """
+        key = auth_type or "none"
+
+        scraper = self._scrapers.get(key)
+        if scraper is not None:
+            return scraper
+
+        with self._scrapers_lock:
+            # another thread might have created it while we were waiting for the lock
+            scraper = self._scrapers.get(key)
+            if scraper is not None:
+                return scraper
+
+            scraper = self.create_auth_scraper(self._get_scraper_user_agent(auth_type))
+            if scraper is None:
+                # do not cache failures, next request will try again
+                return None
+
+            self._scrapers[key] = scraper
+            utils.crunchy_log(f"CloudScraper added to pool for auth type: {key}", xbmc.LOGDEBUG)
+
+        return scraper
+
+    def _get_scraper_user_agent(self, auth_type: Optional[str]) -> str:
+        """ Map an auth type to the User-Agent its scraper is created with """
+        if auth_type == "legacy":
+            return self.CRUNCHYROLL_UA
+        elif auth_type == "mobile":
+            return self.CRUNCHYROLL_UA_MOBILE
+
+        return self.CRUNCHYROLL_UA_DEVICE
+
     def request_device_code(self) -> Optional[Dict]:
         """
         Request device code for activation flow
@@ -527,15 +898,15 @@ class API:
         }
 
         # Try with cloudscraper first (required for www endpoints)
-        scraper = self.create_auth_scraper()
+        scraper = self.get_scraper("device")
         if scraper:
             try:
                 utils.crunchy_log("Requesting device code with cloudscraper", xbmc.LOGDEBUG)
-                r = scraper.post(
+                r = self._send_auth_request(
                     url=self.DEVICE_CODE_ENDPOINT,
+                    session=scraper,
                     headers=headers,
-                    data={},
-                    timeout=30
+                    data={}
                 )
 
                 if r.ok:
@@ -554,8 +925,9 @@ class API:
         # Fallback to regular requests (will likely fail with 403 for www)
         try:
             utils.crunchy_log("Trying device code request with regular requests", xbmc.LOGDEBUG)
-            r = self.http.post(
+            r = self._send_auth_request(
                 url=self.DEVICE_CODE_ENDPOINT,
+                session=self.http,
                 headers=headers,
                 data={}
             )
@@ -599,14 +971,14 @@ class API:
         }
 
         # Try with cloudscraper first (required for www endpoints)
-        scraper = self.create_auth_scraper()
+        scraper = self.get_scraper("device")
         if scraper:
             try:
-                r = scraper.post(
+                r = self._send_auth_request(
                     url=self.DEVICE_TOKEN_ENDPOINT,
+                    session=scraper,
                     headers=headers,
-                    json={"device_code": device_code},
-                    timeout=30
+                    json={"device_code": device_code}
                 )
                 return self._process_device_token_response(r, "cloudscraper")
             except Exception as e:
@@ -614,8 +986,9 @@ class API:
 
         # Fallback to regular requests
         try:
-            r = self.http.post(
+            r = self._send_auth_request(
                 url=self.DEVICE_TOKEN_ENDPOINT,
+                session=self.http,
                 headers=headers,
                 json={"device_code": device_code}
             )
@@ -787,60 +1160,60 @@ class API:
             current_ua = self.api_headers.get('User-Agent', 'Unknown')
             utils.crunchy_log(f"Session finalized with User-Agent: {current_ua}", xbmc.LOGDEBUG)
 
-            # Calculate and set token expiration
+            # Calculate and set token expiration, in server time as the token was issued in it
             account_data["expires"] = date_to_str(
-                get_date() + timedelta(seconds=float(account_data["expires_in"]))
+                self._get_server_date() + timedelta(seconds=float(account_data["expires_in"]))
             )
+            account_data["clock_offset"] = round(self.clock_skew.get_offset(), 3)
 
-            # Fetch index data (user info, account details)
-            utils.crunchy_log("Fetching index data", xbmc.LOGDEBUG)
-            r = self.make_unauthenticated_request(
-                method="GET",
-                url=API.INDEX_ENDPOINT,
-                headers=self.api_headers
-            )
-            account_data.update(r)
-
-            # Fetch profile data
-            utils.crunchy_log("Fetching profile data", xbmc.LOGDEBUG)
-            r = self.make_unauthenticated_request(
-                method="GET",
-                url=API.PROFILE_ENDPOINT,
-                headers=self.api_headers
-            )
-            account_data.update(r)
+            # the refresh token used for this one is spent, never lose the new one to a failed payload request
+            self._store_tokens(account_data)
+
+            # index data (user info, account details, CMS signing) and profile data, reused on plain refreshes
+            payloads = self._get_account_payloads(token_response, action, profile_id)
+            account_data.update(payloads["index"])
+            account_data.update(payloads["profile"])
 
             # Handle profile refresh specific logic
+            selected_profile: Optional[Dict] = None
             if action == "refresh_profile" and profile_id:
                 utils.crunchy_log(f"Refreshing profile data for profile_id: {profile_id}", xbmc.LOGDEBUG)
-                # Fetch all profiles from API
-                r = self.make_unauthenticated_request(
-                    method="GET",
-                    url=self.PROFILES_LIST_ENDPOINT,
-                    headers=self.api_headers
-                )
+                r = payloads["profiles"]
 
                 # Extract current profile data as dict from ProfileData obj
                 profile_data = vars(self.profile_data)
 
                 # Update extracted profile data with fresh data from API for requested profile_id
-                profile_data.update(
-                    next(profile for profile in r.get("profiles") if profile["profile_id"] == profile_id)
-                )
+                selected_profile = next(profile for profile in r.get("profiles") if profile["profile_id"] == profile_id)
+                profile_data.update(selected_profile)
 
                 # Update our ProfileData obj with updated data
                 self.profile_data = ProfileData(profile_data)
 
                 # Cache profile to file
-                self.profile_data.write_to_storage()
+                with self._refresh_lock:
+                    self.profile_data.write_to_storage()
 
             # Store account data
             self.account_data = AccountData(account_data)
-            self.account_data.write_to_storage()
+            with self._refresh_lock:
+                self.account_data.write_to_storage()
+
+            # keep the session for switching back to this profile later
+            if self.profile_vault is not None:
+                self.profile_vault.store(
+                    token_response.get("profile_id") or profile_id,
+                    account_data,
+                    selected_profile,
+                    self.clock_skew.now()
+                )
 
             # Reset refresh attempts counter on successful session finalization
             self.refresh_attempts = 0
 
+            # renew the new token in the background before it expires
+            self.token_refresher.schedule()
+
             utils.crunchy_log(f"Session finalization completed successfully (action: {action})")
 
         except KeyError as e:
@@ -853,6 +1226,421 @@ class API:
             utils.crunchy_log(f"Session finalization failed: {e}", xbmc.LOGERROR)
             raise LoginError(f"Failed to finalize session: {str(e)}")
 
+    def _store_tokens(self, account_data: Dict) -> None:
+        """ use and store new tokens right away, keeping the rest of the stored session until the payloads are in """
+
+        try:
+            session = self.account_data.load_from_storage()
+        except Exception as e:
+            utils.crunchy_log(f"Can't read stored session: {e}", xbmc.LOGWARNING)
+            session = {}
+
+        session.update(account_data)
+        session.pop("pending_profile_id", None)
+        self.account_data = AccountData(session)
+        with self._refresh_lock:
+            self.account_data.write_to_storage()
+
+    def _get_account_payloads(self, token_response: Dict, action: str, profile_id: Optional[str]) -> Dict[str, Dict]:
+        """ index and profile payloads for a new token, fetched in parallel unless the cached ones are still valid """
+
+        account_id = token_response.get("account_id")
+        token_profile_id = token_response.get("profile_id")
+
+        if action == "refresh" and self.account_payloads is not None:
+            payloads = self.account_payloads.get(account_id, token_profile_id, self.clock_skew.now())
+            if payloads is not None:
+                utils.crunchy_log("Reusing cached index and profile data", xbmc.LOGDEBUG)
+                return payloads
+
+        endpoints = {"index": API.INDEX_ENDPOINT, "profile": API.PROFILE_ENDPOINT}
+        if action == "refresh_profile" and profile_id:
+            endpoints["profiles"] = self.PROFILES_LIST_ENDPOINT
+
+        utils.crunchy_log(f"Fetching {', '.join(endpoints)} data", xbmc.LOGDEBUG)
+
+        def fetch(url: str) -> Dict:
+            return self.make_unauthenticated_request(method="GET", url=url, headers=self.api_headers)
+
+        # not on the shared executor: the refresh lock is held here, workers waiting for it must not starve these
+        with ThreadPoolExecutor(max_workers=len(endpoints), thread_name_prefix="crunchyroll-session") as pool:
+            futures = {
+                name: pool.submit(contextvars.copy_context().run, fetch, url) for name, url in endpoints.items()
+            }
+            payloads = {name: future.result() for name, future in futures.items()}
+
+        if self.account_payloads is not None:
+            self.account_payloads.store(account_id, token_profile_id, payloads, self.clock_skew.now())
+
+        return payloads
+
+    def _refresh_if_expired(self, reason: str, require_refresh_token: bool = False) -> None:
+        """ refresh the session if the access token expired, shared by all request paths """
+
+        if self.is_token_valid():
+            return
+
+        # a background refresh might be about to deliver a new token
+        if self.token_refresher.is_running():
+            utils.crunchy_log("Waiting for background token refresh", xbmc.LOGDEBUG)
+            self.token_refresher.wait(REFRESH_WAIT)
+            if self.is_token_valid():
+                return
+
+        with self._refresh_lock:
+            # another thread or process refreshed while we waited for the lock
+            self._adopt_stored_session()
+            if self.is_token_valid():
+                return
+
+            if require_refresh_token and not self.account_data.refresh_token:
+                utils.crunchy_log("CRITICAL: Token expired but no refresh token available - session not properly initialized", xbmc.LOGERROR)
+                raise LoginError("Not authenticated - please restart plugin and login")
+
+            self.refresh_attempts += 1
+
+            if self.refresh_attempts > 3:
+                utils.crunchy_log("CRITICAL: Too many refresh attempts, stopping to prevent infinite loop", xbmc.LOGERROR)
+                raise LoginError("Authentication refresh failed repeatedly - please restart addon")
+
+            utils.crunchy_log(f"{reason} (attempt {self.refresh_attempts}/3)", xbmc.LOGINFO)
+            self._renew_session()
+
+    def _refresh_ahead_of_expiry(self) -> None:
+        """ background refresh (see tokenrefresh.py), skipped if a request renewed the token in the meantime """
+
+        with self._refresh_lock:
+            self._adopt_stored_session()
+            lifetime_left = self.get_token_lifetime_left()
+            if not self.account_data.pending_profile_id and (lifetime_left is None or lifetime_left > REFRESH_AHEAD):
+                return
+
+            self._renew_session()
+
+    def _renew_session(self) -> None:
+        """ renew the access token, must hold the refresh lock
+
+        Completes a profile switch done from the vault: the refresh token still belongs to the previous profile, it
+        is exchanged for a token of the new one.
+        """
+
+        # the refresh token is spent once the token request went out, the new one has to be stored
+        with shield_from_cancellation():
+            if self.account_data.pending_profile_id:
+                self._handle_profile_refresh_flow(self.account_data.pending_profile_id)
+            else:
+                self._handle_refresh_flow()
+
+    def _swap_to_profile(self, profile_id: Optional[str]) -> bool:
+        """ switch to profile_id with its session from the vault, must hold the refresh lock
+
+        The token exchange for the profile is left to the background refresher. Returns False if the vault has no
+        usable session for the profile.
+        """
+
+        if self.profile_vault is None or not profile_id or profile_id == self.profile_data.profile_id:
+            return False
+
+        bundle = self.profile_vault.get(self.account_data.account_id, profile_id, self.clock_skew.now())
+        if bundle is None:
+            return False
+
+        utils.crunchy_log(f"Switching to profile {profile_id} with its stored session", xbmc.LOGINFO)
+
+        account_data = dict(bundle["account"])
+        # the refresh token of the bundle was spent when switching away from the profile, ours is the current one.
+        # it's still bound to the previous profile, so it has to go through the profile exchange, even after a crash.
+        account_data["refresh_token"] = self.account_data.refresh_token
+        account_data["pending_profile_id"] = profile_id
+        self._restore_account_data(account_data)
+        self.profile_data = ProfileData(bundle["profile"])
+
+        self.profile_data.write_to_storage()
+        self.account_data.write_to_storage()
+
+        self.token_refresher.schedule(0, force=True)
+        return True
+
+    def _sign_params(self, params: Dict) -> None:
+        """ add the CMS signing keys to the query params """
+
+        params.update({
+            "Policy": self.account_data.cms.policy,
+            "Signature": self.account_data.cms.signature,
+            "Key-Pair-Id": self.account_data.cms.key_pair_id
+        })
+
+    def _get_scraper_auth_headers(self, auth_type: Optional[str]) -> Dict:
+        if auth_type not in ("device", "legacy", "mobile"):
+            return {}
+
+        return {
+            "Authorization": f"{self.account_data.token_type} {self.account_data.access_token}",
+            "User-Agent": self._get_scraper_user_agent(auth_type),
+        }
+
+    def _lookup_http_cache(self, method: str, url: str, params: Dict) -> Optional[CacheLookup]:
+        """ cache entry for a request, None if the request is not cacheable (see HTTP_CACHE_RULES) """
+
+        if self.http_cache is None:
+            return None
+
+        try:
+            return self.http_cache.lookup(method, url, params, self.profile_data.profile_id, self.locale)
+        except Exception as e:
+            utils.crunchy_log(f"HTTP cache lookup failed: {e}", xbmc.LOGDEBUG)
+            return None
+
+    def _send_auth_request(self, url: str, session: requests.Session, **kwargs) -> Response:
+        """ POST to an auth endpoint through _send(), so the token path is bound by the same deadline and circuit
+        breaker as every other request. Auth requests hold the session lock (see filelock.py), they must never hang.
+        """
+
+        return self._send(
+            "POST", url,
+            lambda timeout: session.post(url=url, timeout=timeout, **kwargs),
+            max_timeout=self.AUTH_TIMEOUT,
+            session=session
+        )
+
+    def _send(
+            self,
+            method: str,
+            url: str,
+            send: Callable[[float], Response],
+            max_timeout: Optional[float] = None,
+            session: Optional[requests.Session] = None
+    ) -> Response:
+        """ send a request through send(timeout), guarded by the health of its host (see resilience.py)
+
+        Hosts with an open circuit fail fast, the timeout adapts to the host's latency and idempotent requests are
+        retried with jittered backoff on connection errors, timeouts and 5xx responses.
+        """
+
+        host = urlsplit(url).hostname or ""
+        attempts = 1 + MAX_RETRIES if method.upper() in IDEMPOTENT_METHODS else 1
+        cancel_token = get_cancel_token()
+        priority = get_request_priority()
+
+        # finishing a speculative connect to the host is quicker than opening another connection. session is the
+        # one send() uses, if it isn't the calling thread's.
+        self.preconnector.wait(session or self.http, host)
+
+        for attempt in range(attempts):
+            cancel_token.raise_if_cancelled()
+            self.host_health.check(host)
+            delay = self._get_rate_limit_delay(url)
+            if delay and cancel_token.wait(delay):
+                cancel_token.raise_if_cancelled()
+            timeout = self.host_health.get_timeout(host)
+            if max_timeout:
+                timeout = min(timeout, max_timeout)
+            deadline = get_deadline()
+            if deadline is not None:
+                # never wait longer than the budget of the invocation allows
+                timeout = deadline.get_timeout(timeout)
+
+            started = time.monotonic()
+            try:
+                with self.scheduler.slot(priority):
+                    r = send(timeout)
+                self.clock_skew.observe(r)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                delay = get_retry_delay(attempt)
+                retry = self._can_retry(attempt, attempts, delay)
+                # the circuit breaker counts failed requests, not failed attempts
+                self.host_health.record_failure(host, final=not retry)
+                if not retry:
+                    raise
+                utils.crunchy_log(f"{method} {url} failed ({e}), retry {attempt + 1}/{MAX_RETRIES}", xbmc.LOGINFO)
+                if cancel_token.wait(delay):
+                    cancel_token.raise_if_cancelled()
+                continue
+
+            if self._is_throttled(url, r):
+                # throttling is no outage of the host. the retry waits out Retry-After in the rate limiter.
+                if not self._can_retry(attempt, attempts, self.rate_limiter.get_pause(url)):
+                    return r
+                utils.crunchy_log(f"{method} {url} throttled, retry {attempt + 1}/{MAX_RETRIES}", xbmc.LOGINFO)
+                continue
+
+            if not self._is_failed_response(r):
+                self.host_health.record_success(host, time.monotonic() - started)
+                return r
+
+            delay = get_retry_delay(attempt)
+            retry = self._can_retry(attempt, attempts, delay)
+            self.host_health.record_failure(host, final=not retry)
+            if not retry:
+                return r
+            utils.crunchy_log(f"{method} {url} failed (HTTP {r.status_code}), retry {attempt + 1}/{MAX_RETRIES}", xbmc.LOGINFO)
+            if cancel_token.wait(delay):
+                cancel_token.raise_if_cancelled()
+
+    async def _send_async(
+            self,
+            method: str,
+            url: str,
+            send: Callable[[float], Awaitable[Response]],
+            max_timeout: Optional[float] = None
+    ) -> Response:
+        """ like _send(), for the async request path """
+
+        host = urlsplit(url).hostname or ""
+        attempts = 1 + MAX_RETRIES if method.upper() in IDEMPOTENT_METHODS else 1
+        cancel_token = get_cancel_token()
+        priority = get_request_priority()
+
+        for attempt in range(attempts):
+            cancel_token.raise_if_cancelled()
+            self.host_health.check(host)
+            delay = self._get_rate_limit_delay(url)
+            if delay:
+                await cancel_token.run_cancellable(asyncio.sleep(delay))
+            timeout = self.host_health.get_timeout(host)
+            if max_timeout:
+                timeout = min(timeout, max_timeout)
+            deadline = get_deadline()
+            if deadline is not None:
+                # never wait longer than the budget of the invocation allows
+                timeout = deadline.get_timeout(timeout)
+
+            started = time.monotonic()
+            try:
+                async with self.scheduler.async_slot(priority):
+                    # abandon the request if Kodi aborts, its connection is closed instead of waiting for it
+                    r = await cancel_token.run_cancellable(send(timeout))
+                self.clock_skew.observe(r)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                delay = get_retry_delay(attempt)
+                retry = self._can_retry(attempt, attempts, delay)
+                # the circuit breaker counts failed requests, not failed attempts
+                self.host_health.record_failure(host, final=not retry)
+                if not retry:
+                    raise
+                utils.crunchy_log(f"{method} {url} failed ({e}), retry {attempt + 1}/{MAX_RETRIES}", xbmc.LOGINFO)
+                await cancel_token.run_cancellable(asyncio.sleep(delay))
+                continue
+
+            if self._is_throttled(url, r):
+                # see _send()
+                if not self._can_retry(attempt, attempts, self.rate_limiter.get_pause(url)):
+                    return r
+                utils.crunchy_log(f"{method} {url} throttled, retry {attempt + 1}/{MAX_RETRIES}", xbmc.LOGINFO)
+                continue
+
+            if not self._is_failed_response(r):
+                self.host_health.record_success(host, time.monotonic() - started)
+                return r
+
+            delay = get_retry_delay(attempt)
+            retry = self._can_retry(attempt, attempts, delay)
+            self.host_health.record_failure(host, final=not retry)
+            if not retry:
+                return r
+            utils.crunchy_log(f"{method} {url} failed (HTTP {r.status_code}), retry {attempt + 1}/{MAX_RETRIES}", xbmc.LOGINFO)
+            await cancel_token.run_cancellable(asyncio.sleep(delay))
+
+    def _get_hedge_url(self, method: str, url: str) -> Optional[str]:
+        """ the same endpoint on the alternate host, if requests to url can be hedged """
+
+        if method.upper() not in IDEMPOTENT_METHODS:
+            return None
+
+        parts = urlsplit(url)
+        alternate = self.HEDGE_HOSTS.get(parts.hostname)
+        if alternate is None or not any(re.match(pattern, parts.path) for pattern in self.HEDGE_PATHS):
+            return None
+
+        return parts._replace(netloc=alternate).geturl()
+
+    async def _send_hedged_async(
+            self,
+            method: str,
+            url: str,
+            send: Callable[[str, float], Awaitable[Response]],
+            max_timeout: Optional[float] = None
+    ) -> Response:
+        """ like _send_async(), with send(url, timeout), but hedged for endpoints served by both API hosts
+
+        If the host of url hasn't answered by its p90 latency, the request is sent to the alternate host as well. The
+        first successful response is used and the other request is cancelled.
+        """
+
+        host = urlsplit(url).hostname
+        hedge_url = self._get_hedge_url(method, url)
+        delay = self.host_health.get_hedge_delay(host) if hedge_url else None
+        if delay is None:
+            return await self._send_async(method, url, lambda timeout: send(url, timeout), max_timeout)
+
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self._send_async(method, url, lambda timeout: send(url, timeout), max_timeout))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        try:
+            self.host_health.check(urlsplit(hedge_url).hostname)
+        except CircuitOpenError:
+            return await primary
+
+        utils.crunchy_log(f"{method} {url} slower than {delay:.2f}s, hedging with {hedge_url}", xbmc.LOGDEBUG)
+        hedge = asyncio.ensure_future(
+            self._send_async(method, hedge_url, lambda timeout: send(hedge_url, timeout), max_timeout)
+        )
+
+        pending = {primary, hedge}
+        winner = failed = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and not self._is_failed_response(task.result()):
+                        winner = task
+                        break
+                    failed = task
+        finally:
+            for task in pending:
+                task.cancel()
+
+        self.host_health.record_hedge(host, winner is hedge, time.monotonic() - started)
+
+        # both failed, report like an unhedged request would
+        return (winner or failed).result()
+
+    def _get_rate_limit_delay(self, url: str) -> float:
+        """ seconds a request to url has to queue for the rate limit of its endpoint family """
+
+        delay = self.rate_limiter.reserve(url)
+        if delay > 0:
+            deadline = get_deadline()
+            if deadline is not None and deadline.remaining() <= delay:
+                raise DeadlineExceeded(f"Rate limit queue for {url} exceeds the time budget")
+            utils.crunchy_log(f"Rate limit: queueing {url} for {delay:.2f}s", xbmc.LOGDEBUG)
+
+        return delay
+
+    def _is_throttled(self, url: str, r: Response) -> bool:
+        """ let the rate limiter see r, True if it is a 429 to retry once the rate limit allows """
+
+        paused = self.rate_limiter.observe(url, r) is not None
+        # a Cloudflare challenge is solved by the scraper, not by waiting
+        return paused and r.status_code == 429 and not is_cloudflare_challenge(r)
+
+    @staticmethod
+    def _can_retry(attempt: int, attempts: int, delay: float) -> bool:
+        if attempt + 1 >= attempts:
+            return False
+
+        # don't start a retry that can't finish within the budget of the invocation
+        deadline = get_deadline()
+        return deadline is None or deadline.remaining() > delay
+
+    @staticmethod
+    def _is_failed_response(r: Response) -> bool:
+        # a Cloudflare challenge is not an outage, it's solved by the scraper
+        return is_retryable_status(r.status_code) and not is_cloudflare_challenge(r)
+
     def make_request(
             self,
             method: str,
@@ -862,45 +1650,66 @@ class API:
             data=None,
             json_data=None,
             is_retry=False,
+    ) -> Optional[Dict]:
+        # identical GET requests in flight at the same time share one network call (see singleflight.py)
+        if method.upper() == "GET" and not is_retry:
+            return self.inflight.do(
+                make_request_key(method, url, params, headers),
+                self._make_request, method, url, headers, params, data, json_data
+            )
+
+        return self._make_request(method, url, headers, params, data, json_data, is_retry)
+
+    def _make_request(
+            self,
+            method: str,
+            url: str,
+            headers=None,
+            params=None,
+            data=None,
+            json_data=None,
+            is_retry=False,
     ) -> Optional[Dict]:
         params = params or dict()
         headers = headers or dict()
 
+        cached = self._lookup_http_cache(method, url, params)
+        if cached and cached.is_fresh():
+            utils.crunchy_log(f"make_request: served from cache: {url}", xbmc.LOGDEBUG)
+            return cached.entry.data
+
         if self.account_data:
             # token refresh if expired
-            if not self.is_token_valid():
-                self.refresh_attempts += 1
-
-                if self.refresh_attempts > 3:
-                    utils.crunchy_log("CRITICAL: Too many refresh attempts, stopping to prevent infinite loop", xbmc.LOGERROR)
-                    raise LoginError("Authentication refresh failed repeatedly - please restart addon")
-
-                utils.crunchy_log(f"make_request_proposal: session renewal due to expired token (attempt {self.refresh_attempts}/3)", xbmc.LOGINFO)
-                self._handle_refresh_flow()
-
-            # update keys
-            params.update({
-                "Policy": self.account_data.cms.policy,
-                "Signature": self.account_data.cms.signature,
-                "Key-Pair-Id": self.account_data.cms.key_pair_id
-            })
+            self._refresh_if_expired("make_request_proposal: session renewal due to expired token")
+            self._sign_params(params)
 
         request_headers = {}
         request_headers.update(self.api_headers)
         request_headers.update(headers)
+        if cached:
+            request_headers.update(cached.get_validators())
 
         # Debug log for troubleshooting (only when debug_logging is enabled)
         auth_header = request_headers.get('Authorization', 'No Auth Header')
         utils.crunchy_log(f"make_request: {method} {url} | Auth: {auth_header[:50] + '...' if len(auth_header) > 50 else auth_header}", xbmc.LOGDEBUG)
 
-        r = self.http.request(
-            method,
-            url,
-            headers=request_headers,
-            params=params,
-            data=data,
-            json=json_data
-        )
+        try:
+            r = self._send(method, url, lambda timeout: self.http.request(
+                method,
+                url,
+                headers=request_headers,
+                params=params,
+                data=data,
+                json=json_data,
+                timeout=timeout
+            ))
+        except (RequestCancelled, DeadlineExceeded):
+            raise
+        except requests.exceptions.RequestException as e:
+            if cached and cached.can_serve_stale():
+                utils.crunchy_log(f"make_request: {e}, serving stale cache entry: {url}", xbmc.LOGINFO)
+                return cached.entry.data
+            raise
 
         # something went wrong with authentication, possibly an expired token that wasn't caught above due to host
         # clock issues. set expiration date to 0 and re-call, triggering a full session refresh.
@@ -909,10 +1718,13 @@ class API:
                 raise LoginError('Request to API failed twice due to authentication issues.')
 
             utils.crunchy_log("make_request_proposal: request failed due to auth error", xbmc.LOGERROR)
-            self.account_data.expires = date_to_str(get_date() - timedelta(seconds=1))
+            self._expire_token()
             return self.make_request(method, url, headers, params, data, json_data, True)
 
         utils.crunchy_log(f"make_request response: HTTP {r.status_code}", xbmc.LOGDEBUG)
+        if cached:
+            return self.http_cache.resolve(cached, url, r, get_json_from_response)
+
         return get_json_from_response(r)
 
     def make_unauthenticated_request(
@@ -928,7 +1740,7 @@ class API:
 
         req = requests.Request(method, url, data=data, params=params, headers=headers, json=json_data)
         prepped = req.prepare()
-        r = self.http.send(prepped)
+        r = self._send(method, url, lambda timeout: self.http.send(prepped, timeout=timeout))
 
         return get_json_from_response(r)
 
@@ -967,53 +1779,46 @@ class API:
             LoginError: For authentication errors
             CrunchyrollError: For API errors
         """
+        if method.upper() == "GET" and not is_retry:
+            return self.inflight.do(
+                make_request_key(method, url, params, headers, auth_type),
+                self._make_scraper_request, method, url, auth_type, headers, params,
+                data, json_data, timeout, auto_refresh
+            )
+
+        return self._make_scraper_request(
+            method, url, auth_type, headers, params, data, json_data, timeout, auto_refresh, is_retry
+        )
+
+    def _make_scraper_request(
+            self,
+            method: str,
+            url: str,
+            auth_type: str = "device",
+            headers: Dict = None,
+            params: Dict = None,
+            data: Dict = None,
+            json_data: Dict = None,
+            timeout: int = 30,
+            auto_refresh: bool = False,
+            is_retry: bool = False
+    ) -> Optional[Dict]:
         params = params or {}
         headers = headers or {}
 
         if auto_refresh and self.account_data:
-            if not self.is_token_valid():
-                if not self.account_data.refresh_token:
-                    utils.crunchy_log("CRITICAL: Token expired but no refresh token available - session not properly initialized", xbmc.LOGERROR)
-                    raise LoginError("Not authenticated - please restart plugin and login")
-
-                self.refresh_attempts += 1
-
-                if self.refresh_attempts > 3:
-                    utils.crunchy_log("CRITICAL: Too many refresh attempts, stopping to prevent infinite loop", xbmc.LOGERROR)
-                    raise LoginError("Authentication refresh failed repeatedly - please restart addon")
-
-                utils.crunchy_log(f"Token refresh before scraper request (attempt {self.refresh_attempts}/3)", xbmc.LOGINFO)
-                self._handle_refresh_flow()
+            self._refresh_if_expired("Token refresh before scraper request", require_refresh_token=True)
 
         if self.account_data:
-            params.update({
-                "Policy": self.account_data.cms.policy,
-                "Signature": self.account_data.cms.signature,
-                "Key-Pair-Id": self.account_data.cms.key_pair_id
-            })
-
-        auth_headers = {}
-        if auth_type == "device":
-            auth_headers = {
-                "Authorization": f"{self.account_data.token_type} {self.account_data.access_token}",
-                "User-Agent": self.CRUNCHYROLL_UA_DEVICE,
-            }
-        elif auth_type == "legacy":
-            auth_headers = {
-                "Authorization": f"{self.account_data.token_type} {self.account_data.access_token}",
-                "User-Agent": self.CRUNCHYROLL_UA,
-            }
-        elif auth_type == "mobile":
-            auth_headers = {
-                "Authorization": f"{self.account_data.token_type} {self.account_data.access_token}",
-                "User-Agent": self.CRUNCHYROLL_UA_MOBILE,
-            }
+            self._sign_params(params)
+
+        auth_headers = self._get_scraper_auth_headers(auth_type)
 
         request_headers = {}
         request_headers.update(auth_headers)
         request_headers.update(headers)
 
-        scraper = self.create_auth_scraper()
+        scraper = self.get_scraper(auth_type)
         if not scraper:
             utils.crunchy_log("CloudScraper initialization failed, cannot proceed", xbmc.LOGERROR)
             raise LoginError("CloudScraper initialization failed")
@@ -1021,21 +1826,21 @@ class API:
         try:
             utils.crunchy_log(f"make_scraper_request: {method} {url}", xbmc.LOGDEBUG)
 
-            r = scraper.request(
+            r = self._send(method, url, lambda adaptive_timeout: scraper.request(
                 method=method,
                 url=url,
                 headers=request_headers,
                 params=params,
                 data=data,
                 json=json_data,
-                timeout=timeout
-            )
+                timeout=adaptive_timeout
+            ), timeout, session=scraper)
 
             utils.crunchy_log(f"make_scraper_request response: HTTP {r.status_code}", xbmc.LOGDEBUG)
 
             if r.status_code == 401 and auto_refresh and not is_retry:
                 utils.crunchy_log("Request failed due to auth error, forcing token refresh and retry", xbmc.LOGERROR)
-                self.account_data.expires = date_to_str(get_date() - timedelta(seconds=1))
+                self._expire_token()
                 return self.make_scraper_request(
                     method, url, auth_type, headers, params,
                     data, json_data, timeout, auto_refresh, is_retry=True
@@ -1045,6 +1850,9 @@ class API:
 
         except (LoginError, CrunchyrollError):
             raise
+        except (RequestCancelled, DeadlineExceeded):
+            # the user backed out or the budget is spent, that's no authentication problem
+            raise
         except requests.exceptions.Timeout:
             utils.crunchy_log(f"CloudScraper request timeout: {url}", xbmc.LOGERROR)
             raise LoginError("Request timeout - check your network connection")
@@ -1059,6 +1867,238 @@ class API:
             raise LoginError(f"Unexpected error: {str(e)}")
 
 
+    def get_async_client(self) -> AsyncHTTPClient:
+        """ non-blocking HTTP client used by the *_async request methods, created on first use """
+        with self._scrapers_lock:
+            if self._async_client is None:
+                self._async_client = AsyncHTTPClient(self._ssl_context)
+            return self._async_client
+
+    async def make_request_async(
+            self,
+            method: str,
+            url: str,
+            headers=None,
+            params=None,
+            data=None,
+            json_data=None,
+            is_retry=False,
+    ) -> Optional[Dict]:
+        """ Non-blocking variant of make_request() for use in coroutines
+
+        Requests are sent over pooled keep-alive connections of the async client instead of occupying a worker
+        thread each. Token refresh is rare and stays on the sync path, but is moved off the event loop.
+        """
+
+        if method.upper() == "GET" and not is_retry:
+            return await self.inflight.do_async(
+                make_request_key(method, url, params, headers),
+                self._make_request_async, method, url, headers, params, data, json_data
+            )
+
+        return await self._make_request_async(method, url, headers, params, data, json_data, is_retry)
+
+    async def _make_request_async(
+            self,
+            method: str,
+            url: str,
+            headers=None,
+            params=None,
+            data=None,
+            json_data=None,
+            is_retry=False,
+    ) -> Optional[Dict]:
+
+        # the async client does not implement proxy support, leave those setups to requests
+        if requests.utils.get_environ_proxies(url):
+            return await run_in_executor(self._make_request, method, url, headers, params, data, json_data, is_retry)
+
+        params = params or dict()
+        headers = headers or dict()
+
+        cached = self._lookup_http_cache(method, url, params)
+        if cached and cached.is_fresh():
+            utils.crunchy_log(f"make_request_async: served from cache: {url}", xbmc.LOGDEBUG)
+            return cached.entry.data
+
+        if self.account_data:
+            if not self.is_token_valid():
+                await run_in_executor(
+                    self._refresh_if_expired,
+                    "make_request_async: session renewal due to expired token"
+                )
+            self._sign_params(params)
+
+        request_headers = {}
+        request_headers.update(self.api_headers)
+        request_headers.update(headers)
+        if cached:
+            request_headers.update(cached.get_validators())
+
+        utils.crunchy_log(f"make_request_async: {method} {url}", xbmc.LOGDEBUG)
+
+        try:
+            r = await self._send_hedged_async(method, url, lambda target, timeout: self.get_async_client().request(
+                method,
+                target,
+                headers=request_headers,
+                params=params,
+                data=data,
+                json_data=json_data,
+                timeout=timeout
+            ))
+        except (RequestCancelled, DeadlineExceeded):
+            raise
+        except requests.exceptions.RequestException as e:
+            if cached and cached.can_serve_stale():
+                utils.crunchy_log(f"make_request_async: {e}, serving stale cache entry: {url}", xbmc.LOGINFO)
+                return cached.entry.data
+            raise
+
+        # see make_request()
+        if r.status_code == 401:
+            if is_retry:
+                raise LoginError('Request to API failed twice due to authentication issues.')
+
+            utils.crunchy_log("make_request_async: request failed due to auth error", xbmc.LOGERROR)
+            self._expire_token()
+            return await self.make_request_async(method, url, headers, params, data, json_data, True)
+
+        utils.crunchy_log(f"make_request_async response: HTTP {r.status_code}", xbmc.LOGDEBUG)
+        if cached:
+            return self.http_cache.resolve(cached, url, r, get_json_from_response)
+
+        return get_json_from_response(r)
+
+    async def make_scraper_request_async(
+            self,
+            method: str,
+            url: str,
+            auth_type: str = "device",
+            headers: Dict = None,
+            params: Dict = None,
+            data: Dict = None,
+            json_data: Dict = None,
+            timeout: int = 30,
+            auto_refresh: bool = False,
+            is_retry: bool = False
+    ) -> Optional[Dict]:
+        """ Non-blocking variant of make_scraper_request() for use in coroutines
+
+        Sends the request with the TLS settings, headers and cookies of the pooled scraper for auth_type. If
+        Cloudflare answers with a challenge, the request is handed over to the sync scraper, which can solve it.
+        """
+
+        if method.upper() == "GET" and not is_retry:
+            return await self.inflight.do_async(
+                make_request_key(method, url, params, headers, auth_type),
+                self._make_scraper_request_async, method, url, auth_type, headers, params,
+                data, json_data, timeout, auto_refresh
+            )
+
+        return await self._make_scraper_request_async(
+            method, url, auth_type, headers, params, data, json_data, timeout, auto_refresh, is_retry
+        )
+
+    async def _make_scraper_request_async(
+            self,
+            method: str,
+            url: str,
+            auth_type: str = "device",
+            headers: Dict = None,
+            params: Dict = None,
+            data: Dict = None,
+            json_data: Dict = None,
+            timeout: int = 30,
+            auto_refresh: bool = False,
+            is_retry: bool = False
+    ) -> Optional[Dict]:
+
+        def fallback():
+            return run_in_executor(
+                self._make_scraper_request, method, url, auth_type, headers, params,
+                data, json_data, timeout, auto_refresh, is_retry
+            )
+
+        if requests.utils.get_environ_proxies(url):
+            return await fallback()
+
+        params = dict(params or {})
+
+        if auto_refresh and self.account_data and not self.is_token_valid():
+            await run_in_executor(
+                self._refresh_if_expired,
+                "Token refresh before async scraper request",
+                require_refresh_token=True
+            )
+
+        if self.account_data:
+            self._sign_params(params)
+
+        scraper = self.get_scraper(auth_type)
+        if not scraper:
+            utils.crunchy_log("CloudScraper initialization failed, cannot proceed", xbmc.LOGERROR)
+            raise LoginError("CloudScraper initialization failed")
+
+        request_headers = dict(scraper.headers)
+        request_headers.update(self._get_scraper_auth_headers(auth_type))
+        request_headers.update(headers or {})
+
+        try:
+            utils.crunchy_log(f"make_scraper_request_async: {method} {url}", xbmc.LOGDEBUG)
+
+            r = await self._send_hedged_async(
+                method,
+                url,
+                lambda target, adaptive_timeout: self.get_async_client().request(
+                    method,
+                    target,
+                    headers=request_headers,
+                    params=params,
+                    data=data,
+                    json_data=json_data,
+                    cookies=scraper.cookies,
+                    timeout=adaptive_timeout,
+                    ssl_context=getattr(scraper.get_adapter(url), "ssl_context", None)
+                ),
+                timeout
+            )
+
+            utils.crunchy_log(f"make_scraper_request_async response: HTTP {r.status_code}", xbmc.LOGDEBUG)
+
+            if is_cloudflare_challenge(r):
+                utils.crunchy_log("Cloudflare challenge on async request, retrying with CloudScraper", xbmc.LOGDEBUG)
+                return await fallback()
+
+            if r.status_code == 401 and auto_refresh and not is_retry:
+                utils.crunchy_log("Request failed due to auth error, forcing token refresh and retry", xbmc.LOGERROR)
+                self._expire_token()
+                return await self.make_scraper_request_async(
+                    method, url, auth_type, headers, params,
+                    data, json_data, timeout, auto_refresh, is_retry=True
+                )
+
+            return get_json_from_response(r)
+
+        except (LoginError, CrunchyrollError):
+            raise
+        except (RequestCancelled, DeadlineExceeded):
+            # the user backed out or the budget is spent, that's no authentication problem
+            raise
+        except requests.exceptions.Timeout:
+            utils.crunchy_log(f"Async request timeout: {url}", xbmc.LOGERROR)
+            raise LoginError("Request timeout - check your network connection")
+        except requests.exceptions.ConnectionError as e:
+            utils.crunchy_log(f"Async request connection error: {e}", xbmc.LOGERROR)
+            raise LoginError("Network connection failed")
+        except requests.exceptions.RequestException as e:
+            utils.crunchy_log(f"Async request error: {e}", xbmc.LOGERROR)
+            raise LoginError(f"Request failed: {str(e)}")
+        except Exception as e:
+            utils.crunchy_log(f"Unexpected async request error: {e}", xbmc.LOGERROR)
+            raise LoginError(f"Unexpected error: {str(e)}")
+
+
 def default_request_headers() -> Dict:
     return {
         "User-Agent": API.CRUNCHYROLL_UA,
@@ -1096,31 +2136,43 @@ def get_json_from_response(r: Response) -> Optional[Dict]:
     code: int = r.status_code
     response_type: str = r.headers.get("Content-Type", "")
 
+    # work on the raw body only. r.text would decode the whole body to str, and r.json() would do it once more.
+    content: bytes = r.content or b""
+
     # no content - possibly POST/DELETE request?
-    if not r or not r.text:
+    if not r or not content:
         try:
             r.raise_for_status()
             return None
         except HTTPError as e:
             # r.text is empty when status code cause raise
             r = e.response
+            content = r.content or b""
+
+    if content.startswith(codecs.BOM_UTF8):
+        content = content[len(codecs.BOM_UTF8):]
+
+    first_char = _FIRST_CHAR.match(content)
+    is_json_object = first_char is not None and first_char.group(1) == b"{"
 
     # handle plain text responses (e.g. subtitles from CDN)
     # CDN may serve subtitles as text/plain or application/octet-stream
-    if response_type in ("text/plain", "application/octet-stream") and r.text[0] != "{":
+    if response_type in ("text/plain", "application/octet-stream") and not is_json_object:
         # if encoding is not provided in the response, Requests will make an educated guess and very likely fail
-        # messing encoding up - which did cost me hours. We will always receive utf-8 from crunchy, so enforce that
-        r.encoding = "utf-8"
-        return {"data": r.text}
+        # messing encoding up - which did cost me hours. We will always receive utf-8 from crunchy, so decode the raw
+        # body as such
+        return {"data": content.decode("utf-8", errors="replace")}
 
-    if not r.ok and (r.text[0] != "{"):
-        raise CrunchyrollError(f"[{code}] {r.text}")
+    if not r.ok and not is_json_object:
+        raise CrunchyrollError(f"[{code}] {content.decode('utf-8', errors='replace')}")
 
+    started = time.perf_counter()
     try:
-        r_json: Dict = r.json()
-    except (requests.exceptions.JSONDecodeError, ValueError):
+        r_json: Dict = _json_loads(content)
+    except ValueError:
         log_error_with_trace("Failed to parse response data")
         return None
+    _record_decode_time(r, len(content), time.perf_counter() - started)
 
     if "error" in r_json:
         error_code = r_json.get("error")
@@ -1130,6 +2182,30 @@ def get_json_from_response(r: Response) -> Optional[Dict]:
         message = r_json.get("message")
         raise CrunchyrollError(f"[{code}] Error occurred: {message}")
     if not r.ok:
-        raise CrunchyrollError(f"[{code}] {r.text}")
+        raise CrunchyrollError(f"[{code}] {content.decode('utf-8', errors='replace')}")
 
     return r_json
+
+
+def get_decode_stats() -> Dict[str, Dict]:
+    """ JSON decode statistics of this invocation, keyed by endpoint """
+
+    with _decode_stats_lock:
+        return {endpoint: dict(stats) for endpoint, stats in _decode_stats.items()}
+
+
+def _record_decode_time(r: Response, size: int, duration: float) -> None:
+    url = r.url if isinstance(getattr(r, "url", None), str) else ""
+    # ids in paths would create an entry per item, group them by their endpoint
+    endpoint = _ID_SEGMENT.sub("/{id}", urlsplit(url).path) or "unknown"
+
+    with _decode_stats_lock:
+        stats = _decode_stats.setdefault(endpoint, {"count": 0, "bytes": 0, "seconds": 0.0})
+        stats["count"] += 1
+        stats["bytes"] += size
+        stats["seconds"] += duration
+
+    utils.crunchy_log(
+        f"JSON decode ({JSON_BACKEND}): {endpoint}: {size} bytes in {duration * 1000:.1f}ms",
+        xbmc.LOGDEBUG
+    )
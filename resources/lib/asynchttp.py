@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+import email.message
+import ssl
+import threading
+import time
+import zlib
+from datetime import timedelta
+from http.cookiejar import CookieJar
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests import Response
+from requests.cookies import MockRequest, MockResponse, RequestsCookieJar
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# how long an idle keep-alive connection is kept in the pool
+IDLE_TIMEOUT = 30
+# max idle connections kept per host
+MAX_IDLE_PER_HOST = 6
+# requests that may be sent twice, only these are retried when a reused connection turns out to be closed
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"))
+
+
+class _Connection:
+    """ A single keep-alive connection to a host """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+        self.reused = False
+
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class AsyncHTTPClient:
+    """ Minimal non-blocking HTTP/1.1 client with pooled keep-alive connections
+
+    All socket I/O runs on one event loop owned by this client, in its own thread. That way the connection pool
+    outlives the short-lived loops created by asyncio.run() in the views, and coroutines on any loop can use it.
+    Responses are returned as requests.Response objects, so they can be handled by get_json_from_response()
+    just like responses of the sync path.
+    """
+
+    def __init__(self, ssl_context: Optional[ssl.SSLContext] = None):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, int, int], List[_Connection]] = {}
+        self._default_ssl_context: Optional[ssl.SSLContext] = ssl_context
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(started.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="crunchyroll-asynchttp", daemon=True)
+                self._thread.start()
+                started.wait()
+                self._loop = loop
+
+            return self._loop
+
+    def get_default_ssl_context(self) -> ssl.SSLContext:
+        if self._default_ssl_context is None:
+            # use the same CA bundle as requests, some platforms (e.g. Android) have no usable system store
+            self._default_ssl_context = ssl.create_default_context(cafile=requests.certs.where())
+        return self._default_ssl_context
+
+    async def request(
+            self,
+            method: str,
+            url: str,
+            headers: Optional[Dict] = None,
+            params: Optional[Dict] = None,
+            data=None,
+            json_data=None,
+            cookies=None,
+            timeout: Optional[float] = 30,
+            ssl_context: Optional[ssl.SSLContext] = None
+    ) -> Response:
+        """ send a request and return a requests.Response. Can be awaited from any event loop. """
+
+        # let requests do the url / body / header encoding, so both paths send exactly the same request
+        prepped = requests.Request(
+            method, url, headers=headers, params=params, data=data, json=json_data, cookies=cookies
+        ).prepare()
+
+        loop = self._get_loop()
+        coro = self._send(prepped, timeout, ssl_context or self.get_default_ssl_context(), cookies)
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            return await coro
+
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def close(self) -> None:
+        """ close all pooled connections and stop the client loop """
+
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+
+        if loop is None or loop.is_closed():
+            return
+
+        def shutdown():
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+            loop.stop()
+
+        loop.call_soon_threadsafe(shutdown)
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    async def _send(
+            self,
+            prepped: requests.PreparedRequest,
+            timeout: Optional[float],
+            ssl_context,
+            cookies=None
+    ) -> Response:
+        parts = urlsplit(prepped.url)
+        secure = parts.scheme == "https"
+        host = parts.hostname
+        port = parts.port or (443 if secure else 80)
+        key = (host, port, id(ssl_context) if secure else 0)
+
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        body = prepped.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        request_headers = CaseInsensitiveDict(prepped.headers)
+        request_headers.setdefault("Host", parts.netloc)
+        request_headers.setdefault("Accept-Encoding", "gzip, deflate")
+        request_headers.setdefault("Accept", "*/*")
+        request_headers["Connection"] = "keep-alive"
+        if body:
+            request_headers["Content-Length"] = str(len(body))
+
+        head = "%s %s HTTP/1.1\r\n" % (prepped.method, target)
+        head += "".join("%s: %s\r\n" % (name, value) for name, value in request_headers.items())
+        payload = (head + "\r\n").encode("latin-1") + (body or b"")
+
+        started = time.monotonic()
+        # the timeout covers the whole call, connecting and a retry included
+        deadline = started + timeout if timeout is not None else None
+
+        # a pooled connection might have been closed by the server in the meantime. retry once on a fresh one,
+        # unless the request is not safe to send twice
+        for attempt in range(2):
+            connection = self._get_idle(key)
+            try:
+                if connection is None:
+                    connection = await self._connect(
+                        host, port, ssl_context if secure else None, _time_left(deadline)
+                    )
+
+                status, reason, headers, set_cookies, content, keep_alive = await asyncio.wait_for(
+                    self._exchange(connection, payload, prepped.method),
+                    _time_left(deadline)
+                )
+            except asyncio.TimeoutError as e:
+                if connection is not None:
+                    connection.close()
+                raise requests.exceptions.Timeout(f"Request timed out: {prepped.url}") from e
+            except asyncio.CancelledError:
+                # the response might be half read, the connection can't be reused
+                if connection is not None:
+                    connection.close()
+                raise
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                if connection is not None:
+                    connection.close()
+                if (
+                        connection is not None and connection.reused and attempt == 0
+                        and prepped.method in IDEMPOTENT_METHODS
+                ):
+                    continue
+                raise requests.exceptions.ConnectionError(f"Connection failed: {prepped.url}: {e}") from e
+
+            if keep_alive:
+                self._put_idle(key, connection)
+            else:
+                connection.close()
+            break
+
+        response = Response()
+        response.status_code = status
+        response.reason = reason
+        response.headers = headers
+        response._content = content
+        response.url = prepped.url
+        response.request = prepped
+        response.encoding = get_encoding_from_headers(headers)
+        response.elapsed = timedelta(seconds=time.monotonic() - started)
+        response.cookies = RequestsCookieJar()
+
+        # like requests, keep the cookies of the response, in the jar of the caller too (e.g. Cloudflare cookies of
+        # the scraper)
+        if set_cookies:
+            jars = [response.cookies]
+            if isinstance(cookies, CookieJar):
+                jars.append(cookies)
+            for jar in jars:
+                _extract_cookies(jar, prepped, set_cookies)
+
+        return response
+
+    async def _connect(self, host: str, port: int, ssl_context, timeout: Optional[float]) -> _Connection:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context, server_hostname=host if ssl_context else None),
+            timeout
+        )
+
+        # let the session store of the context (see tlssession.py) pick up the session for later connections
+        session_store = getattr(ssl_context, "session_store", None)
+        ssl_object = writer.get_extra_info("ssl_object")
+        if session_store is not None and ssl_object is not None:
+            session_store.record(host, ssl_object)
+
+        return _Connection(reader, writer)
+
+    @staticmethod
+    async def _exchange(connection: _Connection, payload: bytes, method: str):
+        connection.writer.write(payload)
+        await connection.writer.drain()
+
+        reader = connection.reader
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b"", None)
+
+        version, status, reason = (status_line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+        status = int(status)
+
+        headers = CaseInsensitiveDict()
+        # kept apart, joining cookies with a comma breaks their Expires dates
+        set_cookies = []
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip()
+            value = value.strip()
+            if name.lower() == "set-cookie":
+                set_cookies.append(value)
+            # requests joins repeated headers with a comma, do the same
+            headers[name] = headers[name] + ", " + value if name in headers else value
+
+        connection_header = headers.get("Connection", "").lower()
+        keep_alive = version == "HTTP/1.1" and connection_header != "close" or connection_header == "keep-alive"
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            content = b""
+        elif "chunked" in headers.get("Transfer-Encoding", "").lower():
+            chunks = []
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    # skip trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            content = b"".join(chunks)
+        elif "Content-Length" in headers:
+            content = await reader.readexactly(int(headers["Content-Length"]))
+        else:
+            # body delimited by connection close
+            content = await reader.read()
+            keep_alive = False
+
+        encoding = headers.get("Content-Encoding", "").lower()
+        if content and encoding == "gzip":
+            content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
+        elif content and encoding == "deflate":
+            try:
+                content = zlib.decompress(content)
+            except zlib.error:
+                content = zlib.decompress(content, -zlib.MAX_WBITS)
+
+        connection.last_used = time.monotonic()
+
+        return status, reason, headers, set_cookies, content, keep_alive
+
+    def _get_idle(self, key) -> Optional[_Connection]:
+        connections = self._idle.get(key)
+        now = time.monotonic()
+
+        while connections:
+            connection = connections.pop()
+            if now - connection.last_used > IDLE_TIMEOUT or connection.reader.at_eof():
+                connection.close()
+                continue
+            connection.reused = True
+            return connection
+
+        return None
+
+    def _put_idle(self, key, connection: _Connection) -> None:
+        connections = self._idle.setdefault(key, [])
+        if len(connections) >= MAX_IDLE_PER_HOST:
+            connection.close()
+            return
+        connections.append(connection)
+
+
+def _time_left(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def _extract_cookies(jar: CookieJar, prepped: requests.PreparedRequest, set_cookies: List[str]) -> None:
+    message = email.message.Message()
+    for value in set_cookies:
+        # adds a header, repeated ones are kept
+        message["Set-Cookie"] = value
+
+    jar.extract_cookies(MockResponse(message), MockRequest(prepped))
+
+
+def is_cloudflare_challenge(response: Response) -> bool:
+    """ check if a response is a Cloudflare block/challenge, which only the (sync) CloudScraper can handle """
+
+    return (
+            response.headers.get("Server", "").lower().startswith("cloudflare")
+            and response.status_code in (403, 429, 503)
+            and "json" not in response.headers.get("Content-Type", "")
+    )
+
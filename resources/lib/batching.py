@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+import xbmc
+
+# max loop iterations a DataLoader waits for its batch to stop growing
+MAX_DISPATCH_HOPS = 10
+
+# marks ids the API returned nothing for, when the lookup has no default value
+_MISSING = object()
+
+
+def chunk_ids(ids: List[str], max_ids: int, max_length: int) -> List[List[str]]:
+    """ split ids into chunks of at most max_ids entries, whose comma separated form is at most max_length long """
+
+    chunks = []
+    chunk = []
+    length = 0
+
+    for item_id in ids:
+        # +1 for the separating comma
+        item_length = len(item_id) + (1 if chunk else 0)
+        if chunk and (len(chunk) >= max_ids or length + item_length > max_length):
+            chunks.append(chunk)
+            chunk = []
+            item_length = len(item_id)
+            length = 0
+
+        chunk.append(item_id)
+        length += item_length
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+class BatchedLookup:
+    """ Looks up results for a set of ids through an endpoint that takes a comma separated id list
+
+    Ids are split into chunks bounded by count and length, so big history pages or crunchylists can't exceed URL
+    length limits. Chunks are fetched in parallel and results are memoized per id for the rest of the invocation,
+    so the same id is never requested twice. A failing chunk only loses its own ids, which are retried next time.
+
+    fetch_chunk gets a list of ids and returns a dict with a result per id, or None if the request failed.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            fetch_chunk: Callable[[List[str]], Awaitable[Optional[Dict[str, Any]]]],
+            max_ids: int = 50,
+            max_length: int = 1000,
+            max_parallel: int = 4,
+            default: Any = _MISSING,
+            errors: Tuple[Type[BaseException], ...] = ()
+    ):
+        self.name: str = name
+        self.fetch_chunk = fetch_chunk
+        self.max_ids: int = max_ids
+        self.max_length: int = max_length
+        self.max_parallel: int = max_parallel
+        # result for ids the API didn't return anything for
+        self.default: Any = default
+        # exceptions of a chunk that are logged and swallowed, everything else is raised
+        self.errors: Tuple[Type[BaseException], ...] = errors
+        self._memo: Dict[str, Any] = {}
+
+    async def get_many(self, ids: Iterable[str]) -> Dict[str, Any]:
+        """ results for all given ids that could be resolved, keyed by id """
+
+        unique_ids = list(dict.fromkeys(item_id for item_id in ids if item_id))
+        missing = [item_id for item_id in unique_ids if item_id not in self._memo]
+
+        if missing:
+            await self._fetch(missing)
+
+        return {
+            item_id: self._memo[item_id]
+            for item_id in unique_ids
+            if self._memo.get(item_id, _MISSING) is not _MISSING
+        }
+
+    def peek(self, item_id: str) -> Tuple[bool, Any]:
+        """ memoized result for an id, without fetching it. returns (found, result) """
+
+        if item_id not in self._memo:
+            return False, None
+
+        value = self._memo[item_id]
+        return True, None if value is _MISSING else value
+
+    def clear(self) -> None:
+        self._memo.clear()
+
+    async def _fetch(self, ids: List[str]) -> None:
+        from .utils import crunchy_log
+
+        chunks = chunk_ids(ids, self.max_ids, self.max_length)
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def fetch(chunk: List[str]) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self.fetch_chunk(chunk)
+
+        results = await asyncio.gather(*(fetch(chunk) for chunk in chunks), return_exceptions=True)
+
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, self.errors):
+                    raise result
+                crunchy_log(f"{self.name}: failed to load {len(chunk)} ids: {result}", xbmc.LOGERROR)
+                continue
+
+            if result is None:
+                crunchy_log(f"{self.name}: no result for {len(chunk)} ids", xbmc.LOGDEBUG)
+                continue
+
+            for item_id in chunk:
+                self._memo[item_id] = result.get(item_id, self.default)
+
+
+class DataLoader:
+    """ Collects single load() calls of independent code paths and resolves them with one batched lookup
+
+    Every load() made before the dispatch runs (once a loop iteration adds no more loads, or after window seconds)
+    ends up in the same batch, so code can stay written per item while the API sees one request for the union of all ids.
+    Results already memoized by the underlying lookup are returned right away.
+    """
+
+    def __init__(self, lookup: BatchedLookup, window: float = 0.0):
+        self.lookup: BatchedLookup = lookup
+        self.window: float = window
+        # pending loads per event loop, there might be loops in several threads
+        self._pending: Dict[asyncio.AbstractEventLoop, Dict[str, List[asyncio.Future]]] = {}
+        self._lock = threading.Lock()
+        # keep references to running dispatches, the loop itself only holds weak ones
+        self._tasks = set()
+
+    async def load(self, item_id: str) -> Any:
+        """ result for a single id, None if it could not be resolved """
+
+        found, value = self.lookup.peek(item_id)
+        if found:
+            return value
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        with self._lock:
+            batch = self._pending.get(loop)
+            if batch is None:
+                batch = self._pending[loop] = {}
+                if self.window > 0:
+                    loop.call_later(self.window, self._dispatch, loop)
+                else:
+                    loop.call_soon(self._dispatch, loop)
+            batch.setdefault(item_id, []).append(future)
+
+        return await future
+
+    async def load_many(self, ids: Iterable[str]) -> Dict[str, Any]:
+        """ results for all given ids that could be resolved, keyed by id """
+
+        unique_ids = list(dict.fromkeys(item_id for item_id in ids if item_id))
+        results = await asyncio.gather(*(self.load(item_id) for item_id in unique_ids))
+
+        return {item_id: result for item_id, result in zip(unique_ids, results) if result is not None}
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop, seen: int = 0, hops: int = 0) -> None:
+        with self._lock:
+            batch = self._pending.get(loop, {})
+            # nested tasks (e.g. gather() inside a gathered coroutine) only start an iteration later. wait as long
+            # as the batch keeps growing, so they end up in the same request.
+            if self.window <= 0 and len(batch) != seen and hops < MAX_DISPATCH_HOPS:
+                loop.call_soon(self._dispatch, loop, len(batch), hops + 1)
+                return
+            self._pending.pop(loop, None)
+
+        if batch:
+            task = loop.create_task(self._resolve(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, batch: Dict[str, List[asyncio.Future]]) -> None:
+        try:
+            results = await self.lookup.get_many(batch.keys())
+        except BaseException as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for item_id, futures in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(results.get(item_id))
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import requests
+import xbmc
+
+# how often the watchdog checks whether Kodi wants us to stop
+WATCHDOG_INTERVAL = 0.25  # seconds
+
+
+class RequestCancelled(requests.exceptions.RequestException):
+    """ raised for requests abandoned because Kodi is shutting down or the invocation has ended """
+    pass
+
+
+class CancellationToken:
+    """ Cooperative cancellation of the outstanding work of an invocation
+
+    Blocking code checks is_cancelled() / raise_if_cancelled() or waits with wait(), coroutines are cancelled
+    through run_cancellable(). Callbacks registered with add_callback() run once, on cancel().
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: Dict[int, Callable[[], Any]] = {}
+        self._next_handle = 0
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+
+        from .utils import crunchy_log
+        crunchy_log(f"Cancelling outstanding requests: {reason}", xbmc.LOGINFO)
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                crunchy_log(f"Cancellation callback failed: {e}", xbmc.LOGDEBUG)
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise RequestCancelled(f"Request cancelled: {self.reason}")
+
+    def wait(self, timeout: float) -> bool:
+        """ sleep for timeout seconds, but wake up on cancel. returns True if cancelled """
+
+        return self._event.wait(timeout)
+
+    def add_callback(self, callback: Callable[[], Any]) -> Optional[int]:
+        """ register a callback for cancel(). it is called right away if already cancelled """
+
+        with self._lock:
+            if not self._event.is_set():
+                handle = self._next_handle
+                self._next_handle += 1
+                self._callbacks[handle] = callback
+                return handle
+
+        callback()
+        return None
+
+    def remove_callback(self, handle: Optional[int]) -> None:
+        if handle is None:
+            return
+
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+    async def run_cancellable(self, awaitable: Awaitable) -> Any:
+        """ await awaitable, abandoning it with RequestCancelled when the token is cancelled """
+
+        self.raise_if_cancelled()
+
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(awaitable)
+        handle = self.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
+
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if self.is_cancelled():
+                raise RequestCancelled(f"Request cancelled: {self.reason}")
+            raise
+        finally:
+            self.remove_callback(handle)
+
+
+class Watchdog(threading.Thread):
+    """ Cancels the token of the invocation as soon as Kodi requests an abort """
+
+    def __init__(self, monitor: xbmc.Monitor, token: CancellationToken):
+        super().__init__(name="crunchyroll-watchdog", daemon=True)
+        self.monitor = monitor
+        self.token = token
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.is_set() and not self.token.is_cancelled():
+            if self.monitor.waitForAbort(WATCHDOG_INTERVAL):
+                self.token.cancel("Kodi abort requested")
+                return
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+# token of the current invocation (lazy loaded)
+_token: Optional[CancellationToken] = None
+_watchdog: Optional[Watchdog] = None
+
+# token seen by shielded work, never cancelled
+_shield_token = CancellationToken()
+_shielded: ContextVar[bool] = ContextVar("crunchyroll_cancel_shielded", default=False)
+
+
+def get_cancel_token() -> CancellationToken:
+    """ Get cancellation token of the current invocation """
+    global _token
+
+    if _shielded.get():
+        return _shield_token
+
+    if _token is None:
+        _token = CancellationToken()
+    return _token
+
+
+@contextmanager
+def shield_from_cancellation():
+    """ run the requests of this block to completion, even once the invocation is cancelled
+
+    For work that can't be abandoned halfway, like a token refresh: once the refresh token is spent, the new one
+    has to be stored. Carries over into executor calls made from the block, like the request priority.
+    """
+
+    token = _shielded.set(True)
+    try:
+        yield
+    finally:
+        _shielded.reset(token)
+
+
+def start_watchdog(monitor: xbmc.Monitor) -> None:
+    """ Tie the cancellation token to Kodi's abort request """
+    global _watchdog
+
+    if _watchdog is not None:
+        return
+
+    _watchdog = Watchdog(monitor, get_cancel_token())
+    _watchdog.start()
+
+
+def end_invocation(reason: str = "invocation ended") -> None:
+    """ The plugin handle is done, abandon everything still outstanding """
+    global _watchdog
+
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
+
+    get_cancel_token().cancel(reason)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import statistics
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from requests import Response
+
+# the offset is the median of the latest samples, so a single response delayed somewhere doesn't move it
+MAX_SAMPLES = 7
+# responses taking longer than this say too little about when the Date header was set
+MAX_SAMPLE_RTT = 5.0  # seconds
+
+
+def get_server_time(r: Response) -> Optional[float]:
+    """ time the server sent r, as unix time, from its Date and Age headers """
+
+    headers = r.headers
+    value = headers.get("Date") if headers else None
+    if not isinstance(value, str):
+        return None
+
+    try:
+        server_time = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+    # a cached response keeps the Date of the origin, Age says how long it was cached since
+    age = headers.get("Age")
+    if isinstance(age, str) and age.isdigit():
+        server_time += int(age)
+
+    # Date has a resolution of one second, take the middle of it
+    return server_time + 0.5
+
+
+class ClockSkew:
+    """ Offset of the server clock from the local one, estimated from the Date headers of responses
+
+    Token expiry is given relative to server time. Devices without a battery backed clock often run off by minutes
+    until NTP catches up, which makes expired tokens look valid and costs a 401, a refresh and a retry.
+    """
+
+    def __init__(self, offset: float = 0.0):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=MAX_SAMPLES)
+        self._offset: float = offset
+
+    def observe(self, r: Response) -> None:
+        """ take a sample from the Date header of r, which was received just now """
+
+        server_time = get_server_time(r)
+        if server_time is None:
+            return
+
+        rtt = r.elapsed.total_seconds() if r.elapsed else 0.0
+        if rtt > MAX_SAMPLE_RTT:
+            return
+
+        # the server set the header somewhere during the round trip, assume the middle
+        sample = server_time - (time.time() - rtt / 2)
+        with self._lock:
+            self._samples.append(sample)
+            self._offset = statistics.median(self._samples)
+
+    def set_offset(self, offset: float) -> None:
+        """ start from a known offset (e.g. persisted with the session) until responses were seen """
+
+        with self._lock:
+            if not self._samples:
+                self._offset = offset
+
+    def get_offset(self) -> float:
+        """ seconds the server clock is ahead of the local one """
+
+        return self._offset
+
+    def now(self) -> float:
+        """ current server time, as unix time """
+
+        return time.time() + self._offset
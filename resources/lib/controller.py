@@ -18,6 +18,7 @@
 
 import json
 import math
+import os
 
 import xbmc
 import xbmcgui
@@ -25,8 +26,10 @@ import xbmcvfs
 
 from . import utils
 from . import view
+from .deadline import ROUTE_BACKGROUND, start_deadline
 from .globals import G
-from .model import CrunchyrollError, ProfileData
+from .model import Cacheable, CrunchyrollError, ProfileData
+from .tlssession import TLSSessionStore, measure_handshakes
 from .utils import get_listables_from_response
 from .videoplayer import VideoPlayer
 
@@ -496,6 +499,9 @@ def start_playback():
     video_player = VideoPlayer()
     video_player.start_playback()
 
+    # playback is prepared, from here on the requests are background work of unknown duration
+    start_deadline(ROUTE_BACKGROUND)
+
     utils.crunchy_log("Starting loop", xbmc.LOGINFO)
     # stay in this method while playing to not lose video_player, as backgrounds threads reference it
     while (not G.monitor.abortRequested()) and video_player.isStartingOrPlaying():
@@ -687,3 +693,32 @@ def crunchylists_item():
     view.end_of_directory("tvshows")
 
     return None
+
+
+def measure_tls_handshakes() -> bool:
+    """ Compare full and resumed TLS handshakes to the API hosts (settings -> developer options) """
+
+    results = measure_handshakes()
+
+    # keep the result with the warm state of the host
+    store = TLSSessionStore(os.path.join(Cacheable.get_storage_path(), "tls_warm_state.json"))
+    store.load()
+
+    lines = []
+    for host, result in results.items():
+        utils.crunchy_log(f"TLS handshake measurement for {host}: {result}", xbmc.LOGINFO)
+        store.set_measurement(host, result)
+
+        if "error" in result:
+            lines.append(f"{host}: {result['error']}")
+        else:
+            lines.append(
+                f"{host} ({result['tls_version']}): TCP {result['tcp_ms']} ms, full handshake {result['full_ms']} ms, "
+                f"resumed handshake {result['resumed_ms']} ms, resumed {result['resumed']}"
+            )
+
+    store.save()
+
+    xbmcgui.Dialog().textviewer(G.args.addon.getLocalizedString(30247), "\n".join(lines))
+
+    return True
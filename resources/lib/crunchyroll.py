@@ -18,6 +18,7 @@
 
 import random
 import re
+from typing import Optional
 
 import xbmc
 import xbmcaddon
@@ -27,6 +28,9 @@ import xbmcplugin
 from . import controller
 from . import utils
 from . import view
+from .cancellation import RequestCancelled, end_invocation, start_watchdog
+from .deadline import ROUTE_BACKGROUND, ROUTE_LISTING, ROUTE_PLAYBACK, DeadlineExceeded, start_deadline
+from .executor import shutdown_executor
 from .globals import G
 from .model import CrunchyrollError, LoginError
 
@@ -37,6 +41,24 @@ def main(argv):
 
     G.init(argv)
 
+    # abandon outstanding requests as soon as Kodi wants to shut down
+    start_watchdog(G.monitor)
+
+    try:
+        return run()
+    finally:
+        # a token refresh in progress has to store its new token, before anything is cancelled
+        G.api.finish_token_refresh()
+        # the plugin handle is done, nothing still in flight is needed anymore
+        end_invocation()
+        G.api.close()
+        shutdown_executor(wait=False)
+
+
+def run():
+    """Handle the invocation, after G has been initialized
+    """
+
     # inputstream adaptive settings
     if G.args.get_arg('mode') == "hls":
         from inputstreamhelper import Helper  # noqa
@@ -83,6 +105,13 @@ def main(argv):
         )
         return True
 
+    # handle settings->measure tls handshakes
+    if G.args.get_arg('mode') == 'measure_tls_handshakes':
+        return controller.measure_tls_handshakes()
+
+    # connect to the hosts of the route while the session is being restored
+    G.api.preconnect(get_route(get_mode()))
+
     # Start API authentication (uses device authentication)
     try:
         G.api.start()
@@ -95,6 +124,13 @@ def main(argv):
         xbmcplugin.setContent(int(G.args.argv[1]), "tvshows")
 
         return check_mode()
+    except RequestCancelled as e:
+        # the user backed out or Kodi is shutting down, nobody waits for the result anymore
+        utils.crunchy_log(f"Invocation cancelled: {e}", xbmc.LOGDEBUG)
+        return False
+    except DeadlineExceeded as e:
+        utils.show_user_friendly_error("network", str(e))
+        return False
     except (LoginError, CrunchyrollError) as e:
         # login failed - determine error type and show user-friendly message
         error_message = str(e).lower()
@@ -134,6 +170,9 @@ def check_mode():
     else:
         mode = None
 
+    # every request of this invocation inherits the time budget of its route
+    start_deadline(get_route(mode))
+
     if not mode:
         show_main_menu()
 
@@ -197,6 +236,29 @@ def check_mode():
         show_main_menu()
 
 
+def get_mode() -> Optional[str]:
+    """ mode of the invocation, calls from other plugins only pass an id or url (see check_mode) """
+
+    if G.args.get_arg('mode'):
+        return G.args.get_arg('mode')
+    if G.args.get_arg('id') or G.args.get_arg('url'):
+        return "videoplay"
+
+    return None
+
+
+def get_route(mode: Optional[str]) -> str:
+    """ route of a mode, which defines the time budget of the invocation (see deadline.py) """
+
+    if mode == "videoplay":
+        return ROUTE_PLAYBACK
+    # these wait for user input or run for a while in the background
+    if mode in ("profiles_list", "add_to_queue"):
+        return ROUTE_BACKGROUND
+
+    return ROUTE_LISTING
+
+
 def show_main_menu():
     """Show main menu
     """
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+from typing import Optional
+
+import requests
+import xbmc
+
+# routes an invocation can serve
+ROUTE_LISTING = "listing"
+ROUTE_PLAYBACK = "playback"
+ROUTE_BACKGROUND = "background"
+
+# time budget in seconds per route
+ROUTE_BUDGETS = {
+    ROUTE_LISTING: 20.0,
+    ROUTE_PLAYBACK: 30.0,
+    # background work (playhead sync while playing, dialogs waiting for the user) runs for an unknown time,
+    # there the budget applies to each request on its own
+    ROUTE_BACKGROUND: 60.0,
+}
+
+# optional work (e.g. listing enrichment) is only started if at least this much budget is left
+OPTIONAL_RESERVE = 2.0
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """ raised instead of sending a request when the budget of the invocation is spent """
+    pass
+
+
+class Deadline:
+    """ Time budget of an invocation, which every request sent through the API inherits """
+
+    def __init__(self, route: str, budget: Optional[float] = None):
+        self.route: str = route
+        self.budget: float = budget if budget is not None else ROUTE_BUDGETS.get(route, ROUTE_BUDGETS[ROUTE_LISTING])
+        self.per_request: bool = route == ROUTE_BACKGROUND
+        self.started: float = time.monotonic()
+
+    def remaining(self) -> float:
+        if self.per_request:
+            return self.budget
+
+        return max(0.0, self.started + self.budget - time.monotonic())
+
+    def is_expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def has_time_for_optional_work(self) -> bool:
+        return self.remaining() > OPTIONAL_RESERVE
+
+    def get_timeout(self, timeout: float) -> float:
+        """ cap a request timeout to the remaining budget, raise DeadlineExceeded if nothing is left """
+
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Time budget of {self.budget}s for route '{self.route}' is spent")
+
+        return min(timeout, remaining)
+
+
+# deadline of the current invocation, None until a route is known (e.g. during login, which waits for the user)
+_deadline: Optional[Deadline] = None
+
+
+def start_deadline(route: str, budget: Optional[float] = None) -> Deadline:
+    """ start the time budget for the route this invocation serves """
+    global _deadline
+
+    _deadline = Deadline(route, budget)
+
+    from .utils import crunchy_log
+    crunchy_log(f"Deadline: {_deadline.budget}s for route '{route}'", xbmc.LOGDEBUG)
+
+    return _deadline
+
+
+def get_deadline() -> Optional[Deadline]:
+    return _deadline
+
+
+def clear_deadline() -> None:
+    global _deadline
+
+    _deadline = None
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+import xbmc
+
+# the system resolver doesn't tell the TTL of an answer, so answers are kept for a fixed time. the hosts are CDN
+# fronted and rotate addresses, keep this short.
+DEFAULT_TTL = 5 * 60  # seconds
+# if the system resolver fails, answers this old are still used
+STALE_IF_ERROR = 24 * 60 * 60  # seconds
+
+# only names below these domains are cached
+CACHED_DOMAINS = ("crunchyroll.com", "crunchyrollsvc.com")
+
+# the resolver in place before DNSCache.install()
+_system_getaddrinfo = socket.getaddrinfo
+
+
+class DNSCache:
+    """ getaddrinfo() with answers for the API and CDN hosts cached on disk
+
+    Every invocation is a new process, which would otherwise resolve the same hosts again. Installed as
+    socket.getaddrinfo, so it sits below requests, cloudscraper and the async client alike.
+    """
+
+    def __init__(self, storage_file: Optional[str] = None, ttl: int = DEFAULT_TTL):
+        self.storage_file: Optional[str] = storage_file
+        self.ttl: int = ttl
+        self._lock = threading.Lock()
+        # "host|family" -> {"resolved": timestamp, "addresses": [[family, proto, ip], ...]}
+        self._entries: Dict[str, Dict] = {}
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0}
+        self._dirty = False
+
+    @staticmethod
+    def is_cached_host(host) -> bool:
+        if not isinstance(host, str):
+            return False
+
+        host = host.lower().rstrip(".")
+        return any(host == domain or host.endswith("." + domain) for domain in CACHED_DOMAINS)
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """ drop-in for socket.getaddrinfo() """
+
+        # only plain stream lookups by name and numeric port are cached, which is what HTTP clients do. service
+        # names ("https") are left to the system resolver.
+        numeric_port = _get_numeric_port(port)
+        if (
+                flags or proto or type not in (0, socket.SOCK_STREAM) or numeric_port is None
+                or not self.is_cached_host(host)
+        ):
+            return _system_getaddrinfo(host, port, family, type, proto, flags)
+
+        key = "%s|%d" % (host.lower(), int(family))
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry["resolved"] < self.ttl:
+                self._stats["hits"] += 1
+                return self._to_addrinfo(entry["addresses"], numeric_port)
+
+        try:
+            result = _system_getaddrinfo(host, port, family, socket.SOCK_STREAM)
+        except socket.gaierror:
+            with self._lock:
+                if entry is not None and now - entry["resolved"] < STALE_IF_ERROR:
+                    self._stats["stale"] += 1
+                    return self._to_addrinfo(entry["addresses"], numeric_port)
+            raise
+
+        addresses = [
+            [int(res_family), res_proto, sockaddr[0]]
+            for res_family, _, res_proto, _, sockaddr in result
+            if res_family in (socket.AF_INET, socket.AF_INET6)
+        ]
+
+        with self._lock:
+            self._stats["misses"] += 1
+            # the file is only rewritten for new or refreshed answers, the stats are saved along with them
+            if addresses:
+                self._entries[key] = {"resolved": now, "addresses": addresses}
+                self._dirty = True
+
+        return result
+
+    @staticmethod
+    def _to_addrinfo(addresses: List, port: int) -> List:
+        result = []
+        for family, proto, ip in addresses:
+            family = socket.AddressFamily(family)
+            sockaddr = (ip, port) if family == socket.AF_INET else (ip, port, 0, 0)
+            result.append((family, socket.SOCK_STREAM, proto, "", sockaddr))
+
+        return result
+
+    def install(self) -> None:
+        """ resolve through this cache from now on """
+
+        socket.getaddrinfo = self.getaddrinfo
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+
+        lookups = stats["hits"] + stats["misses"] + stats["stale"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale"]) / lookups, 3) if lookups else None
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def load(self) -> None:
+        if not self.storage_file or not os.path.isfile(self.storage_file):
+            return
+
+        try:
+            with open(self.storage_file, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            from .utils import crunchy_log
+            crunchy_log(f"Failed to load DNS cache: {e}", xbmc.LOGDEBUG)
+            return
+
+        now = time.time()
+        with self._lock:
+            self._entries = {
+                key: entry
+                for key, entry in data.get("entries", {}).items()
+                if now - entry.get("resolved", 0) < STALE_IF_ERROR
+            }
+            self._stats.update(data.get("stats", {}))
+
+    def save(self) -> None:
+        if not self.storage_file:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({"entries": self._entries, "stats": self._stats})
+            self._dirty = False
+
+        from .utils import crunchy_log, write_file_atomic
+        try:
+            write_file_atomic(self.storage_file, data)
+        except OSError as e:
+            crunchy_log(f"Failed to save DNS cache: {e}", xbmc.LOGDEBUG)
+
+
+def _get_numeric_port(port) -> Optional[int]:
+    """ port as int, None for a service name """
+
+    if port is None:
+        return 0
+
+    try:
+        return int(port)
+    except (TypeError, ValueError):
+        return None
+
+
+def uninstall() -> None:
+    socket.getaddrinfo = _system_getaddrinfo
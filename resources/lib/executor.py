@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import xbmc
+
+from .cancellation import get_cancel_token
+
+
+class RequestExecutor:
+    """ Bounded worker pool to run blocking API requests concurrently
+
+    The requests lib is blocking, so wrapping its calls in coroutines alone does not make them run in parallel.
+    Blocking calls are handed to this pool instead. Each worker thread uses its own HTTP session (see API.http),
+    so listing enrichment or playback preparation costs max(latency) instead of sum(latency).
+    """
+
+    def __init__(self, max_workers: int = 6):
+        self.max_workers: int = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        # create lazily, most invocations never need worker threads
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="crunchyroll-worker"
+                )
+            return self._pool
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """ schedule fn(*args, **kwargs) on a worker thread
+
+        It runs in a copy of the caller's context, so e.g. the request priority (see scheduler.py) carries over.
+        """
+
+        return self._get_pool().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+# Global executor instance (lazy loaded)
+_executor: Optional[RequestExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> RequestExecutor:
+    """ Get global request executor instance """
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            return _executor
+        executor = _executor = RequestExecutor()
+
+    # drop queued calls once the invocation is cancelled, running ones can't be interrupted
+    get_cancel_token().add_callback(lambda: shutdown_executor(wait=False, cancel_futures=True))
+
+    return executor
+
+
+def shutdown_executor(wait: bool = True, cancel_futures: bool = False) -> None:
+    """ Shutdown global request executor instance """
+    global _executor
+
+    with _executor_lock:
+        executor = _executor
+        _executor = None
+
+    if executor is not None:
+        try:
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+        except Exception as e:
+            from .utils import crunchy_log
+            crunchy_log(f"Error during executor shutdown: {e}", xbmc.LOGDEBUG)
+
+
+async def run_in_executor(fn: Callable, *args, **kwargs) -> Any:
+    """ await a blocking call that runs on the global request executor """
+
+    return await asyncio.wrap_future(get_executor().submit(fn, *args, **kwargs))
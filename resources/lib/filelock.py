@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import threading
+import time
+from typing import Optional
+
+import xbmc
+
+from .cancellation import get_cancel_token
+
+# how long to wait for another process to release the lock before going ahead without it
+LOCK_TIMEOUT = 45.0  # seconds
+# a lock file older than this was left behind by a process that died while holding it. a token refresh takes at
+# most two requests with a 30s timeout each.
+STALE_AFTER = 90.0  # seconds
+POLL_INTERVAL = 0.1  # seconds
+
+
+class FileLock:
+    """ Lock shared by all plugin processes (widgets, playback, the directory being browsed), and their threads
+
+    Re-entrant within a thread. The lock is a file created with O_EXCL, which works on every platform and file system
+    Kodi runs on. Without a path it only locks the threads of this process.
+    """
+
+    def __init__(self, path: Optional[str] = None, timeout: float = LOCK_TIMEOUT, stale_after: float = STALE_AFTER):
+        self.path: Optional[str] = path
+        self.timeout: float = timeout
+        self.stale_after: float = stale_after
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._owns_file = False
+
+    def acquire(self) -> bool:
+        """ returns True if the lock was taken now, False if this thread already held it """
+
+        self._thread_lock.acquire()
+        self._depth += 1
+        if self._depth > 1:
+            return False
+
+        if self.path:
+            try:
+                self._owns_file = self._acquire_file()
+            except BaseException:
+                self._depth -= 1
+                self._thread_lock.release()
+                raise
+
+        return True
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._owns_file:
+            self._owns_file = False
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+        self._thread_lock.release()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+    def _acquire_file(self) -> bool:
+        from .utils import crunchy_log
+
+        cancel_token = get_cancel_token()
+        started = time.monotonic()
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                pass
+            except OSError as e:
+                crunchy_log(f"FileLock: can't create {self.path}: {e}, going ahead without it", xbmc.LOGWARNING)
+                return False
+            else:
+                with os.fdopen(fd, "w") as file:
+                    file.write(str(os.getpid()))
+                return True
+
+            if self._remove_if_stale():
+                continue
+
+            if time.monotonic() - started > self.timeout:
+                crunchy_log(f"FileLock: {self.path} still held after {self.timeout:.0f}s, going ahead without it",
+                            xbmc.LOGWARNING)
+                return False
+
+            if cancel_token.wait(POLL_INTERVAL):
+                cancel_token.raise_if_cancelled()
+
+    def _remove_if_stale(self) -> bool:
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+        except OSError:
+            # released in the meantime
+            return True
+
+        if age < self.stale_after:
+            return False
+
+        from .utils import crunchy_log
+        crunchy_log(f"FileLock: removing stale lock {self.path} ({age:.0f}s old)", xbmc.LOGWARNING)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+        return True
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import xbmc
+from requests import Response
+
+# query params that change with every session and must not be part of the cache key
+SIGNING_PARAMS = ("Policy", "Signature", "Key-Pair-Id")
+
+# how long an expired entry may still be served if the API can't be reached (stale-if-error)
+STALE_IF_ERROR = 24 * 60 * 60
+
+# entries not used for this long are removed by prune()
+MAX_AGE = 7 * 24 * 60 * 60
+PRUNE_INTERVAL = 24 * 60 * 60
+
+
+class CacheEntry:
+    def __init__(self, data: Dict):
+        self.url: str = data.get("url")
+        self.data: Optional[Dict] = data.get("data")
+        self.etag: Optional[str] = data.get("etag")
+        self.last_modified: Optional[str] = data.get("last_modified")
+        self.stored: float = data.get("stored", 0)
+        self.ttl: int = data.get("ttl", 0)
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.stored + self.ttl
+
+    def is_usable_on_error(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.stored + self.ttl + STALE_IF_ERROR
+
+    def get_validators(self) -> Dict:
+        """ headers to revalidate this entry with a conditional request """
+
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_dict(self) -> Dict:
+        return {
+            "url": self.url,
+            "data": self.data,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "stored": self.stored,
+            "ttl": self.ttl,
+        }
+
+
+class CacheLookup:
+    """ result of ResponseCache.lookup() for a single request """
+
+    def __init__(self, key: str, ttl: int, entry: Optional[CacheEntry]):
+        self.key: str = key
+        self.ttl: int = ttl
+        self.entry: Optional[CacheEntry] = entry
+
+    def is_fresh(self) -> bool:
+        return self.entry is not None and self.entry.is_fresh()
+
+    def can_serve_stale(self) -> bool:
+        return self.entry is not None and self.entry.is_usable_on_error()
+
+    def get_validators(self) -> Dict:
+        return self.entry.get_validators() if self.entry is not None else {}
+
+
+class ResponseCache:
+    """ On-disk cache for parsed API responses of content endpoints
+
+    Only endpoints listed in rules are cached, each with its own TTL. Fresh entries are served without a request,
+    expired ones are revalidated with If-None-Match / If-Modified-Since, so navigating back and forth mostly
+    costs a 304 or nothing at all. If the API fails, an expired entry is served for another STALE_IF_ERROR seconds.
+    """
+
+    def __init__(self, path: str, rules: List[Tuple[str, int]]):
+        self.path: str = path
+        self.rules: List[Tuple[re.Pattern, int]] = [(re.compile(pattern), ttl) for pattern, ttl in rules]
+
+    def get_ttl(self, method: str, url: str) -> Optional[int]:
+        """ TTL of the endpoint class the url belongs to, None if it should not be cached """
+
+        if method.upper() != "GET":
+            return None
+
+        for pattern, ttl in self.rules:
+            if pattern.match(url):
+                return ttl
+
+        return None
+
+    def lookup(
+            self,
+            method: str,
+            url: str,
+            params: Optional[Dict],
+            profile_id: Optional[str],
+            locale: Optional[str]
+    ) -> Optional[CacheLookup]:
+        """ find the cache entry for a request, None if the request is not cacheable at all """
+
+        ttl = self.get_ttl(method, url)
+        if ttl is None:
+            return None
+
+        key = self.make_key(url, params, profile_id, locale)
+        return CacheLookup(key, ttl, self.get(key))
+
+    def resolve(self, lookup: CacheLookup, url: str, r: Response, parse) -> Optional[Dict]:
+        """ handle the response to a (conditional) request and return the data to use """
+
+        from .utils import crunchy_log
+
+        if lookup.entry is not None and r.status_code == 304:
+            crunchy_log(f"ResponseCache: not modified: {url}", xbmc.LOGDEBUG)
+            self.refresh(lookup.key, lookup.entry, r, lookup.ttl)
+            return lookup.entry.data
+
+        if r.status_code >= 500 and lookup.can_serve_stale():
+            crunchy_log(f"ResponseCache: HTTP {r.status_code}, serving stale entry: {url}", xbmc.LOGINFO)
+            return lookup.entry.data
+
+        data = parse(r)
+        if r.status_code == 200:
+            self.store(lookup.key, url, r, data, lookup.ttl)
+
+        return data
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict], profile_id: Optional[str], locale: Optional[str]) -> str:
+        unsigned = sorted(
+            (str(name), str(value)) for name, value in (params or {}).items() if name not in SIGNING_PARAMS
+        )
+        raw = json.dumps([url, unsigned, profile_id or "", locale or ""])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _get_file(self, key: str) -> str:
+        return os.path.join(self.path, key + ".json")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        file_name = self._get_file(key)
+        try:
+            with open(file_name, "r", encoding="utf-8") as file:
+                entry = CacheEntry(json.load(file))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            from .utils import crunchy_log
+            crunchy_log(f"ResponseCache: dropping unreadable entry {key}: {e}", xbmc.LOGDEBUG)
+            self.delete(key)
+            return None
+
+        # the mtime is the last use of the entry, which prune() goes by
+        try:
+            os.utime(file_name)
+        except OSError:
+            pass
+
+        return entry
+
+    def store(self, key: str, url: str, r: Response, data: Optional[Dict], ttl: int) -> None:
+        cache_control = r.headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control:
+            return
+
+        # the endpoint TTL is a minimum, if the API itself allows caching for longer, do so
+        max_age = re.search(r"max-age=(\d+)", cache_control)
+        if max_age:
+            ttl = max(ttl, int(max_age.group(1)))
+
+        self._write(key, CacheEntry({
+            "url": url,
+            "data": data,
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "stored": time.time(),
+            "ttl": ttl,
+        }))
+
+    def refresh(self, key: str, entry: CacheEntry, r: Response, ttl: int) -> None:
+        """ entry was confirmed by a 304, restart its lifetime and pick up updated validators """
+
+        entry.etag = r.headers.get("ETag", entry.etag)
+        entry.last_modified = r.headers.get("Last-Modified", entry.last_modified)
+        entry.stored = time.time()
+        entry.ttl = ttl
+        self._write(key, entry)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._get_file(key))
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        for name in self._list():
+            self.delete(name[:-5])
+
+    def prune(self) -> None:
+        """ remove entries that haven't been used for MAX_AGE, at most once per PRUNE_INTERVAL """
+
+        marker = os.path.join(self.path, ".pruned")
+        now = time.time()
+
+        try:
+            if now - os.path.getmtime(marker) < PRUNE_INTERVAL:
+                return
+        except OSError:
+            pass
+
+        for name in self._list():
+            file = os.path.join(self.path, name)
+            try:
+                if now - os.path.getmtime(file) > MAX_AGE:
+                    os.remove(file)
+            except OSError:
+                pass
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(marker, "w"):
+                pass
+        except OSError:
+            pass
+
+    def _list(self) -> List[str]:
+        try:
+            return [name for name in os.listdir(self.path) if name.endswith(".json")]
+        except OSError:
+            return []
+
+    def _write(self, key: str, entry: CacheEntry) -> None:
+        from .utils import crunchy_log, write_file_atomic
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            write_file_atomic(self._get_file(key), json.dumps(entry.to_dict()))
+        except (OSError, TypeError, ValueError) as e:
+            crunchy_log(f"ResponseCache: failed to write entry {key}: {e}", xbmc.LOGDEBUG)
@@ -14,11 +14,13 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import calendar
 import json
 import re
 import sys
+import time
 from abc import abstractmethod
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Union
 
 import xbmcgui
 import xbmcvfs
@@ -190,15 +192,16 @@ class Cacheable(Object):
         xbmcvfs.delete(storage_file)
 
     def write_to_storage(self) -> bool:
+        from .utils import write_file_atomic
+
         storage_file = self.get_storage_path() + self.get_cache_file_name()
 
         # serialize (Object has a to_str serializer)
         json_string = str(self)
 
-        with xbmcvfs.File(storage_file, 'w') as file:
-            result = file.write(json_string)
+        write_file_atomic(storage_file, json_string)
 
-        return result
+        return True
 
 
 class CMS(Object):
@@ -231,10 +234,29 @@ class AccountData(Cacheable):
         self.default_audio_language: str = data.get("preferred_content_audio_language")
         self.username: str = data.get("username")
         self.user_agent_type: str = data.get('user_agent_type')
+        # server clock minus local clock in seconds when the token was issued, see clockskew.py
+        self.clock_offset: float = data.get('clock_offset')
+        # set while the token is one of a profile switched to from the vault, until exchanged (see profilevault.py)
+        self.pending_profile_id: str = data.get('pending_profile_id')
+        # expires as unix time, parsed once instead of on every request (see get_expires_at)
+        self._expires_at: Optional[float] = None
+        self._expires_parsed: Optional[str] = None
 
     def get_cache_file_name(self) -> str:
         return 'session_data.json'
 
+    def get_expires_at(self) -> Optional[float]:
+        """ expiry of the access token as unix time, None if unknown """
+
+        if self.expires != self._expires_parsed:
+            self._expires_parsed = self.expires
+            try:
+                self._expires_at = calendar.timegm(time.strptime(self.expires, "%Y-%m-%dT%H:%M:%SZ"))
+            except (TypeError, ValueError):
+                self._expires_at = None
+
+        return self._expires_at
+
 
 class ListableItem(Object):
     """ Base object for all DataObjects below that can be displayed in a Kodi List View """
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import threading
+import time
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+import requests
+import xbmc
+
+from .cancellation import get_cancel_token
+
+# upper bound for a speculative connect, it must never hold up the request waiting for it for long
+PRECONNECT_TIMEOUT = 5.0  # seconds
+
+
+def open_pooled_connection(session: requests.Session, url: str, timeout: float) -> bool:
+    """ connect (TCP + TLS) to the host of url and put the connection into the pool of session
+
+    The pool is looked up the same way requests does for a GET of url, so the next request to the host picks the
+    connection up. Returns False if the pool had an open connection already.
+    """
+
+    # TLS settings as requests resolves them for a request (e.g. REQUESTS_CA_BUNDLE)
+    settings = session.merge_environment_settings(url, {}, None, None, None)
+
+    adapter = session.get_adapter(url)
+    if hasattr(adapter, "get_connection_with_tls_context"):
+        # requests >= 2.32.2, pools are keyed by their TLS settings
+        pool = adapter.get_connection_with_tls_context(
+            requests.Request("GET", url).prepare(),
+            verify=settings["verify"],
+            cert=settings["cert"]
+        )
+    else:
+        pool = adapter.get_connection(url)
+        adapter.cert_verify(pool, url, settings["verify"], settings["cert"])
+
+    # take a slot of the pool, it hands out either an idle connection or a new, unconnected one
+    connection = pool._get_conn()
+    if getattr(connection, "sock", None) is not None:
+        pool._put_conn(connection)
+        return False
+
+    try:
+        connection.timeout = timeout
+        connection.connect()
+    except Exception:
+        connection.close()
+        pool._put_conn(None)
+        raise
+
+    pool._put_conn(connection)
+    return True
+
+
+class Preconnector:
+    """ Opens connections for a requests session speculatively, on background threads
+
+    A request to a host with a connect in progress waits for it (see wait()), as finishing the handshake under
+    way is quicker than starting a new one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[requests.Session, threading.Event]] = {}
+
+    def start(self, session: requests.Session, url: str, timeout: float = PRECONNECT_TIMEOUT) -> threading.Thread:
+        host = urlsplit(url).hostname
+        done = threading.Event()
+        with self._lock:
+            self._pending[host] = (session, done)
+
+        thread = threading.Thread(
+            target=self._run,
+            args=(session, url, min(timeout, PRECONNECT_TIMEOUT), done),
+            name="crunchyroll-preconnect",
+            daemon=True
+        )
+        thread.start()
+        return thread
+
+    def wait(self, session: requests.Session, host: str) -> None:
+        """ wait for a connect in progress to host, if it is for session """
+
+        with self._lock:
+            pending = self._pending.get(host)
+
+        if pending is not None and pending[0] is session:
+            pending[1].wait(PRECONNECT_TIMEOUT)
+
+    def _run(self, session: requests.Session, url: str, timeout: float, done: threading.Event) -> None:
+        from .utils import crunchy_log
+
+        started = time.monotonic()
+        try:
+            if not get_cancel_token().is_cancelled():
+                opened = open_pooled_connection(session, url, timeout)
+                crunchy_log(
+                    "Preconnect to %s: %s after %.0f ms" % (
+                        url, "connected" if opened else "pool already connected", (time.monotonic() - started) * 1000
+                    ),
+                    xbmc.LOGDEBUG
+                )
+        except Exception as e:
+            # nothing lost, the first request connects on its own
+            crunchy_log(f"Preconnect to {url} failed: {e}", xbmc.LOGDEBUG)
+        finally:
+            with self._lock:
+                host = urlsplit(url).hostname
+                if self._pending.get(host, (None, None))[1] is done:
+                    del self._pending[host]
+            done.set()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import os
+from typing import Dict, Optional
+
+from .model import AccountData
+
+# a bundle is only swapped in while its access token is good for at least this long, the same buffer
+# API.is_token_valid() applies
+MIN_LIFETIME = 60  # seconds
+
+
+class ProfileVault:
+    """ Session bundles (account data with tokens, profile data) per profile of the account
+
+    Switching back to a profile used recently swaps its bundle in locally. Only the access token of a bundle is
+    used, refresh tokens rotate and the one of a bundle was spent on the switch away from it. Bundles are dropped
+    once their access token expired.
+    """
+
+    def __init__(self, storage_file: str):
+        self.storage_file: str = storage_file
+
+    def get(self, account_id: Optional[str], profile_id: Optional[str], now: float) -> Optional[Dict[str, Dict]]:
+        """ the bundle of profile_id, if its access token is valid at now (server time) """
+
+        if not account_id or not profile_id:
+            return None
+
+        bundle = self._read().get(profile_id)
+        if not bundle or bundle["account"].get("account_id") != account_id or not bundle.get("profile"):
+            return None
+
+        expires_at = AccountData(bundle["account"]).get_expires_at()
+        if expires_at is None or now >= expires_at - MIN_LIFETIME:
+            return None
+
+        return bundle
+
+    def store(self, profile_id: Optional[str], account: Dict, profile: Optional[Dict], now: float) -> None:
+        """ keep the session of profile_id. without profile, the profile data stored before is kept """
+
+        if not profile_id:
+            return
+
+        bundles = self._read()
+        if profile is None:
+            profile = (bundles.get(profile_id) or {}).get("profile")
+
+        bundles = {
+            key: bundle for key, bundle in bundles.items()
+            if key != profile_id and (AccountData(bundle["account"]).get_expires_at() or 0) > now
+        }
+        bundles[profile_id] = {"account": account, "profile": profile}
+
+        self._write(bundles)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.storage_file)
+        except OSError:
+            pass
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.storage_file, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, bundles: Dict[str, Dict]) -> None:
+        from .utils import crunchy_log, write_file_atomic
+
+        try:
+            write_file_atomic(self.storage_file, json.dumps(bundles))
+        except OSError as e:
+            crunchy_log(f"ProfileVault: failed to save: {e}")
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+from requests import Response
+
+# Retry-After values are capped, a server asking for more can't be waited for within an invocation anyway
+MAX_RETRY_AFTER = 60.0  # seconds
+# used for a 429 without (valid) Retry-After
+DEFAULT_RETRY_AFTER = 1.0  # seconds
+
+
+def get_retry_after(r: Response) -> Optional[float]:
+    """ seconds to wait according to the Retry-After header of r (delay-seconds or HTTP-date), if any """
+
+    value = r.headers.get("Retry-After") if r.headers else None
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+
+    return min(MAX_RETRY_AFTER, max(0.0, seconds))
+
+
+class TokenBucket:
+    """ rate requests per second with bursts of up to capacity
+
+    reserve() takes a token right away and returns how long to wait before using it, so requests queue in the order
+    they arrive and tokens can go negative while they wait.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        # time the tokens were last refilled, in the future while paused
+        self.updated: float = time.monotonic()
+        self.throttled: int = 0
+        self.queued: int = 0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+
+        delay = max(0.0, self.updated - now)
+        if self.tokens < 0:
+            delay += -self.tokens / self.rate
+        if delay > 0:
+            self.queued += 1
+
+        return delay
+
+    def pause(self, seconds: float) -> None:
+        """ stop handing out tokens for seconds, then restart with an empty bucket so waiting requests are spaced """
+
+        now = time.monotonic()
+        self._refill(now)
+        self.throttled += 1
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = max(self.updated, now + seconds)
+
+    def get_state(self) -> Dict:
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "tokens": round(self.tokens, 2),
+            "paused_for": round(max(0.0, self.updated - now), 2),
+            "queued": self.queued,
+            "throttled": self.throttled,
+        }
+
+
+class RateLimiter:
+    """ Token buckets per endpoint family, so bursts of requests queue on our side instead of tripping 429s
+
+    rules are (family, url pattern, requests per second, burst) tuples, the first matching pattern wins. Requests
+    to urls without a family are not limited.
+    """
+
+    def __init__(self, rules: List[Tuple[str, str, float, float]]):
+        self._lock = threading.Lock()
+        self._rules = [(family, re.compile(pattern)) for family, pattern, _, _ in rules]
+        self._buckets: Dict[str, TokenBucket] = {
+            family: TokenBucket(rate, capacity) for family, _, rate, capacity in rules
+        }
+
+    def get_family(self, url: str) -> Optional[str]:
+        for family, pattern in self._rules:
+            if pattern.search(url):
+                return family
+        return None
+
+    def reserve(self, url: str) -> float:
+        """ take a token for a request to url, returns the seconds to wait before sending it """
+
+        family = self.get_family(url)
+        if family is None:
+            return 0.0
+
+        with self._lock:
+            return self._buckets[family].reserve()
+
+    def observe(self, url: str, r: Response) -> Optional[float]:
+        """ pause the family of url if r says we are throttled. returns the pause in seconds, if any """
+
+        retry_after = get_retry_after(r) if r.status_code in (429, 503) else None
+        if retry_after is None and r.status_code == 429:
+            retry_after = DEFAULT_RETRY_AFTER
+        if retry_after is None:
+            return None
+
+        family = self.get_family(url)
+        if family is None:
+            return None
+
+        from .utils import crunchy_log
+        crunchy_log(f"RateLimiter: {family} throttled (HTTP {r.status_code}), pausing for {retry_after:.1f}s")
+
+        with self._lock:
+            self._buckets[family].pause(retry_after)
+
+        return retry_after
+
+    def get_pause(self, url: str) -> float:
+        """ seconds until the family of url hands out tokens again """
+
+        family = self.get_family(url)
+        if family is None:
+            return 0.0
+
+        with self._lock:
+            return max(0.0, self._buckets[family].updated - time.monotonic())
+
+    def get_state(self) -> Dict[str, Dict]:
+        """ state of all buckets, for diagnostics """
+
+        with self._lock:
+            return {family: bucket.get_state() for family, bucket in self._buckets.items()}
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import math
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+import xbmc
+
+# only these are retried, repeating a POST or DELETE could apply it twice
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+MAX_RETRIES = 2
+RETRY_BASE_DELAY = 0.3  # seconds
+RETRY_MAX_DELAY = 2.0  # seconds
+
+# adaptive timeouts: a multiple of the observed p95 latency, within bounds
+DEFAULT_TIMEOUT = 30.0
+MIN_TIMEOUT = 5.0
+MAX_TIMEOUT = 30.0
+TIMEOUT_P95_FACTOR = 3.0
+MIN_SAMPLES = 5
+MAX_SAMPLES = 50
+
+# hedging: requests not answered by the p90 latency of their host are sent to an alternate host as well
+HEDGE_PERCENTILE = 90
+
+# circuit breaker: fail fast for a while after repeated failures
+FAILURE_THRESHOLD = 3
+OPEN_SECONDS = 30.0
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """ raised instead of sending a request to a host that failed repeatedly """
+    pass
+
+
+def get_retry_delay(attempt: int) -> float:
+    """ exponential backoff with full jitter, so parallel requests don't retry in lockstep """
+
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def is_retryable_status(status_code: int) -> bool:
+    return status_code >= 500
+
+
+class HostStats:
+    def __init__(self, data: Optional[Dict] = None):
+        data = data or {}
+        self.latencies: List[float] = data.get("latencies", [])[-MAX_SAMPLES:]
+        self.requests: int = data.get("requests", 0)
+        self.errors: int = data.get("errors", 0)
+        self.consecutive_failures: int = data.get("consecutive_failures", 0)
+        # wall clock, as the state is shared between invocations
+        self.open_until: float = data.get("open_until", 0.0)
+        # hedged requests, and how often the alternate host answered first
+        self.hedges: int = data.get("hedges", 0)
+        self.hedge_wins: int = data.get("hedge_wins", 0)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+
+        ordered = sorted(self.latencies)
+        index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return ordered[index]
+
+    def to_dict(self) -> Dict:
+        return {
+            "latencies": self.latencies,
+            "requests": self.requests,
+            "errors": self.errors,
+            "consecutive_failures": self.consecutive_failures,
+            "open_until": self.open_until,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+class HostHealth:
+    """ Tracks latency and errors per host, derives timeouts from them and opens a circuit for failing hosts
+
+    While a circuit is open, requests to that host fail fast with CircuitOpenError instead of waiting for a
+    timeout, which lets callers fall back to cached data. After OPEN_SECONDS requests are let through again, the
+    first success closes the circuit. The state is persisted, so the next invocation doesn't start blind.
+    """
+
+    def __init__(self, storage_file: Optional[str] = None):
+        self.storage_file: Optional[str] = storage_file
+        self._hosts: Dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, host: str) -> HostStats:
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = HostStats()
+        return stats
+
+    def check(self, host: str) -> None:
+        """ raise CircuitOpenError if requests to host should fail fast """
+
+        with self._lock:
+            stats = self._get(host)
+            if stats.open_until > time.time():
+                raise CircuitOpenError(f"Circuit open for {host}, failing fast")
+
+    def get_timeout(self, host: str) -> float:
+        with self._lock:
+            stats = self._get(host)
+            if len(stats.latencies) < MIN_SAMPLES:
+                return DEFAULT_TIMEOUT
+            p95 = stats.percentile(95)
+
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, p95 * TIMEOUT_P95_FACTOR))
+
+    def get_hedge_delay(self, host: str) -> Optional[float]:
+        """ how long to wait for host before hedging a request, None until there are enough samples """
+
+        with self._lock:
+            stats = self._get(host)
+            if len(stats.latencies) < MIN_SAMPLES:
+                return None
+            return stats.percentile(HEDGE_PERCENTILE)
+
+    def record_hedge(self, host: str, won: bool, elapsed: float) -> None:
+        """ count a hedged request to host, won is True if the alternate host answered first
+
+        The request to host was abandoned then, its elapsed time is still recorded as a (lower bound) latency sample,
+        otherwise the slow tail would vanish from the percentiles.
+        """
+
+        with self._lock:
+            stats = self._get(host)
+            stats.hedges += 1
+            if won:
+                stats.hedge_wins += 1
+                stats.latencies.append(round(elapsed, 3))
+                del stats.latencies[:-MAX_SAMPLES]
+
+    def record_success(self, host: str, latency: float) -> None:
+        with self._lock:
+            stats = self._get(host)
+            stats.requests += 1
+            stats.latencies.append(round(latency, 3))
+            del stats.latencies[:-MAX_SAMPLES]
+            stats.consecutive_failures = 0
+            stats.open_until = 0.0
+
+    def record_failure(self, host: str, final: bool = True) -> None:
+        """ count a failed attempt to reach host
+
+        Every attempt counts for the error rate. Only requests that failed for good (final, no retry left) count
+        towards opening the circuit, so the retries of a single request can't block the whole host.
+        """
+        from .utils import crunchy_log
+
+        with self._lock:
+            stats = self._get(host)
+            stats.requests += 1
+            stats.errors += 1
+            if not final:
+                return
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= FAILURE_THRESHOLD:
+                stats.open_until = time.time() + OPEN_SECONDS
+                crunchy_log(
+                    f"HostHealth: {host} failed {stats.consecutive_failures} times, opening circuit",
+                    xbmc.LOGWARNING
+                )
+
+    def get_stats(self, host: str) -> Dict:
+        """ summary for logging and tests """
+
+        with self._lock:
+            return self._summarize(self._get(host))
+
+    def get_all_stats(self) -> Dict[str, Dict]:
+        """ summary of every known host, logged when the invocation ends """
+
+        with self._lock:
+            return {host: self._summarize(stats) for host, stats in self._hosts.items()}
+
+    @staticmethod
+    def _summarize(stats: HostStats) -> Dict:
+        return {
+            "requests": stats.requests,
+            "error_rate": stats.errors / stats.requests if stats.requests else 0.0,
+            "p90": stats.percentile(90),
+            "p95": stats.percentile(95),
+            "circuit_open": stats.open_until > time.time(),
+            "hedge_win_rate": stats.hedge_wins / stats.hedges if stats.hedges else None,
+        }
+
+    def load(self) -> None:
+        if not self.storage_file:
+            return
+
+        try:
+            with open(self.storage_file, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            self._hosts = {host: HostStats(stats) for host, stats in data.items()}
+
+    def save(self) -> None:
+        if not self.storage_file:
+            return
+
+        with self._lock:
+            data = {host: stats.to_dict() for host, stats in self._hosts.items()}
+
+        from .utils import crunchy_log, write_file_atomic
+        try:
+            write_file_atomic(self.storage_file, json.dumps(data))
+        except OSError as e:
+            crunchy_log(f"HostHealth: failed to save state: {e}", xbmc.LOGDEBUG)
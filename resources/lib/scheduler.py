@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from .cancellation import get_cancel_token
+from .deadline import ROUTE_BACKGROUND, ROUTE_PLAYBACK, get_deadline
+
+# priority classes, lower runs first
+PRIORITY_INTERACTIVE = 0  # listings the user is waiting for
+PRIORITY_PLAYBACK = 1  # everything needed to start playback
+PRIORITY_ENRICHMENT = 2  # optional listing data, e.g. playheads and artwork
+PRIORITY_BACKGROUND = 3  # playhead sync and other work nobody waits for
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_PLAYBACK: "playback",
+    PRIORITY_ENRICHMENT: "enrichment",
+    PRIORITY_BACKGROUND: "background",
+}
+
+# requests in flight per class, and in total. enrichment and background together stay below the total, so there
+# are always slots left for the foreground classes.
+CLASS_LIMITS = {
+    PRIORITY_INTERACTIVE: 6,
+    PRIORITY_PLAYBACK: 6,
+    PRIORITY_ENRICHMENT: 4,
+    PRIORITY_BACKGROUND: 2,
+}
+MAX_CONCURRENT = 8
+
+# priority of requests without an explicit one, by the route of the invocation (see deadline.py)
+ROUTE_PRIORITIES = {
+    ROUTE_PLAYBACK: PRIORITY_PLAYBACK,
+    ROUTE_BACKGROUND: PRIORITY_BACKGROUND,
+}
+
+# priority of the requests sent from the current context. copied into tasks and executor calls created from it.
+_priority: ContextVar[Optional[int]] = ContextVar("crunchyroll_request_priority", default=None)
+
+
+def get_request_priority() -> int:
+    priority = _priority.get()
+    if priority is not None:
+        return priority
+
+    deadline = get_deadline()
+    if deadline is None:
+        return PRIORITY_INTERACTIVE
+
+    return ROUTE_PRIORITIES.get(deadline.route, PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """ send the requests of this block, and of tasks created in it, with priority """
+
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _Waiter:
+    def __init__(self, priority: int, order: int, wake: Callable[[], None]):
+        self.priority: int = priority
+        self.order: int = order
+        self.wake: Callable[[], None] = wake
+        self.granted: bool = False
+        self.since: float = time.monotonic()
+
+
+class RequestScheduler:
+    """ Bounded concurrency per priority class, with freed slots going to the highest priority waiting
+
+    Requests hold a slot only while they are on the wire. Works for threads (slot()) and coroutines on any event
+    loop (async_slot()) alike, as both are used to send requests.
+    """
+
+    def __init__(self, limits: Optional[Dict[int, int]] = None, max_concurrent: int = MAX_CONCURRENT):
+        self.limits: Dict[int, int] = dict(limits or CLASS_LIMITS)
+        self.max_concurrent: int = max_concurrent
+        self._lock = threading.Lock()
+        self._in_flight: Dict[int, int] = {priority: 0 for priority in self.limits}
+        self._total = 0
+        self._waiters: List[_Waiter] = []
+        self._order = itertools.count()
+        self._stats: Dict[int, Dict] = {
+            priority: {"requests": 0, "waited": 0, "wait_time": 0.0} for priority in self.limits
+        }
+
+    def _can_run(self, priority: int) -> bool:
+        return self._total < self.max_concurrent and self._in_flight[priority] < self.limits[priority]
+
+    def _take(self, priority: int) -> None:
+        self._in_flight[priority] += 1
+        self._total += 1
+        self._stats[priority]["requests"] += 1
+
+    def _release(self, priority: int) -> None:
+        """ free a slot and hand it to the waiter with the highest priority, must hold the lock """
+
+        self._in_flight[priority] -= 1
+        self._total -= 1
+
+        # waiters are kept in order of priority, then arrival
+        for waiter in list(self._waiters):
+            if self._can_run(waiter.priority):
+                self._waiters.remove(waiter)
+                self._take(waiter.priority)
+                waiter.granted = True
+                stats = self._stats[waiter.priority]
+                stats["waited"] += 1
+                stats["wait_time"] += time.monotonic() - waiter.since
+                waiter.wake()
+
+    def _try_take_or_wait(self, priority: int, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """ take a slot right away (returns None) or queue a waiter """
+
+        with self._lock:
+            if self._can_run(priority):
+                self._take(priority)
+                return None
+
+            waiter = _Waiter(priority, next(self._order), wake)
+            self._waiters.append(waiter)
+            self._waiters.sort(key=lambda w: (w.priority, w.order))
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter.granted:
+                self._release(waiter.priority)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, priority: int) -> None:
+        with self._lock:
+            self._release(priority)
+
+    def acquire(self, priority: int) -> None:
+        event = threading.Event()
+        waiter = self._try_take_or_wait(priority, event.set)
+        if waiter is None:
+            return
+
+        cancel_token = get_cancel_token()
+        handle = cancel_token.add_callback(event.set)
+        try:
+            event.wait()
+            if not waiter.granted:
+                cancel_token.raise_if_cancelled()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        finally:
+            cancel_token.remove_callback(handle)
+
+    async def acquire_async(self, priority: int) -> None:
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        waiter = self._try_take_or_wait(priority, wake)
+        if waiter is None:
+            return
+
+        try:
+            await get_cancel_token().run_cancellable(granted)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    @contextmanager
+    def slot(self, priority: int):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    @asynccontextmanager
+    async def async_slot(self, priority: int):
+        await self.acquire_async(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def get_state(self) -> Dict[str, Dict]:
+        """ state per class, for diagnostics """
+
+        with self._lock:
+            return {
+                PRIORITY_NAMES.get(priority, str(priority)): {
+                    "in_flight": self._in_flight[priority],
+                    "waiting": sum(1 for waiter in self._waiters if waiter.priority == priority),
+                    "limit": self.limits[priority],
+                    "requests": stats["requests"],
+                    "waited": stats["waited"],
+                    "wait_time": round(stats["wait_time"], 3),
+                }
+                for priority, stats in self._stats.items()
+            }
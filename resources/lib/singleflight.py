@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _LeaderCancelled(Exception):
+    """ set on the shared future when only the leader was cancelled, its waiters call again """
+    pass
+
+
+class SingleFlight:
+    """ Coalesces identical calls that are in flight at the same time
+
+    The first caller for a key (the leader) does the actual work, everyone asking for the same key meanwhile waits
+    for and shares its result or exception. Waiting works from plain threads (worker pool, proxy thread) as well as
+    from coroutines on any event loop, so a sync and an async caller can share one request, too. If the leader
+    coroutine is cancelled (e.g. by asyncio.wait_for()), its waiters were not: one of them takes over as leader.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def _claim(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _release(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """ call fn(*args, **kwargs), or wait for the result of an identical call already in flight """
+
+        while True:
+            future, is_leader = self._claim(key)
+            if is_leader:
+                break
+            try:
+                return future.result()
+            except _LeaderCancelled:
+                continue
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._release(key, future)
+
+    async def do_async(self, key: Hashable, fn: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """ like do(), for coroutine functions """
+
+        while True:
+            future, is_leader = self._claim(key)
+            if is_leader:
+                break
+            try:
+                # shield, a cancelled waiter must not cancel the shared future of everyone else
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderCancelled:
+                continue
+
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # release first, so the waiters woken up claim the key again instead of finding this future
+            self._release(key, future)
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._release(key, future)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def make_request_key(method: str, url: str, params: Optional[Dict] = None, *extra) -> Hashable:
+    """ key identifying a request by method, url, params and any extra parts (e.g. headers) """
+
+    return json.dumps([method.upper(), url, params or {}, *extra], sort_keys=True, default=str)
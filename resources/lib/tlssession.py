@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import os
+import socket
+import ssl
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional, Union
+
+import requests
+import xbmc
+from requests.adapters import HTTPAdapter
+
+# handshake samples kept per host and kind (full / resumed)
+MAX_SAMPLES = 20
+# hosts not connected to for this long are dropped from the warm state
+WARM_STATE_MAX_AGE = 7 * 24 * 60 * 60  # seconds
+
+# hosts compared by measure_handshakes()
+MEASURE_HOSTS = ["beta-api.crunchyroll.com", "www.crunchyroll.com"]
+MEASURE_ROUNDS = 3
+
+
+class TLSSessionStore:
+    """ TLS sessions and connection warm state per host
+
+    New connections to a host resume the TLS session of an earlier connection to it (abbreviated handshake), so
+    of the connections opened in parallel by the worker threads and the async client only the first one does a
+    full handshake. Python's ssl module can't serialize sessions, so they live as long as the process. What is
+    persisted is the warm state: which hosts were used, whether they resume sessions and how long handshakes take.
+    """
+
+    def __init__(self, storage_file: Optional[str] = None):
+        self.storage_file: Optional[str] = storage_file
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, ssl.SSLSession] = {}
+        # latest connection per host. with TLS 1.3 the session ticket arrives after the handshake, so the session
+        # of a connection is only resumable once it has read some data.
+        self._connections: Dict[str, weakref.ref] = {}
+        self._state: Dict[str, Dict] = {}
+
+    def get(self, host: str) -> Optional[ssl.SSLSession]:
+        """ session to resume for a new connection to host, if any """
+
+        with self._lock:
+            ref = self._connections.get(host)
+            connection = ref() if ref is not None else None
+            if connection is not None:
+                try:
+                    session = connection.session
+                    if session is not None and session.has_ticket:
+                        self._sessions[host] = session
+                except (OSError, ValueError):
+                    pass
+
+            session = self._sessions.get(host)
+            if session is None:
+                return None
+
+            if session.time + session.timeout < time.time():
+                del self._sessions[host]
+                return None
+
+            return session
+
+    def record(
+            self,
+            host: str,
+            connection: Union[ssl.SSLSocket, ssl.SSLObject],
+            handshake_time: Optional[float] = None
+    ) -> None:
+        """ remember the session of a new connection and update the warm state of its host """
+
+        try:
+            session = connection.session
+            reused = connection.session_reused
+            version = connection.version()
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            self._connections[host] = weakref.ref(connection)
+            if session is not None:
+                self._sessions[host] = session
+
+            state = self._state.setdefault(host, {})
+            state["last_used"] = time.time()
+            state["tls_version"] = version
+            state["connections"] = state.get("connections", 0) + 1
+            state["resumed"] = state.get("resumed", 0) + (1 if reused else 0)
+            if session is not None and session.timeout:
+                state["ticket_lifetime"] = session.timeout
+
+            if handshake_time is not None:
+                samples = state.setdefault("resumed_ms" if reused else "full_ms", [])
+                samples.append(round(handshake_time * 1000, 1))
+                del samples[:-MAX_SAMPLES]
+
+    def get_stats(self, host: str) -> Dict:
+        with self._lock:
+            state = dict(self._state.get(host, {}))
+
+        for kind in ("full_ms", "resumed_ms"):
+            samples = state.pop(kind, [])
+            state[kind] = round(sum(samples) / len(samples), 1) if samples else None
+
+        return state
+
+    def get_warm_hosts(self) -> List[str]:
+        """ hosts used recently, most recent first """
+
+        now = time.time()
+        with self._lock:
+            hosts = [
+                (state.get("last_used", 0), host)
+                for host, state in self._state.items()
+                if now - state.get("last_used", 0) < WARM_STATE_MAX_AGE
+            ]
+
+        return [host for _, host in sorted(hosts, reverse=True)]
+
+    def set_measurement(self, host: str, measurement: Dict) -> None:
+        with self._lock:
+            self._state.setdefault(host, {})["measurement"] = measurement
+
+    def load(self) -> None:
+        if not self.storage_file or not os.path.isfile(self.storage_file):
+            return
+
+        try:
+            with open(self.storage_file, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            from .utils import crunchy_log
+            crunchy_log(f"Failed to load TLS warm state: {e}", xbmc.LOGDEBUG)
+            return
+
+        now = time.time()
+        with self._lock:
+            self._state = {
+                host: state
+                for host, state in data.items()
+                if isinstance(state, dict) and now - state.get("last_used", 0) < WARM_STATE_MAX_AGE
+            }
+
+    def save(self) -> None:
+        if not self.storage_file:
+            return
+
+        with self._lock:
+            data = json.dumps(self._state)
+
+        from .utils import crunchy_log, write_file_atomic
+        try:
+            write_file_atomic(self.storage_file, data)
+        except OSError as e:
+            crunchy_log(f"Failed to save TLS warm state: {e}", xbmc.LOGDEBUG)
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """ SSLContext which resumes the sessions kept in its session_store
+
+    Covers both requests (urllib3 calls wrap_socket) and asyncio (which calls wrap_bio).
+    """
+
+    session_store: Optional[TLSSessionStore] = None
+
+    def wrap_socket(
+            self,
+            sock,
+            server_side=False,
+            do_handshake_on_connect=True,
+            suppress_ragged_eofs=True,
+            server_hostname=None,
+            session=None
+    ):
+        store = self.session_store
+        if store is None or server_side or not server_hostname:
+            return super().wrap_socket(
+                sock, server_side, do_handshake_on_connect, suppress_ragged_eofs, server_hostname, session
+            )
+
+        if session is None:
+            session = store.get(server_hostname)
+
+        started = time.monotonic()
+        ssl_socket = super().wrap_socket(
+            sock, server_side, do_handshake_on_connect, suppress_ragged_eofs, server_hostname, session
+        )
+        if do_handshake_on_connect:
+            store.record(server_hostname, ssl_socket, time.monotonic() - started)
+
+        return ssl_socket
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        store = self.session_store
+        if store is not None and not server_side and server_hostname and session is None:
+            session = store.get(server_hostname)
+
+        return super().wrap_bio(incoming, outgoing, server_side, server_hostname, session)
+
+
+class ResumingHTTPAdapter(HTTPAdapter):
+    """ requests adapter whose connections use a (shared) ResumingSSLContext """
+
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs):
+        # set before calling super(), which already sets up the pool manager
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs["ssl_context"] = self.ssl_context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+def create_ssl_context(store: Optional[TLSSessionStore] = None) -> ResumingSSLContext:
+    """ client context with the CA bundle of requests, resuming sessions from store """
+
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.load_verify_locations(cafile=requests.certs.where())
+    context.session_store = store
+    return context
+
+
+def _handshake(host: str, context: ssl.SSLContext, timeout: float, session: Optional[ssl.SSLSession] = None):
+    """ connect to host, returns (tcp connect time, tls handshake time, ssl socket) """
+
+    started = time.monotonic()
+    sock = socket.create_connection((host, 443), timeout=timeout)
+    connected = time.monotonic()
+    try:
+        ssl_socket = context.wrap_socket(sock, server_hostname=host, session=session)
+    except Exception:
+        sock.close()
+        raise
+
+    return connected - started, time.monotonic() - connected, ssl_socket
+
+
+def _median(values: List[float]) -> Optional[float]:
+    if not values:
+        return None
+
+    values = sorted(values)
+    return round(values[len(values) // 2] * 1000, 1)
+
+
+def measure_handshakes(hosts: Optional[List[str]] = None, rounds: int = MEASURE_ROUNDS, timeout: float = 10) -> Dict:
+    """ compare full (cold) and resumed TLS handshakes per host
+
+    Every round does a full handshake, completes a request on it (so the TLS 1.3 ticket arrives) and then opens a
+    second connection resuming that session. Returns the median timings in ms per host.
+    """
+
+    results = {}
+    for host in hosts or MEASURE_HOSTS:
+        context = create_ssl_context()
+        tcp, full, resumed, resumed_count = [], [], [], 0
+
+        try:
+            for _ in range(rounds):
+                connect_time, handshake_time, ssl_socket = _handshake(host, context, timeout)
+                tcp.append(connect_time)
+                full.append(handshake_time)
+
+                with ssl_socket:
+                    ssl_socket.sendall(f"HEAD / HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("ascii"))
+                    while ssl_socket.recv(4096):
+                        pass
+                    session = ssl_socket.session
+
+                connect_time, handshake_time, ssl_socket = _handshake(host, context, timeout, session)
+                with ssl_socket:
+                    tcp.append(connect_time)
+                    resumed.append(handshake_time)
+                    resumed_count += 1 if ssl_socket.session_reused else 0
+                    version = ssl_socket.version()
+        except (OSError, ssl.SSLError) as e:
+            results[host] = {"error": str(e)}
+            continue
+
+        results[host] = {
+            "tls_version": version,
+            "tcp_ms": _median(tcp),
+            "full_ms": _median(full),
+            "resumed_ms": _median(resumed),
+            "resumed": f"{resumed_count}/{rounds}",
+        }
+
+    return results
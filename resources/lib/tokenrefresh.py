@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Crunchyroll
+# Copyright (C) 2023 smirgol
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import threading
+from typing import Callable, Optional
+
+import xbmc
+
+from .cancellation import get_cancel_token
+
+# access tokens live for 5 minutes. they are renewed in the background once less than this is left, well before
+# is_token_valid() (60s buffer) would make a request wait for a refresh.
+REFRESH_AHEAD = 150  # seconds
+# a failed background refresh is retried after this, as long as the token is still valid
+RETRY_INTERVAL = 30  # seconds
+# how long a request or shutdown waits for a background refresh in progress
+REFRESH_WAIT = 30  # seconds
+
+
+class TokenRefresher:
+    """ Renews the access token ahead of its expiry, on a background thread
+
+    Foreground requests keep using the current token meanwhile. A request that finds the token expired waits for
+    a refresh in progress (see wait()) instead of starting its own.
+    """
+
+    def __init__(self, refresh: Callable[[], None], get_lifetime_left: Callable[[], Optional[float]]):
+        self._refresh = refresh
+        self._get_lifetime_left = get_lifetime_left
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._timer_forced = False
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def schedule(self, delay: Optional[float] = None, force: bool = False) -> None:
+        """ (re)arm the refresh for the current token, or for delay seconds from now
+
+        With force the refresh runs regardless of the lifetime left, the refresh callable decides whether it's due.
+        """
+
+        if delay is None:
+            lifetime_left = self._get_lifetime_left()
+            if lifetime_left is None:
+                return
+            delay = max(0.0, lifetime_left - REFRESH_AHEAD)
+
+        with self._lock:
+            if self._stopped:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+
+            self._timer = threading.Timer(delay, self._start, args=(force,))
+            self._timer_forced = force
+            self._timer.name = "crunchyroll-token-refresh"
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _start(self, force: bool = False) -> None:
+        with self._lock:
+            if self._stopped or self.is_running():
+                return
+            self._timer = None
+            self._thread = threading.current_thread()
+
+        try:
+            self._run(force)
+        finally:
+            with self._lock:
+                self._thread = None
+
+    def _run(self, force: bool = False) -> None:
+        from .utils import crunchy_log
+
+        if get_cancel_token().is_cancelled():
+            return
+
+        lifetime_left = self._get_lifetime_left()
+        if lifetime_left is None:
+            return
+        if lifetime_left > REFRESH_AHEAD and not force:
+            # renewed in the meantime
+            self.schedule()
+            return
+
+        crunchy_log(f"Refreshing access token in the background, {lifetime_left:.0f}s left", xbmc.LOGDEBUG)
+        try:
+            self._refresh()
+        except Exception as e:
+            crunchy_log(f"Background token refresh failed: {e}", xbmc.LOGWARNING)
+            # retry while the token is still usable, once it expired the request path takes over
+            if lifetime_left > RETRY_INTERVAL:
+                self.schedule(RETRY_INTERVAL)
+            return
+
+        self.schedule()
+
+    def is_running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """ wait for a background refresh in progress, if any """
+
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """ cancel the next refresh and wait for one in progress
+
+        A forced refresh that hasn't started yet runs now instead, on the calling thread.
+        """
+
+        with self._lock:
+            self._stopped = True
+            timer, forced = self._timer, self._timer_forced
+            if timer is not None:
+                timer.cancel()
+                self._timer = None
+
+        if timer is not None and forced:
+            # the timer thread might have fired already, it gives up once it sees _stopped
+            self._run(force=True)
+
+        self.wait(timeout)
@@ -15,7 +15,9 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import json
+import os
 import re
+import threading
 from datetime import datetime
 from json import dumps
 from typing import Dict, Union, List, Optional
@@ -23,14 +25,15 @@ from typing import Dict, Union, List, Optional
 import requests
 import xbmc
 import xbmcgui
+import xbmcvfs
 
+from .batching import BatchedLookup, DataLoader
 from .globals import G
 from .model import CrunchyrollError, ListableItem, EpisodeData, MovieData, SeriesData, SeasonData
 
 
 # @todo we could change the return type and along with the listables return additional data that we preload
 #       like info what is on watchlist, artwork, playhead, ...
-#       for that we should use async requests (asyncio)
 def get_listables_from_response(data: List[dict]) -> List[ListableItem]:
     """ takes an API response object, determines type of its contents and creates DTOs for further processing """
 
@@ -78,22 +81,28 @@ async def get_cms_object_data_by_ids(ids: list) -> dict:
     if len(ids_filtered) == 0:
         return {}
 
-    try:
-        req = G.api.make_request(
-            method='GET',
-            url=G.api.OBJECTS_BY_ID_LIST_ENDPOINT.format(','.join(ids_filtered)),
-            params={
-                'locale': G.args.subtitle,
-                'ratings': 'true'
-                # "preferred_audio_language": ""
-            }
-        )
-    except (CrunchyrollError, requests.exceptions.RequestException):
-        crunchy_log("get_cms_object_data_by_ids: failed to load for: %s" % ",".join(ids_filtered))
-        return {}
+    return await _cms_objects_loader.load_many(ids_filtered)
+
+
+async def load_cms_object(item_id: str) -> Optional[Dict]:
+    """ fetch object data for a single id. Loads of all code paths within one loop iteration share one request """
+
+    return await _cms_objects_loader.load(item_id)
+
+
+async def _fetch_cms_objects(ids: List[str]) -> Optional[Dict]:
+    req = await G.api.make_request_async(
+        method='GET',
+        url=G.api.OBJECTS_BY_ID_LIST_ENDPOINT.format(','.join(ids)),
+        params={
+            'locale': G.args.subtitle,
+            'ratings': 'true'
+            # "preferred_audio_language": ""
+        }
+    )
 
     if not req or 'error' in req:
-        return {}
+        return None
 
     return {item.get('id'): item for item in req.get('data')}
 
@@ -119,7 +128,11 @@ async def get_playheads_from_api(episode_ids: Union[str, list]) -> Dict:
     if isinstance(episode_ids, str):
         episode_ids = [episode_ids]
 
-    response = G.api.make_scraper_request(
+    return await _playheads_lookup.get_many(episode_ids)
+
+
+async def _fetch_playheads(episode_ids: List[str]) -> Optional[Dict]:
+    response = await G.api.make_scraper_request_async(
         method='GET',
         url=G.api.PLAYHEADS_ENDPOINT.format(G.api.account_data.account_id),
         auth_type="device",
@@ -131,12 +144,11 @@ async def get_playheads_from_api(episode_ids: Union[str, list]) -> Dict:
         auto_refresh=True
     )
 
-    out = {}
-
     if not response:
-        return out
+        return None
 
     # prepare by id
+    out = {}
     for item in response.get('data'):
         out[item.get('content_id')] = {
             'playhead': item.get('playhead'),
@@ -149,7 +161,13 @@ async def get_playheads_from_api(episode_ids: Union[str, list]) -> Dict:
 async def get_watchlist_status_from_api(ids: list) -> list:
     """ retrieve watchlist status for given media ids """
 
-    req = G.api.make_scraper_request(
+    status = await _watchlist_status_lookup.get_many(ids)
+
+    return [item_id for item_id, on_watchlist in status.items() if on_watchlist]
+
+
+async def _fetch_watchlist_status(ids: List[str]) -> Optional[Dict]:
+    req = await G.api.make_scraper_request_async(
         method="GET",
         url=G.api.WATCHLIST_V2_ENDPOINT.format(G.api.account_data.account_id),
         auth_type="device",
@@ -162,12 +180,20 @@ async def get_watchlist_status_from_api(ids: list) -> list:
 
     if not req or req.get("error") is not None:
         crunchy_log("get_in_queue: Failed to retrieve data", xbmc.LOGERROR)
-        return []
+        return None
 
-    if not req.get('data'):
-        return []
+    return {item.get('id'): True for item in req.get('data') or []}
 
-    return [item.get('id') for item in req.get('data')]
+
+# per-invocation lookups for the endpoints that take comma separated id lists (see batching.py)
+_cms_objects_lookup = BatchedLookup(
+    "get_cms_object_data_by_ids",
+    _fetch_cms_objects,
+    errors=(CrunchyrollError, requests.exceptions.RequestException)
+)
+_cms_objects_loader = DataLoader(_cms_objects_lookup)
+_playheads_lookup = BatchedLookup("get_playheads_from_api", _fetch_playheads)
+_watchlist_status_lookup = BatchedLookup("get_watchlist_status_from_api", _fetch_watchlist_status, default=False)
 
 
 def get_img_from_static(image, image_type='normal') -> Optional[str]:
@@ -221,6 +247,30 @@ def infer_img_from_id(id: str, image_type: str) -> Optional[str]:
         return None
 
 
+def write_file_atomic(path: str, data: str) -> None:
+    """ Write data to path through a temporary file that replaces it
+
+    Other plugin processes may read the file at any time, this way they see either the old or the new content, never
+    a half written file. Raises OSError, the temporary file is removed then.
+    """
+
+    # the rename needs a local path, translate special:// paths like the rest of the addon does
+    if "://" in path:
+        path = xbmcvfs.translatePath(path)
+
+    tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as file:
+            file.write(data)
+        os.replace(tmp_file, path)
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+        raise
+
+
 def dump(data) -> None:
     xbmc.log(dumps(data, indent=4), xbmc.LOGINFO)
 
@@ -31,10 +31,11 @@ import xbmcgui
 import xbmcplugin
 import xbmcvfs
 
+from resources.lib.executor import run_in_executor
 from resources.lib.globals import G
 from resources.lib.model import Object, CrunchyrollError, PlayableItem
 from resources.lib.utils import log_error_with_trace, crunchy_log, \
-    get_playheads_from_api, get_cms_object_data_by_ids, get_listables_from_response
+    get_playheads_from_api, load_cms_object, get_listables_from_response
 from ..modules import cloudscraper
 
 class CloudflareProxy:
@@ -91,8 +92,8 @@ class CloudflareProxy:
                         crunchy_log(f"Proxy request for: {original_url}")
 
                         try:
-                            # Use CloudScraper to fetch manifest
-                            scraper = cloudscraper.create_scraper(
+                            # Use the pooled CloudScraper to fetch manifest, so we re-use its connection
+                            scraper = G.api.get_scraper("device") or cloudscraper.create_scraper(
                                 delay=10,
                                 browser={'custom': G.api.CRUNCHYROLL_UA_DEVICE}
                             )
@@ -281,21 +282,17 @@ class VideoStream(Object):
     async def _gather_async_data(self) -> Dict[str, Any]:
         """ gather data asynchronously and return them as a dictionary """
 
-        # create threads
-        # actually not sure if this works, as the requests lib is not async
-        # also not sure if this is thread safe in any way, what if session is timed-out when starting this?
+        # create tasks - their blocking requests are run in parallel on the request executor
         t_stream_data = asyncio.create_task(self._get_stream_data_from_api())
         t_skip_events_data = asyncio.create_task(self._get_skip_events(G.args.get_arg('episode_id')))
         t_playheads = asyncio.create_task(get_playheads_from_api(G.args.get_arg('episode_id')))
-        t_item_data = asyncio.create_task(
-            get_cms_object_data_by_ids([G.args.get_arg('episode_id')]))
+        t_item_data = asyncio.create_task(load_cms_object(G.args.get_arg('episode_id')))
         # t_item_parent_data = asyncio.create_task(get_cms_object_data_by_ids(G.args, G.api, G.args.get_arg('series_id')))
 
         # start async requests and fetch results
         results = await asyncio.gather(t_stream_data, t_skip_events_data, t_playheads, t_item_data)
 
-        playable_item = get_listables_from_response([results[3].get(G.args.get_arg('episode_id'))]) if \
-            results[3] else None
+        playable_item = get_listables_from_response([results[3]]) if results[3] else None
 
         return {
             'stream_data': results[0] or {},
@@ -331,7 +328,8 @@ class VideoStream(Object):
         # Use CloudScraper for AndroidTV endpoint (www.crunchyroll.com is Cloudflare protected)
         if user_agent_type == "device":
             crunchy_log("Using CloudScraper for AndroidTV streaming endpoint")
-            req = G.api.make_scraper_request(
+            req = await run_in_executor(
+                G.api.make_scraper_request,
                 method="GET",
                 url=stream_url,
                 auth_type="device",
@@ -339,7 +337,8 @@ class VideoStream(Object):
             )
         else:
             crunchy_log("Using regular request for mobile streaming endpoint")
-            req = G.api.make_request(
+            req = await run_in_executor(
+                G.api.make_request,
                 method="GET",
                 url=stream_url,
             )
@@ -535,14 +534,16 @@ class VideoStream(Object):
             crunchy_log("Requesting skip data from %s" % G.api.SKIP_EVENTS_ENDPOINT.format(episode_id))
 
             # api request streams
-            req = G.api.make_unauthenticated_request(
+            req = await run_in_executor(
+                G.api.make_unauthenticated_request,
                 method="GET",
                 url=G.api.SKIP_EVENTS_ENDPOINT.format(episode_id)
             )
         except (requests.exceptions.RequestException, CrunchyrollError):
             try:
                 # Some streams raise a 403 on SKIP_EVENTS endpoint but skip data are available in INTRO_V2 endpoint
-                intro_req = G.api.make_unauthenticated_request(
+                intro_req = await run_in_executor(
+                    G.api.make_unauthenticated_request,
                     method="GET",
                     url=G.api.INTRO_V2_ENDPOINT.format(episode_id)
                 )
@@ -25,13 +25,16 @@ try:
 except ImportError:
     from urllib.parse import quote_plus
 
+import xbmc
 import xbmcvfs
 import xbmcgui
 import xbmcplugin
 
 from typing import Callable, Optional, List, Dict, Any
 from . import router, utils
+from .deadline import OPTIONAL_RESERVE, get_deadline
 from .globals import G
+from .scheduler import PRIORITY_ENRICHMENT, request_priority
 
 # Fix for bug in old python version on windows
 # @see: https://github.com/smirgol/plugin.video.crunchyroll/issues/44
@@ -145,8 +148,7 @@ OPT_NO_SEASON_TITLE = 16  # only show title of episode (with numbering)
 OPT_SORT_EPISODES_EXPERIMENTAL = 32  # sort un-viewed queue items to top
 
 
-# actually not sure if this works, as the requests lib is not async
-# also not sure if this is thread safe in any way, what if session is timed-out when starting this?
+# the api requests of the helpers below are run on the request executor, so they are actually fetched in parallel
 async def complement_listables(listables: List[ListableItem]) -> Dict[str, Dict[str, Any]]:
     # for all playable items fetch playhead data from api, as sometimes we already have them, sometimes not
     from .utils import get_playheads_from_api, get_cms_object_data_by_ids, get_watchlist_status_from_api, \
@@ -168,30 +170,45 @@ async def complement_listables(listables: List[ListableItem]) -> Dict[str, Dict[
     # watchlist info for series
     ids_watchlist = [listable.id for listable in listables if isinstance(listable, SeriesData)]
 
-    # prepare async requests
-    tasks_added = []
-    tasks = []
-    if ids_playhead:
-        tasks.append(asyncio.create_task(get_playheads_from_api(ids_playhead)))
-        tasks_added.append('playheads')
-    # @todo: for some reason objects endpoint stopped to deliver anything but thumbs in terms of images,
-    #        but the sole reason for calling it are the additional images...
-    #        for now we use the objects to fetch the series data only, to fetch its images and its rating
-    if ids_objects:
-        tasks.append(asyncio.create_task(get_cms_object_data_by_ids(ids_objects)))
-        tasks_added.append('objects')
-    if ids_watchlist:
-        tasks.append(asyncio.create_task(get_watchlist_status_from_api(ids_watchlist)))
-        tasks_added.append('watchlist')
-
-    # start async requests and fetch results
-    results = await asyncio.gather(*tasks)
-
     result_obj = {
         'playheads': {},
         'objects': {},
         'watchlist': {}
     }
+
+    # the enrichment is optional, drop it rather than delaying the listing past the deadline of the invocation
+    deadline = get_deadline()
+    if deadline is not None and not deadline.has_time_for_optional_work():
+        utils.crunchy_log("complement_listables: time budget spent, skipping enrichment", xbmc.LOGINFO)
+        return result_obj
+
+    # prepare async requests, at a lower priority than the requests of the listing itself
+    tasks_added = []
+    tasks = []
+    with request_priority(PRIORITY_ENRICHMENT):
+        if ids_playhead:
+            tasks.append(asyncio.create_task(get_playheads_from_api(ids_playhead)))
+            tasks_added.append('playheads')
+        # @todo: for some reason objects endpoint stopped to deliver anything but thumbs in terms of images,
+        #        but the sole reason for calling it are the additional images...
+        #        for now we use the objects to fetch the series data only, to fetch its images and its rating
+        if ids_objects:
+            tasks.append(asyncio.create_task(get_cms_object_data_by_ids(ids_objects)))
+            tasks_added.append('objects')
+        if ids_watchlist:
+            tasks.append(asyncio.create_task(get_watchlist_status_from_api(ids_watchlist)))
+            tasks_added.append('watchlist')
+
+    # start async requests and fetch results
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*tasks),
+            deadline.remaining() - OPTIONAL_RESERVE if deadline is not None else None
+        )
+    except asyncio.TimeoutError:
+        utils.crunchy_log("complement_listables: time budget spent, dropping enrichment", xbmc.LOGINFO)
+        return result_obj
+
     for idx, task in enumerate(tasks_added):
         result_obj[task] = results[idx]
 
@@ -4,6 +4,7 @@ import logging
 import requests
 import sys
 import ssl
+import threading
 
 from requests.adapters import HTTPAdapter
 from requests.sessions import Session
@@ -145,6 +146,10 @@ class CloudScraper(Session):
             browser=kwargs.pop('browser', None)
         )
 
+        # the scraper is shared by threads, each one counts its own solve attempts and one challenge is solved at
+        # a time
+        self._solveState = threading.local()
+        self._challengeLock = threading.RLock()
         self._solveDepthCnt = 0
         self.solveDepth = kwargs.pop('solveDepth', 3)
 
@@ -181,7 +186,28 @@ class CloudScraper(Session):
     # ------------------------------------------------------------------------------- #
 
     def __getstate__(self):
-        return self.__dict__
+        state = self.__dict__.copy()
+        # locks and thread-local state can't be pickled, they are recreated on load
+        state.pop('_solveState', None)
+        state.pop('_challengeLock', None)
+        return state
+
+    def __setstate__(self, state):
+        super(CloudScraper, self).__setstate__(state)
+        self._solveState = threading.local()
+        self._challengeLock = threading.RLock()
+
+    # ------------------------------------------------------------------------------- #
+    # Depth of the challenge currently solved by the calling thread
+    # ------------------------------------------------------------------------------- #
+
+    @property
+    def _solveDepthCnt(self):
+        return getattr(self._solveState, 'depth', 0)
+
+    @_solveDepthCnt.setter
+    def _solveDepthCnt(self, value):
+        self._solveState.depth = value
 
     # ------------------------------------------------------------------------------- #
     # Allow replacing actual web request call via subclassing
@@ -292,16 +318,17 @@ class CloudScraper(Session):
                 # Try to solve the challenge and send it back
                 # ------------------------------------------------------------------------------- #
 
-                if self._solveDepthCnt >= self.solveDepth:
-                    _ = self._solveDepthCnt
-                    self.simpleException(
-                        CloudflareLoopProtection,
-                        f"!!Loop Protection!! We have tried to solve {_} time(s) in a row."
-                    )
+                with self._challengeLock:
+                    if self._solveDepthCnt >= self.solveDepth:
+                        _ = self._solveDepthCnt
+                        self.simpleException(
+                            CloudflareLoopProtection,
+                            f"!!Loop Protection!! We have tried to solve {_} time(s) in a row."
+                        )
 
-                self._solveDepthCnt += 1
+                    self._solveDepthCnt += 1
 
-                response = cloudflareV1.Challenge_Response(response, **kwargs)
+                    response = cloudflareV1.Challenge_Response(response, **kwargs)
             else:
                 if not response.is_redirect and response.status_code not in [429, 503]:
                     self._solveDepthCnt = 0
@@ -1,13 +1,168 @@
 import json
 import os
 import random
-import re
 import sys
 import ssl
+import threading
 
 from collections import OrderedDict
 
 # ------------------------------------------------------------------------------- #
+# browsers.json is ~1.2 MB. It is parsed at most once per process and only when a
+# random (non custom) User-Agent is requested. Custom User-Agents are resolved via a
+# small precompiled index, which is cached in memory. It is persisted only if the
+# application sets a store for it (see setIndexStore()).
+# ------------------------------------------------------------------------------- #
+
+_BROWSERS_FILE = os.path.join(os.path.dirname(__file__), 'browsers.json')
+_INDEX_FILE_NAME = 'browsers.index.json'
+_INDEX_VERSION = 1
+
+_lock = threading.RLock()
+_browsers = None
+_joinedAgents = None
+_index = None
+_indexDir = None
+_indexWriter = None
+
+# ------------------------------------------------------------------------------- #
+
+
+def _sourceSignature():
+    stat = os.stat(_BROWSERS_FILE)
+    return [_INDEX_VERSION, stat.st_size, int(stat.st_mtime)]
+
+# ------------------------------------------------------------------------------- #
+
+
+def setIndexStore(directory, writer=None):
+    """
+    Persist the custom User-Agent index in directory, written by writer(path, data).
+    Without a store (the default) the index is kept in memory only.
+    """
+    global _indexDir, _indexWriter
+
+    with _lock:
+        _indexDir = directory
+        _indexWriter = writer
+
+# ------------------------------------------------------------------------------- #
+
+
+def _writeFile(path, data):
+    with open(path, 'w') as fp:
+        fp.write(data)
+
+# ------------------------------------------------------------------------------- #
+
+
+def _indexPaths():
+    if not _indexDir:
+        return []
+
+    return [os.path.join(_indexDir, f'cloudscraper.{_INDEX_FILE_NAME}')]
+
+# ------------------------------------------------------------------------------- #
+
+
+def loadBrowsers():
+    """
+    Parse browsers.json once per process and keep it in memory.
+    """
+    global _browsers, _joinedAgents
+
+    with _lock:
+        if _browsers is None:
+            with open(_BROWSERS_FILE, 'r') as fp:
+                _browsers = json.load(fp, object_pairs_hook=OrderedDict)
+
+            # pre-join the user agent lists once, so custom matching is a plain substring search
+            _joinedAgents = [
+                (browser, ' '.join(agents))
+                for device_type in _browsers['user_agents'].values()
+                for platform in device_type.values()
+                for browser, agents in platform.items()
+            ]
+
+        return _browsers
+
+# ------------------------------------------------------------------------------- #
+
+
+def _saveIndex(index):
+    data = json.dumps(index, separators=(',', ':'))
+    writer = _indexWriter or _writeFile
+
+    for path in _indexPaths():
+        try:
+            writer(path, data)
+            return True
+        except (IOError, OSError):
+            continue
+
+    return False
+
+# ------------------------------------------------------------------------------- #
+
+
+def loadIndex():
+    """
+    Load the compact custom User-Agent index from memory, disk or build it from browsers.json.
+
+    The index holds the headers and cipher suite per browser and a map of already resolved
+    custom User-Agents to their browser (or None if they did not match any browser).
+    """
+    global _index
+
+    with _lock:
+        if _index is not None:
+            return _index
+
+        signature = _sourceSignature()
+
+        for path in _indexPaths():
+            try:
+                with open(path, 'r') as fp:
+                    index = json.load(fp, object_pairs_hook=OrderedDict)
+                if index.get('source') == signature:
+                    _index = index
+                    return _index
+            except (IOError, OSError, ValueError):
+                continue
+
+        browsers = loadBrowsers()
+        _index = OrderedDict([
+            ('source', signature),
+            ('headers', browsers['headers']),
+            ('cipherSuite', browsers['cipherSuite']),
+            ('custom', OrderedDict())
+        ])
+        _saveIndex(_index)
+
+        return _index
+
+# ------------------------------------------------------------------------------- #
+
+
+def resolveCustom(custom):
+    """
+    Return the browser whose User-Agent list contains the custom User-Agent, or None.
+    """
+    index = loadIndex()
+
+    with _lock:
+        if custom in index['custom']:
+            return index['custom'][custom]
+
+        loadBrowsers()
+        browser = next((name for name, joined in _joinedAgents if custom in joined), None)
+
+        index['custom'][custom] = browser
+        _saveIndex(index)
+
+        return browser
+
+# ------------------------------------------------------------------------------- #
 
 
 class User_Agent():
@@ -36,16 +191,16 @@ class User_Agent():
 
     # ------------------------------------------------------------------------------- #
 
-    def tryMatchCustom(self, user_agents):
-        for device_type in user_agents['user_agents']:
-            for platform in user_agents['user_agents'][device_type]:
-                for browser in user_agents['user_agents'][device_type][platform]:
-                    if re.search(re.escape(self.custom), ' '.join(user_agents['user_agents'][device_type][platform][browser])):
-                        self.headers = user_agents['headers'][browser]
-                        self.headers['User-Agent'] = self.custom
-                        self.cipherSuite = user_agents['cipherSuite'][browser]
-                        return True
-        return False
+    def tryMatchCustom(self):
+        browser = resolveCustom(self.custom)
+        if not browser:
+            return False
+
+        index = loadIndex()
+        self.headers = OrderedDict(index['headers'][browser])
+        self.headers['User-Agent'] = self.custom
+        self.cipherSuite = list(index['cipherSuite'][browser])
+        return True
 
     # ------------------------------------------------------------------------------- #
 
@@ -71,14 +226,8 @@ class User_Agent():
             sys.tracebacklimit = 0
             raise RuntimeError("Sorry you can't have mobile and desktop disabled at the same time.")
 
-        with open(os.path.join(os.path.dirname(__file__), 'browsers.json'), 'r') as fp:
-            user_agents = json.load(
-                fp,
-                object_pairs_hook=OrderedDict
-            )
-
         if self.custom:
-            if not self.tryMatchCustom(user_agents):
+            if not self.tryMatchCustom():
                 self.cipherSuite = [
                     ssl._DEFAULT_CIPHERS,
                     '!AES128-SHA',
@@ -102,6 +251,7 @@ class User_Agent():
                 sys.tracebacklimit = 0
                 raise RuntimeError(f'Sorry the platform "{self.platform}" is not valid, valid platforms are [{", ".join(self.platforms)}]')
 
+            user_agents = loadBrowsers()
             filteredAgents = self.filterAgents(user_agents['user_agents'])
 
             if not self.browser:
@@ -113,8 +263,8 @@ class User_Agent():
                 sys.tracebacklimit = 0
                 raise RuntimeError(f'Sorry "{self.browser}" browser was not found with a platform of "{self.platform}".')
 
-            self.cipherSuite = user_agents['cipherSuite'][self.browser]
-            self.headers = user_agents['headers'][self.browser]
+            self.cipherSuite = list(user_agents['cipherSuite'][self.browser])
+            self.headers = OrderedDict(user_agents['headers'][self.browser])
 
             self.headers['User-Agent'] = random.SystemRandom().choice(filteredAgents[self.browser])
 
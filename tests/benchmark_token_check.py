@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the token check that runs before every request
+
+Compares the previous check (strptime of the expiry and five debug log lines per call) with API.is_token_valid().
+Kodi logging is stubbed with a no-op, which is what a disabled debug log costs at best.
+
+    python tests/benchmark_token_check.py
+"""
+
+import sys
+import timeit
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+for module in ('xbmc', 'xbmcgui', 'xbmcplugin', 'xbmcaddon', 'xbmcvfs'):
+    sys.modules[module] = MagicMock()
+fake_globals = type(sys)('globals')
+fake_globals.G = MagicMock()
+sys.modules['resources.lib.globals'] = fake_globals
+
+from resources.lib import utils  # noqa: E402
+from resources.lib.api import API, date_to_str, get_date, str_to_date  # noqa: E402
+from resources.lib.model import AccountData  # noqa: E402
+
+ROUNDS = 100_000
+
+
+def is_token_valid_before(api: API) -> bool:
+    """ the check as it was, for comparison """
+
+    utils.crunchy_log("Checking token validity", 0)
+
+    if not api.account_data.access_token:
+        return False
+
+    if not api.account_data.expires:
+        return False
+
+    try:
+        current_time = get_date()
+        expiry_time = str_to_date(api.account_data.expires)
+        time_until_expiry = expiry_time - current_time
+
+        utils.crunchy_log(f"Current time: {current_time}", 0)
+        utils.crunchy_log(f"Expiry time: {expiry_time}", 0)
+        utils.crunchy_log(f"Time until expiry: {time_until_expiry}", 0)
+
+        is_valid = current_time < (expiry_time - timedelta(seconds=60))
+        utils.crunchy_log(f"Token is valid (with 60s buffer): {is_valid}", 0)
+
+        return is_valid
+    except Exception:
+        return False
+
+
+def main():
+    utils.crunchy_log = lambda *args, **kwargs: None
+
+    api = API()
+    api.account_data = AccountData({
+        'access_token': 'token',
+        'expires': date_to_str(get_date() + timedelta(seconds=300)),
+    })
+
+    for name, check in (("before", is_token_valid_before), ("after", API.is_token_valid)):
+        assert check(api)
+        seconds = min(timeit.repeat(lambda: check(api), number=ROUNDS, repeat=5))
+        print(f"{name:>6}: {seconds / ROUNDS * 1e6:.2f} µs per request")
+
+
+if __name__ == "__main__":
+    main()
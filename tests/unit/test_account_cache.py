@@ -0,0 +1,74 @@
+import time
+from unittest.mock import patch
+
+from resources.lib.accountcache import CMS_EXPIRY_MARGIN, AccountPayloadCache
+from resources.lib.api import API
+
+
+def cms_expires(seconds: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + seconds))
+
+
+def make_payloads(expires_in: float = 3600) -> dict:
+    return {
+        "index": {"cms": {"bucket": "/bucket", "policy": "p", "signature": "s", "expires": cms_expires(expires_in)}},
+        "profile": {"username": "user"},
+    }
+
+
+class TestAccountPayloadCache:
+    """Unit Tests for reusing index and profile payloads across token refreshes"""
+
+    def test_valid_until_shortly_before_cms_expiry(self, tmp_path):
+        cache = AccountPayloadCache(str(tmp_path / "account_payloads.json"))
+        cache.store("account", "profile", make_payloads(3600), time.time())
+
+        assert cache.get("account", "profile", time.time()) == make_payloads(3600)
+        assert cache.get("account", "profile", time.time() + 3600 - CMS_EXPIRY_MARGIN + 5) is None
+
+    def test_entries_are_per_account_and_profile(self, tmp_path):
+        cache = AccountPayloadCache(str(tmp_path / "account_payloads.json"))
+        cache.store("account", "profile", make_payloads(), time.time())
+
+        assert cache.get("account", "other-profile", time.time()) is None
+        assert cache.get("other-account", "profile", time.time()) is None
+        assert cache.get(None, "profile", time.time()) is None
+
+
+class TestFinalizeSession:
+    """Token refreshes reuse the cached payloads, other actions fetch them in parallel"""
+
+    def setup_method(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}):
+            self.api = API()
+
+    def test_refresh_reuses_cached_payloads(self, tmp_path):
+        self.api.account_payloads = AccountPayloadCache(str(tmp_path / "account_payloads.json"))
+        self.api.account_payloads.store("account", "profile", make_payloads(), time.time())
+        token_response = {"account_id": "account", "profile_id": "profile"}
+
+        with patch.object(self.api, 'make_unauthenticated_request') as request:
+            payloads = self.api._get_account_payloads(token_response, "refresh", None)
+
+        request.assert_not_called()
+        assert payloads["profile"] == {"username": "user"}
+
+    def test_fetches_in_parallel_and_stores(self, tmp_path):
+        self.api.account_payloads = AccountPayloadCache(str(tmp_path / "account_payloads.json"))
+        self.api.account_payloads.store("account", "profile", make_payloads(), time.time())
+        token_response = {"account_id": "account", "profile_id": "profile"}
+
+        def request(method, url, headers):
+            time.sleep(0.1)
+            return {"url": url, "profiles": []}
+
+        # a profile switch never reuses payloads, and also needs the list of profiles
+        with patch.object(self.api, 'make_unauthenticated_request', side_effect=request):
+            started = time.monotonic()
+            payloads = self.api._get_account_payloads(token_response, "refresh_profile", "profile")
+            elapsed = time.monotonic() - started
+
+        assert elapsed < 0.25
+        assert set(payloads) == {"index", "profile", "profiles"}
+        assert payloads["index"]["url"] == API.INDEX_ENDPOINT
+        assert self.api.account_payloads.get("account", "profile", time.time()) == payloads
@@ -0,0 +1,229 @@
+import asyncio
+import gzip
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+from requests.cookies import RequestsCookieJar
+
+from resources.lib.api import API
+from resources.lib.asynchttp import AsyncHTTPClient, _Connection
+from resources.lib.model import AccountData, LoginError
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    requests = []
+    responses = []
+
+    def do_GET(self):
+        _Handler.connections.add(self.client_address)
+        _Handler.requests.append((self.path, dict(self.headers)))
+
+        status, body, extra_headers = _Handler.responses.pop(0) if _Handler.responses else (200, {"data": []}, {})
+        extra_headers = dict(extra_headers)
+        payload = json.dumps(body).encode("utf-8")
+        if extra_headers.get("Content-Encoding") == "gzip":
+            payload = gzip.compress(payload)
+
+        # send_response() already sets a Server header
+        self.server_version = extra_headers.pop("Server", "BaseHTTP")
+        self.sys_version = ""
+        self.send_response(status)
+        self.send_header("Content-Type", extra_headers.pop("Content-Type", "application/json"))
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in extra_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.connections = set()
+    _Handler.requests = []
+    _Handler.responses = []
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    yield "http://127.0.0.1:%d" % httpd.server_address[1]
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestAsyncRequests:
+    """Unit Tests for the non-blocking request path"""
+
+    def setup_method(self):
+        with patch('resources.lib.api.default_request_headers', return_value={"User-Agent": "test"}), \
+             patch('resources.lib.globals.G'):
+            self.api = API()
+            self.api.account_data = AccountData({
+                'access_token': 'test_access_token',
+                'refresh_token': 'test_refresh_token',
+                'token_type': 'Bearer',
+                'expires': '2099-1-1T0:0:0Z',
+                'cms': {'policy': 'p', 'signature': 's', 'key_pair_id': 'k'}
+            })
+
+    def teardown_method(self):
+        self.api.close()
+
+    def test_requests_are_signed_and_reuse_connections(self, server):
+        async def run():
+            for _ in range(3):
+                await self.api.make_request_async("GET", server + "/content", params={"locale": "en-US"})
+
+        asyncio.run(run())
+        # a second asyncio.run() must still be able to use the pooled connection
+        result = asyncio.run(self.api.make_request_async("GET", server + "/content"))
+
+        assert result == {"data": []}
+        assert len(_Handler.connections) == 1
+
+        query = parse_qs(urlsplit(_Handler.requests[0][0]).query)
+        assert query["Policy"] == ["p"]
+        assert query["Signature"] == ["s"]
+        assert query["Key-Pair-Id"] == ["k"]
+        assert query["locale"] == ["en-US"]
+
+    def test_gzip_response_is_decoded(self, server):
+        _Handler.responses.append((200, {"data": [1]}, {"Content-Encoding": "gzip"}))
+
+        assert asyncio.run(self.api.make_request_async("GET", server + "/content")) == {"data": [1]}
+
+    def test_401_triggers_refresh_and_retry(self, server):
+        _Handler.responses.append((401, {"error": "invalid_token"}, {}))
+
+        with patch.object(self.api, '_handle_refresh_flow') as mock_refresh:
+            result = asyncio.run(self.api.make_request_async("GET", server + "/content"))
+
+        assert result == {"data": []}
+        mock_refresh.assert_called_once()
+        assert len(_Handler.requests) == 2
+
+    def test_scraper_request_uses_scraper_headers(self, server):
+        scraper = Mock()
+        scraper.headers = {"Accept-Language": "en-US"}
+        scraper.cookies = {"cf_clearance": "abc"}
+        scraper.get_adapter.return_value = Mock(ssl_context=None)
+
+        with patch.object(self.api, 'create_auth_scraper', return_value=scraper):
+            result = asyncio.run(self.api.make_scraper_request_async("GET", server + "/playheads"))
+
+        headers = _Handler.requests[0][1]
+        assert result == {"data": []}
+        assert headers["Authorization"] == "Bearer test_access_token"
+        assert headers["User-Agent"] == self.api.CRUNCHYROLL_UA_DEVICE
+        assert headers["Accept-Language"] == "en-US"
+        assert "cf_clearance=abc" in headers["Cookie"]
+        scraper.request.assert_not_called()
+
+    def test_cloudflare_challenge_falls_back_to_scraper(self, server):
+        _Handler.responses.append((403, {}, {"Server": "cloudflare", "Content-Type": "text/html"}))
+
+        with patch.object(self.api, 'get_scraper', return_value=Mock(headers={}, cookies={})), \
+             patch.object(self.api, '_make_scraper_request', return_value={"data": ["solved"]}) as mock_sync:
+            result = asyncio.run(self.api.make_scraper_request_async("GET", server + "/playheads"))
+
+        assert result == {"data": ["solved"]}
+        mock_sync.assert_called_once()
+
+    def test_connection_error_is_mapped_to_login_error(self):
+        with patch.object(self.api, 'get_scraper', return_value=Mock(headers={}, cookies={})):
+            with pytest.raises(LoginError):
+                asyncio.run(self.api.make_scraper_request_async("GET", "http://127.0.0.1:1/playheads"))
+
+
+class TestAsyncHTTPClient:
+    """Unit Tests for the pooled asyncio HTTP client"""
+
+    def test_close_drops_pooled_connections(self, server):
+        client = AsyncHTTPClient()
+
+        asyncio.run(client.request("GET", server + "/a"))
+        client.close()
+        r = asyncio.run(client.request("GET", server + "/b"))
+        client.close()
+
+        assert r.status_code == 200
+        assert r.json() == {"data": []}
+        assert len(_Handler.connections) == 2
+
+    def test_set_cookie_is_stored_in_cookie_jar(self, server):
+        client = AsyncHTTPClient()
+        jar = RequestsCookieJar()
+        _Handler.responses = [(200, {}, {"Set-Cookie": "__cf_bm=abc; Path=/; Expires=Wed, 21 Oct 2099 07:28:00 GMT"})]
+
+        r = asyncio.run(client.request("GET", server + "/a", cookies=jar))
+        client.close()
+
+        assert jar.get("__cf_bm") == "abc"
+        assert r.cookies.get("__cf_bm") == "abc"
+
+    def _stale_connection(self, delay: float = 0) -> _Connection:
+        async def drain():
+            await asyncio.sleep(delay)
+            raise ConnectionResetError("closed by peer")
+
+        reader = Mock()
+        reader.at_eof.return_value = False
+        writer = Mock()
+        writer.drain = drain
+        return _Connection(reader, writer)
+
+    def test_stale_connection_is_retried_for_get(self, server):
+        client = AsyncHTTPClient()
+        port = urlsplit(server).port
+        client._idle[("127.0.0.1", port, 0)] = [self._stale_connection()]
+
+        r = asyncio.run(client.request("GET", server + "/a"))
+        client.close()
+
+        assert r.status_code == 200
+        assert len(_Handler.requests) == 1
+
+    def test_stale_connection_is_not_retried_for_post(self, server):
+        client = AsyncHTTPClient()
+        port = urlsplit(server).port
+        client._idle[("127.0.0.1", port, 0)] = [self._stale_connection()]
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            asyncio.run(client.request("POST", server + "/a", data="x"))
+        client.close()
+
+        assert _Handler.requests == []
+
+    def test_timeout_covers_the_retry(self):
+        # accepts connections, but never answers
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(4)
+        port = listener.getsockname()[1]
+
+        client = AsyncHTTPClient()
+        client._idle[("127.0.0.1", port, 0)] = [self._stale_connection(delay=0.3)]
+
+        started = time.monotonic()
+        with pytest.raises(requests.exceptions.Timeout):
+            asyncio.run(client.request("GET", "http://127.0.0.1:%d/a" % port, timeout=0.5))
+        elapsed = time.monotonic() - started
+        client.close()
+        listener.close()
+
+        assert elapsed < 0.7
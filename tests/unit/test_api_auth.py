@@ -12,6 +12,12 @@ from tests.fixtures.api_responses import (
 )
 
 
+def _mock_scraper() -> Mock:
+    scraper = Mock()
+    scraper.post.return_value = Mock(ok=True, status_code=200, headers={})
+    return scraper
+
+
 class TestAPIAuthUnit:
     """Unit Tests for Authentication Logic (mocked HTTP)"""
 
@@ -30,6 +36,8 @@ class TestAPIAuthUnit:
         """Test successful token refresh flow"""
         mock_response = Mock()
         mock_response.ok = True
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = AUTH_TOKEN_RESPONSE
 
         with patch.object(self.api, 'create_auth_scraper', return_value=None), \
@@ -45,6 +53,7 @@ class TestAPIAuthUnit:
         mock_response = Mock()
         mock_response.ok = False
         mock_response.status_code = 401
+        mock_response.headers = {}
         mock_response.json.return_value = ERROR_RESPONSE_401
 
         with patch.object(self.api, 'create_auth_scraper', return_value=None), \
@@ -57,6 +66,8 @@ class TestAPIAuthUnit:
         """Test device code generation"""
         mock_response = Mock()
         mock_response.ok = True
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = DEVICE_CODE_RESPONSE
 
         mock_scraper = Mock()
@@ -72,7 +83,7 @@ class TestAPIAuthUnit:
     def test_device_token_polling_pending(self):
         """Test device token polling returns pending status"""
         with patch.object(self.api, '_process_device_token_response', return_value={"status": "pending"}), \
-             patch.object(self.api, 'create_auth_scraper', return_value=Mock()):
+             patch.object(self.api, 'create_auth_scraper', return_value=_mock_scraper()):
 
             result = self.api.poll_device_token("mock_device_code")
 
@@ -81,7 +92,7 @@ class TestAPIAuthUnit:
     def test_device_token_polling_success(self):
         """Test successful device token polling"""
         with patch.object(self.api, '_process_device_token_response', return_value={"status": "success", "data": AUTH_TOKEN_RESPONSE}), \
-             patch.object(self.api, 'create_auth_scraper', return_value=Mock()):
+             patch.object(self.api, 'create_auth_scraper', return_value=_mock_scraper()):
 
             result = self.api.poll_device_token("mock_device_code")
 
@@ -101,6 +112,7 @@ class TestAPIAuthUnit:
         mock_response = Mock()
         mock_response.ok = False
         mock_response.status_code = 500
+        mock_response.headers = {}
         mock_response.json.return_value = ERROR_RESPONSE_500
 
         with patch.object(self.api, 'create_auth_scraper', return_value=None), \
@@ -113,6 +125,8 @@ class TestAPIAuthUnit:
         """Test correct authorization header for device auth"""
         mock_response = Mock()
         mock_response.ok = True
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = DEVICE_CODE_RESPONSE
 
         mock_scraper = Mock()
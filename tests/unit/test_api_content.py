@@ -41,6 +41,7 @@ class TestAPIContentUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = browse_data
         mock_response.text = json.dumps(browse_data)
+        mock_response.content = json.dumps(browse_data).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
@@ -67,6 +68,7 @@ class TestAPIContentUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = search_data
         mock_response.text = json.dumps(search_data)
+        mock_response.content = json.dumps(search_data).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
@@ -89,6 +91,7 @@ class TestAPIContentUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = SEASONS_RESPONSE
         mock_response.text = json.dumps(SEASONS_RESPONSE)
+        mock_response.content = json.dumps(SEASONS_RESPONSE).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
@@ -113,6 +116,7 @@ class TestAPIContentUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = EPISODES_RESPONSE
         mock_response.text = json.dumps(EPISODES_RESPONSE)
+        mock_response.content = json.dumps(EPISODES_RESPONSE).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
@@ -136,6 +140,7 @@ class TestAPIContentUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = WATCHLIST_RESPONSE
         mock_response.text = json.dumps(WATCHLIST_RESPONSE)
+        mock_response.content = json.dumps(WATCHLIST_RESPONSE).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
@@ -161,6 +166,7 @@ class TestAPIContentUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = browse_data
         mock_response.text = json.dumps(browse_data)
+        mock_response.content = json.dumps(browse_data).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
@@ -188,6 +194,7 @@ class TestAPIContentUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = browse_data
         mock_response.text = json.dumps(browse_data)
+        mock_response.content = json.dumps(browse_data).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
@@ -215,6 +222,7 @@ class TestAPIContentUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = browse_data
         mock_response.text = json.dumps(browse_data)
+        mock_response.content = json.dumps(browse_data).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from unittest.mock import Mock, patch
+
+from resources.lib.api import API
+from resources.lib.model import AccountData
+from resources.modules import cloudscraper
+from resources.modules.cloudscraper.cloudflare import Cloudflare
+
+
+def _mock_json_response(data: dict) -> Mock:
+    r = Mock()
+    r.ok = True
+    r.status_code = 200
+    r.json.return_value = data
+    r.text = json.dumps(data)
+    r.content = r.text.encode()
+    r.headers = {"Content-Type": "application/json"}
+    return r
+
+
+class TestScraperPool:
+    """Unit Tests for the pooled CloudScraper sessions used by make_scraper_request"""
+
+    def setup_method(self):
+        """Setup API instance with mocked dependencies"""
+        with patch('resources.lib.api.default_request_headers'), \
+             patch('resources.lib.globals.G'):
+            self.api = API()
+            self.api.account_data = AccountData({
+                'access_token': 'test_access_token',
+                'refresh_token': 'test_refresh_token',
+                'token_type': 'Bearer'
+            })
+
+    def test_scraper_is_reused_across_requests(self):
+        """Test that several scraper requests of the same auth type share one scraper"""
+        mock_scraper = Mock()
+        mock_scraper.request.return_value = _mock_json_response({"data": []})
+
+        with patch.object(self.api, 'create_auth_scraper', return_value=mock_scraper) as mock_create:
+            for _ in range(3):
+                self.api.make_scraper_request("GET", self.api.PLAYHEADS_ENDPOINT.format("acc"))
+
+            mock_create.assert_called_once()
+            assert mock_scraper.request.call_count == 3
+
+    def test_scraper_pool_is_keyed_by_auth_type(self):
+        """Test that each auth type gets its own scraper with a matching User-Agent"""
+        with patch.object(self.api, 'create_auth_scraper', side_effect=lambda ua: Mock(user_agent=ua)):
+            device = self.api.get_scraper("device")
+            mobile = self.api.get_scraper("mobile")
+
+            assert device is not mobile
+            assert device is self.api.get_scraper("device")
+            assert device.user_agent == API.CRUNCHYROLL_UA_DEVICE
+            assert mobile.user_agent == API.CRUNCHYROLL_UA_MOBILE
+
+    def test_failed_scraper_creation_is_not_cached(self):
+        """Test that a failed initialization is retried on the next request"""
+        mock_scraper = Mock()
+
+        with patch.object(self.api, 'create_auth_scraper', side_effect=[None, mock_scraper]):
+            assert self.api.get_scraper("device") is None
+            assert self.api.get_scraper("device") is mock_scraper
+
+    def test_close_releases_pooled_scrapers(self):
+        """Test that close() closes and forgets all pooled scrapers"""
+        mock_scraper = Mock()
+
+        with patch.object(self.api, 'create_auth_scraper', return_value=mock_scraper):
+            self.api.get_scraper("device")
+            self.api.close()
+
+            mock_scraper.close.assert_called_once()
+            assert self.api._scrapers == {}
+
+
+class TestSharedScraper:
+    """The pooled scraper is used by several worker threads at once"""
+
+    def test_challenges_are_solved_one_at_a_time(self):
+        scraper = cloudscraper.create_scraper()
+        solving = []
+        overlaps = []
+        depths = []
+
+        def solve(response, **kwargs):
+            solving.append(threading.get_ident())
+            overlaps.append(len(solving))
+            time.sleep(0.05)
+            depths.append(scraper._solveDepthCnt)
+            solving.remove(threading.get_ident())
+            return response
+
+        with patch.object(scraper, 'perform_request', return_value=Mock(headers={})), \
+             patch.object(Cloudflare, 'is_Challenge_Request', return_value=True), \
+             patch.object(Cloudflare, 'Challenge_Response', side_effect=solve):
+            threads = [threading.Thread(target=scraper.get, args=("https://www.crunchyroll.com/",)) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(2)
+
+        assert overlaps == [1, 1, 1]
+        # the loop protection counts per thread, concurrent challenges don't add up
+        assert depths == [1, 1, 1]
+        assert scraper._solveDepthCnt == 0
@@ -32,6 +32,7 @@ class TestAPIStreamingUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = STREAM_RESPONSE
         mock_response.text = json.dumps(STREAM_RESPONSE)
+        mock_response.content = json.dumps(STREAM_RESPONSE).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
@@ -56,6 +57,7 @@ class TestAPIStreamingUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = STREAM_RESPONSE
         mock_response.text = json.dumps(STREAM_RESPONSE)
+        mock_response.content = json.dumps(STREAM_RESPONSE).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
@@ -81,6 +83,7 @@ class TestAPIStreamingUnit:
         mock_response.status_code = 200
         mock_response.json.return_value = STREAM_RESPONSE
         mock_response.text = json.dumps(STREAM_RESPONSE)
+        mock_response.content = json.dumps(STREAM_RESPONSE).encode()
         mock_response.headers = {"Content-Type": "application/json"}
 
         with patch.object(self.api, 'is_token_valid', return_value=True), \
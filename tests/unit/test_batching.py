@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from resources.lib.batching import BatchedLookup, DataLoader, chunk_ids
+
+
+class TestChunkIds:
+    """Unit Tests for splitting id lists into URL-safe chunks"""
+
+    def test_chunks_are_bounded_by_count(self):
+        assert chunk_ids(["a", "b", "c", "d", "e"], max_ids=2, max_length=100) == [["a", "b"], ["c", "d"], ["e"]]
+
+    def test_chunks_are_bounded_by_joined_length(self):
+        ids = ["G" * 9] * 5
+        chunks = chunk_ids(ids, max_ids=50, max_length=20)
+
+        assert all(len(",".join(chunk)) <= 20 for chunk in chunks)
+        assert sum(chunks, []) == ids
+
+
+class TestBatchedLookup:
+    """Unit Tests for the batched, memoized id lookup"""
+
+    def test_chunks_are_fetched_in_parallel_and_memoized(self):
+        requested = []
+
+        async def fetch(ids):
+            requested.append(ids)
+            await asyncio.sleep(0.1)
+            return {item_id: item_id.upper() for item_id in ids if item_id != "c"}
+
+        lookup = BatchedLookup("test", fetch, max_ids=2)
+
+        first = asyncio.run(lookup.get_many(["a", "b", "c", "a", None]))
+        second = asyncio.run(lookup.get_many(["b", "c", "d"]))
+
+        assert first == {"a": "A", "b": "B"}
+        assert second == {"b": "B", "d": "D"}
+        assert requested == [["a", "b"], ["c"], ["d"]]
+
+    def test_failed_chunk_is_not_memoized(self):
+        calls = []
+
+        async def fetch(ids):
+            calls.append(ids)
+            if "bad" in ids and len(calls) == 1:
+                raise ValueError("boom")
+            return {item_id: True for item_id in ids}
+
+        lookup = BatchedLookup("test", fetch, max_ids=1, errors=(ValueError,))
+
+        assert asyncio.run(lookup.get_many(["bad", "good"])) == {"good": True}
+        assert asyncio.run(lookup.get_many(["bad"])) == {"bad": True}
+
+    def test_unexpected_errors_are_raised(self):
+        async def fetch(ids):
+            raise KeyError("boom")
+
+        with pytest.raises(KeyError):
+            asyncio.run(BatchedLookup("test", fetch).get_many(["a"]))
+
+    def test_default_is_used_for_ids_without_result(self):
+        async def fetch(ids):
+            return {"a": True}
+
+        assert asyncio.run(BatchedLookup("test", fetch, default=False).get_many(["a", "b"])) == {"a": True, "b": False}
+
+
+class TestDataLoader:
+    """Unit Tests for collecting single loads into one batched request"""
+
+    def test_loads_of_one_iteration_share_one_request(self):
+        requested = []
+
+        async def fetch(ids):
+            requested.append(sorted(ids))
+            return {item_id: {"id": item_id} for item_id in ids if item_id != "missing"}
+
+        loader = DataLoader(BatchedLookup("test", fetch))
+
+        async def run():
+            return await asyncio.gather(
+                loader.load("a"),
+                loader.load("b"),
+                loader.load_many(["a", "c", "missing"]),
+            )
+
+        a, b, many = asyncio.run(run())
+
+        assert requested == [["a", "b", "c", "missing"]]
+        assert a == {"id": "a"} and b == {"id": "b"}
+        assert many == {"a": {"id": "a"}, "c": {"id": "c"}}
+        # memoized results don't cause another request
+        assert asyncio.run(loader.load("c")) == {"id": "c"}
+        assert asyncio.run(loader.load("missing")) is None
+        assert len(requested) == 1
+
+    def test_errors_are_passed_to_every_waiter(self):
+        async def fetch(ids):
+            raise KeyError("boom")
+
+        loader = DataLoader(BatchedLookup("test", fetch), window=0.01)
+
+        async def run():
+            return await asyncio.gather(loader.load("a"), loader.load("b"), return_exceptions=True)
+
+        assert all(isinstance(result, KeyError) for result in asyncio.run(run()))
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from resources.lib.api import API
+from resources.lib.cancellation import CancellationToken, RequestCancelled, Watchdog
+from resources.lib.model import AccountData
+
+
+class TestCancellationToken:
+    """Unit Tests for cooperative cancellation of outstanding requests"""
+
+    def test_running_coroutine_is_abandoned_on_cancel(self):
+        token = CancellationToken()
+
+        async def slow():
+            await asyncio.sleep(10)
+
+        threading.Timer(0.1, token.cancel).start()
+
+        start = time.monotonic()
+        with pytest.raises(RequestCancelled):
+            asyncio.run(token.run_cancellable(slow()))
+
+        assert time.monotonic() - start < 1
+
+    def test_wait_wakes_up_on_cancel(self):
+        token = CancellationToken()
+        threading.Timer(0.1, token.cancel).start()
+
+        start = time.monotonic()
+        assert token.wait(10)
+        assert time.monotonic() - start < 1
+
+    def test_callbacks_run_once(self):
+        token = CancellationToken()
+        callback = Mock()
+        removed = Mock()
+
+        token.add_callback(callback)
+        token.remove_callback(token.add_callback(removed))
+        token.cancel()
+        token.cancel()
+
+        callback.assert_called_once()
+        removed.assert_not_called()
+
+    def test_watchdog_cancels_on_abort(self):
+        token = CancellationToken()
+        monitor = Mock()
+        monitor.waitForAbort.side_effect = [False, True]
+
+        watchdog = Watchdog(monitor, token)
+        watchdog.start()
+        watchdog.join(1)
+
+        assert token.is_cancelled()
+
+
+class TestCancelledRequests:
+    """Cancelled invocations don't send new requests"""
+
+    def test_request_after_cancel_is_not_sent(self):
+        token = CancellationToken()
+        token.cancel()
+
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            api = API()
+            api.account_data = None
+
+        mock_http = Mock()
+        with patch.object(API, 'http', mock_http), patch('resources.lib.api.get_cancel_token', return_value=token):
+            with pytest.raises(RequestCancelled):
+                api.make_unauthenticated_request("GET", "https://static.crunchyroll.com/skip-events/x.json")
+
+        mock_http.send.assert_not_called()
+
+    def _api(self) -> API:
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            api = API()
+        api.account_data = AccountData({
+            'access_token': 'token',
+            'token_type': 'Bearer',
+            'expires': '2099-1-1T0:0:0Z',
+            'account_id': 'account',
+        })
+        return api
+
+    def test_cancelled_scraper_request_is_no_login_error(self):
+        token = CancellationToken()
+        token.cancel()
+        api = self._api()
+        scraper = Mock(headers={}, cookies={})
+
+        with patch.object(api, 'get_scraper', return_value=scraper), \
+             patch('resources.lib.api.get_cancel_token', return_value=token):
+            with pytest.raises(RequestCancelled):
+                api.make_scraper_request("GET", API.PLAYHEADS_ENDPOINT.format("account"))
+            with pytest.raises(RequestCancelled):
+                asyncio.run(api.make_scraper_request_async("GET", API.PLAYHEADS_ENDPOINT.format("account")))
+
+        scraper.request.assert_not_called()
@@ -0,0 +1,99 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import patch
+
+from requests import Response
+
+from resources.lib.api import API, date_to_str
+from resources.lib.clockskew import ClockSkew, get_server_time
+from resources.lib.model import AccountData
+
+
+def make_response(offset: float, age: int = 0, rtt: float = 0.1) -> Response:
+    r = Response()
+    r.status_code = 200
+    server_now = datetime.now(timezone.utc) + timedelta(seconds=offset - age)
+    r.headers["Date"] = format_datetime(server_now, usegmt=True)
+    if age:
+        r.headers["Age"] = str(age)
+    r.elapsed = timedelta(seconds=rtt)
+    return r
+
+
+class TestClockSkew:
+    """Unit Tests for estimating the server clock from Date headers"""
+
+    def test_server_time_includes_age_of_cached_response(self):
+        r = make_response(0, age=120)
+        assert abs(get_server_time(r) - time.time()) < 2
+
+    def test_missing_or_invalid_date_is_ignored(self):
+        clock_skew = ClockSkew()
+        r = Response()
+        clock_skew.observe(r)
+        r.headers["Date"] = "yesterday"
+        clock_skew.observe(r)
+
+        assert clock_skew.get_offset() == 0.0
+
+    def test_offset_is_median_of_samples(self):
+        clock_skew = ClockSkew()
+        for _ in range(4):
+            clock_skew.observe(make_response(-600))
+        # one response stuck somewhere on the way
+        clock_skew.observe(make_response(-660))
+
+        assert abs(clock_skew.get_offset() + 600) < 2
+        assert abs(clock_skew.now() - (time.time() - 600)) < 2
+
+    def test_persisted_offset_only_seeds_the_estimate(self):
+        clock_skew = ClockSkew()
+        clock_skew.set_offset(300)
+        assert clock_skew.get_offset() == 300
+
+        clock_skew.observe(make_response(0))
+        clock_skew.set_offset(300)
+        assert abs(clock_skew.get_offset()) < 2
+
+
+class TestTokenExpiryInServerTime:
+    """The token check compares the expiry with server time"""
+
+    def _api(self, offset: float, expires: datetime) -> API:
+        with patch('resources.lib.api.default_request_headers', return_value={}):
+            api = API()
+        api._restore_account_data({
+            'access_token': 'token',
+            'token_type': 'Bearer',
+            'expires': date_to_str(expires),
+            'clock_offset': offset,
+        })
+        return api
+
+    def test_token_expired_by_server_clock_is_refreshed_before_request(self):
+        # local clock is 10 minutes behind, the token looks valid for another 5 minutes locally
+        api = self._api(600, datetime.utcnow() + timedelta(seconds=300))
+
+        assert api.clock_skew.get_offset() == 600
+        assert not api.is_token_valid()
+
+    def test_expired_token_stays_expired_with_server_clock_behind(self):
+        api = self._api(-600, datetime.utcnow() - timedelta(seconds=300))
+        assert api.is_token_valid()
+
+        api._expire_token()
+        assert not api.is_token_valid()
+
+    def test_offset_is_taken_from_responses(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}):
+            api = API()
+        api.account_data = AccountData({
+            'access_token': 'token',
+            'expires': date_to_str(datetime.utcnow() + timedelta(seconds=300)),
+        })
+
+        with patch.object(api.host_health, 'check'):
+            api._send("GET", "https://beta-api.crunchyroll.com/x", lambda timeout: make_response(600))
+
+        assert not api.is_token_valid()
@@ -0,0 +1,83 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from resources.lib import deadline
+from resources.lib.api import API
+from resources.lib.deadline import Deadline, DeadlineExceeded, clear_deadline, start_deadline
+from resources.lib.model import AccountData, LoginError
+
+URL = "https://beta-api.crunchyroll.com/content/v2/discover/seasonal_tags"
+
+
+class TestDeadline:
+    """Unit Tests for the per-invocation time budget"""
+
+    def teardown_method(self):
+        clear_deadline()
+
+    def test_timeout_is_capped_to_remaining_budget(self):
+        d = Deadline(deadline.ROUTE_LISTING, budget=5)
+
+        assert d.get_timeout(30) <= 5
+        assert d.get_timeout(1) == 1
+
+    def test_spent_budget_raises(self):
+        d = Deadline(deadline.ROUTE_PLAYBACK, budget=0)
+
+        assert d.is_expired()
+        assert not d.has_time_for_optional_work()
+        with pytest.raises(DeadlineExceeded):
+            d.get_timeout(30)
+
+    def test_background_budget_applies_per_request(self):
+        d = Deadline(deadline.ROUTE_BACKGROUND)
+
+        with patch('resources.lib.deadline.time.monotonic', return_value=d.started + 3600):
+            assert d.get_timeout(30) == 30
+
+    def test_requests_inherit_the_deadline(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            api = API()
+            api.account_data = AccountData({
+                'expires': '2099-1-1T0:0:0Z',
+                'access_token': 'token',
+                'cms': {'policy': 'p', 'signature': 's', 'key_pair_id': 'k'}
+            })
+
+        mock_http = Mock()
+        mock_http.request.return_value = Mock(status_code=200, ok=True, content=b'{"data": []}', headers={})
+
+        with patch.object(API, 'http', mock_http):
+            start_deadline(deadline.ROUTE_LISTING, budget=4)
+            api.make_request("GET", URL)
+            assert mock_http.request.call_args.kwargs["timeout"] <= 4
+
+            start_deadline(deadline.ROUTE_LISTING, budget=0)
+            with pytest.raises(DeadlineExceeded):
+                api.make_request("GET", URL)
+
+        assert mock_http.request.call_count == 1
+
+    def test_token_refresh_inherits_the_deadline(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            api = API()
+            api.account_data = AccountData({'access_token': 'token', 'refresh_token': 'refresh'})
+
+        token_response = Mock(status_code=500, ok=False, headers={})
+        scraper = Mock()
+        scraper.post.return_value = token_response
+        mock_http = Mock()
+        mock_http.post.return_value = token_response
+
+        start_deadline(deadline.ROUTE_LISTING, budget=4)
+        with patch.object(API, 'http', mock_http), \
+             patch.object(api, 'get_scraper', return_value=scraper):
+            with pytest.raises(LoginError):
+                api._handle_refresh_flow()
+
+        # both the www endpoint and the beta-api fallback are bound by the budget
+        assert scraper.post.call_args.kwargs["timeout"] <= 4
+        assert mock_http.post.call_args.kwargs["timeout"] <= 4
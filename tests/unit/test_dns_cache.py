@@ -0,0 +1,98 @@
+import socket
+from unittest.mock import patch
+
+import pytest
+
+from resources.lib import dnscache
+from resources.lib.dnscache import DNSCache
+
+HOST = "beta-api.crunchyroll.com"
+ANSWER = [
+    (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("203.0.113.10", 443)),
+    (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("2001:db8::10", 443, 0, 0)),
+]
+
+
+class TestDNSCache:
+    """Unit Tests for the on-disk resolver cache"""
+
+    def teardown_method(self):
+        dnscache.uninstall()
+
+    def test_answers_are_cached_across_invocations(self, tmp_path):
+        cache = DNSCache(str(tmp_path / "dns_cache.json"))
+
+        with patch('resources.lib.dnscache._system_getaddrinfo', return_value=ANSWER) as resolver:
+            assert cache.getaddrinfo(HOST, 443, 0, socket.SOCK_STREAM) == ANSWER
+            cache.save()
+
+            # next invocation
+            restored = DNSCache(str(tmp_path / "dns_cache.json"))
+            restored.load()
+            assert restored.getaddrinfo(HOST, "8443", 0, socket.SOCK_STREAM) == [
+                (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("203.0.113.10", 8443)),
+                (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("2001:db8::10", 8443, 0, 0)),
+            ]
+
+        resolver.assert_called_once()
+        assert restored.get_stats()["hit_rate"] == 0.5
+
+    def test_expired_answer_is_resolved_again_and_served_stale_on_error(self):
+        cache = DNSCache(ttl=60)
+
+        with patch('resources.lib.dnscache._system_getaddrinfo', return_value=ANSWER):
+            cache.getaddrinfo(HOST, 443)
+
+        later = cache._entries[HOST + "|0"]["resolved"] + 120
+        with patch('resources.lib.dnscache.time.time', return_value=later), \
+             patch('resources.lib.dnscache._system_getaddrinfo', side_effect=socket.gaierror("timeout")) as resolver:
+            assert cache.getaddrinfo(HOST, 443)[0][4] == ("203.0.113.10", 443)
+
+        resolver.assert_called_once()
+        assert cache.get_stats()["stale"] == 1
+
+    def test_cache_hits_do_not_rewrite_the_file(self, tmp_path):
+        cache = DNSCache(str(tmp_path / "dns_cache.json"))
+
+        with patch('resources.lib.dnscache._system_getaddrinfo', return_value=ANSWER):
+            cache.getaddrinfo(HOST, 443)
+        cache.save()
+
+        restored = DNSCache(str(tmp_path / "dns_cache.json"))
+        restored.load()
+        restored.getaddrinfo(HOST, 443)
+
+        with patch('resources.lib.utils.write_file_atomic') as write:
+            restored.save()
+
+        write.assert_not_called()
+
+    def test_service_name_port_is_passed_to_system_resolver(self):
+        cache = DNSCache()
+
+        with patch('resources.lib.dnscache._system_getaddrinfo', return_value=ANSWER) as resolver:
+            assert cache.getaddrinfo(HOST, "https") == ANSWER
+
+        resolver.assert_called_once_with(HOST, "https", 0, 0, 0, 0)
+        assert cache._entries == {}
+
+    def test_other_hosts_are_not_cached(self):
+        cache = DNSCache()
+
+        with patch('resources.lib.dnscache._system_getaddrinfo', return_value=ANSWER) as resolver:
+            cache.getaddrinfo("example.com", 443)
+            cache.getaddrinfo("example.com", 443)
+            cache.getaddrinfo("notcrunchyroll.com", 443)
+
+        assert resolver.call_count == 3
+
+    def test_install_replaces_the_system_resolver(self):
+        cache = DNSCache()
+        cache.install()
+
+        with patch('resources.lib.dnscache._system_getaddrinfo', side_effect=socket.gaierror("offline")):
+            with pytest.raises(socket.gaierror):
+                socket.getaddrinfo(HOST, 443)
+
+        dnscache.uninstall()
+        assert socket.getaddrinfo is dnscache._system_getaddrinfo
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from resources.lib.api import API
+from resources.lib.executor import run_in_executor, get_executor, shutdown_executor
+
+
+def _slow(value, delay=0.2):
+    time.sleep(delay)
+    return value
+
+
+class TestRequestExecutor:
+    """Unit Tests for the request executor used to fan out blocking API calls"""
+
+    def teardown_method(self):
+        shutdown_executor()
+
+    def test_run_in_executor_makes_asyncio_gather_concurrent(self):
+        async def fan_out():
+            return await asyncio.gather(
+                run_in_executor(_slow, "a"),
+                run_in_executor(_slow, "b"),
+                run_in_executor(_slow, "c", delay=0.2),
+            )
+
+        start = time.monotonic()
+        results = asyncio.run(fan_out())
+        elapsed = time.monotonic() - start
+
+        assert results == ["a", "b", "c"]
+        assert elapsed < 0.5
+
+    def test_global_executor_is_recreated_after_shutdown(self):
+        first = get_executor()
+        shutdown_executor()
+
+        assert get_executor() is not first
+
+
+class TestThreadLocalSessions:
+    """Each worker thread gets its own requests session"""
+
+    def setup_method(self):
+        with patch('resources.lib.api.default_request_headers'), \
+             patch('resources.lib.globals.G'):
+            self.api = API()
+
+    def test_http_session_is_per_thread(self):
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(self.api.http))
+        thread.start()
+        thread.join()
+
+        assert self.api.http is self.api.http
+        assert sessions[0] is not self.api.http
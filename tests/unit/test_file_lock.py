@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from resources.lib.api import API, date_to_str, get_date
+from resources.lib.filelock import FileLock
+from resources.lib.model import AccountData
+
+
+class TestFileLock:
+    """Unit Tests for the lock shared by plugin processes"""
+
+    def test_second_process_waits_for_release(self, tmp_path):
+        path = str(tmp_path / "session_data.lock")
+        # one instance per process, they only share the file
+        first, second = FileLock(path), FileLock(path)
+        first.acquire()
+        assert os.path.exists(path)
+
+        acquired = threading.Event()
+
+        def take():
+            with second:
+                acquired.set()
+
+        thread = threading.Thread(target=take)
+        thread.start()
+        assert not acquired.wait(0.2)
+
+        first.release()
+        assert acquired.wait(1)
+        thread.join(1)
+        assert not os.path.exists(path)
+
+    def test_reentrant_within_thread(self, tmp_path):
+        lock = FileLock(str(tmp_path / "session_data.lock"))
+
+        assert lock.acquire() is True
+        assert lock.acquire() is False
+        lock.release()
+        assert os.path.exists(lock.path)
+        lock.release()
+        assert not os.path.exists(lock.path)
+
+    def test_stale_lock_is_taken_over(self, tmp_path):
+        path = str(tmp_path / "session_data.lock")
+        with open(path, "w") as file:
+            file.write("12345")
+        old = time.time() - 600
+        os.utime(path, (old, old))
+
+        lock = FileLock(path, timeout=1)
+        started = time.monotonic()
+        with lock:
+            assert time.monotonic() - started < 0.5
+            assert open(path).read() == str(os.getpid())
+
+    def test_goes_ahead_without_lock_after_timeout(self, tmp_path):
+        path = str(tmp_path / "session_data.lock")
+        FileLock(path).acquire()
+
+        lock = FileLock(path, timeout=0.2)
+        with lock:
+            pass
+
+        # the lock file of the other process is left alone
+        assert os.path.exists(path)
+
+
+class TestSessionReuse:
+    """A process waiting for the lock reuses the session another process renewed"""
+
+    def _api(self, tmp_path, expires_in: int) -> API:
+        with patch('resources.lib.api.default_request_headers', return_value={}):
+            api = API()
+        api._refresh_lock = FileLock(str(tmp_path / "session_data.lock"))
+        api.account_data = AccountData({
+            'access_token': 'old',
+            'refresh_token': 'refresh',
+            'token_type': 'Bearer',
+            'expires': date_to_str(get_date() + timedelta(seconds=expires_in)),
+        })
+        return api
+
+    def test_expired_token_reuses_session_stored_by_other_process(self, tmp_path):
+        api = self._api(tmp_path, expires_in=-1)
+        stored = {
+            'access_token': 'new',
+            'refresh_token': 'rotated',
+            'token_type': 'Bearer',
+            'expires': date_to_str(get_date() + timedelta(seconds=300)),
+        }
+
+        with patch.object(AccountData, 'load_from_storage', return_value=stored), \
+             patch.object(api, '_handle_refresh_flow') as handle_refresh:
+            api._refresh_if_expired("test")
+
+        handle_refresh.assert_not_called()
+        assert api.account_data.access_token == 'new'
+        assert api.api_headers["Authorization"] == "Bearer new"
+
+    def test_refreshes_when_stored_session_is_ours(self, tmp_path):
+        api = self._api(tmp_path, expires_in=-1)
+        stored = vars(api.account_data).copy()
+        stored.pop('cms')
+
+        with patch.object(AccountData, 'load_from_storage', return_value=stored), \
+             patch.object(api, '_handle_refresh_flow') as handle_refresh:
+            api._refresh_if_expired("test")
+
+        handle_refresh.assert_called_once()
@@ -3,10 +3,11 @@ from unittest.mock import Mock, patch
 import pytest
 import requests
 
-from resources.lib.api import get_json_from_response
+from resources.lib.api import get_decode_stats, get_json_from_response
 from resources.lib.model import CrunchyrollError, LoginError
 
 ASS_CONTENT = "[Script Info]\nTitle: Test\n"
+UTF8_CONTENT = "Dialogue: 0,0:00:01.00,0:00:02.00,Default,,0,0,0,,Schöne Grüße – 進撃の巨人\n"
 
 
 def _mock_response(content_type: str, text: str, status_code: int = 200, ok: bool = True) -> Mock:
@@ -14,6 +15,7 @@ def _mock_response(content_type: str, text: str, status_code: int = 200, ok: boo
     r.ok = ok
     r.status_code = status_code
     r.text = text
+    r.content = text.encode()
     r.headers = {"Content-Type": content_type}
     r.encoding = None
     r.json.return_value = {}
@@ -30,15 +32,16 @@ class TestPlainTextResponses:
         r = _mock_response("application/octet-stream", ASS_CONTENT)
         assert get_json_from_response(r) == {"data": ASS_CONTENT}
 
-    def test_text_plain_sets_utf8_encoding(self):
-        r = _mock_response("text/plain", ASS_CONTENT)
-        get_json_from_response(r)
-        assert r.encoding == "utf-8"
+    def test_text_plain_is_decoded_as_utf8(self):
+        r = _mock_response("text/plain", UTF8_CONTENT)
+        # a wrong guess of requests must not matter, the raw body is decoded
+        r.encoding = "ISO-8859-1"
+        assert get_json_from_response(r) == {"data": UTF8_CONTENT}
 
-    def test_octet_stream_sets_utf8_encoding(self):
-        r = _mock_response("application/octet-stream", ASS_CONTENT)
-        get_json_from_response(r)
-        assert r.encoding == "utf-8"
+    def test_octet_stream_is_decoded_as_utf8(self):
+        r = _mock_response("application/octet-stream", UTF8_CONTENT)
+        r.encoding = "ISO-8859-1"
+        assert get_json_from_response(r) == {"data": UTF8_CONTENT}
 
 
 class TestJsonResponses:
@@ -66,4 +69,25 @@ class TestJsonResponses:
                            status_code=400, ok=False)
         r.json.return_value = {"error": "invalid_grant"}
         with pytest.raises(LoginError):
-            get_json_from_response(r)
\ No newline at end of file
+            get_json_from_response(r)
+
+
+class TestSingleDecode:
+
+    def test_body_is_parsed_from_bytes_once(self):
+        r = _mock_response("application/json", '  \n{"items": [1]}')
+        r.url = "https://beta-api.crunchyroll.com/content/v2/cms/objects/GRMG8ZQZR,G6NQ5DWZ6"
+
+        assert get_json_from_response(r) == {"items": [1]}
+        r.json.assert_not_called()
+        assert get_decode_stats()["/content/v2/cms/objects/{id}"]["count"] >= 1
+
+    def test_json_error_body_with_leading_whitespace_is_parsed(self):
+        r = _mock_response("application/json", ' {"error": "invalid_grant"}', status_code=400, ok=False)
+        with pytest.raises(LoginError):
+            get_json_from_response(r)
+
+    def test_non_json_error_body_raises_crunchyroll_error(self):
+        r = _mock_response("text/html", "<html>Bad Gateway</html>", status_code=502, ok=False)
+        with pytest.raises(CrunchyrollError, match="Bad Gateway"):
+            get_json_from_response(r)
@@ -0,0 +1,109 @@
+import json
+import os
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+from resources.lib.api import API
+from resources.lib import httpcache
+from resources.lib.httpcache import ResponseCache
+from resources.lib.model import AccountData
+
+
+def _response(status: int, data=None, headers=None) -> Mock:
+    r = Mock()
+    r.status_code = status
+    r.ok = status < 400
+    r.json.return_value = data
+    r.text = json.dumps(data) if data is not None else ""
+    r.content = r.text.encode()
+    r.headers = {"Content-Type": "application/json"}
+    r.headers.update(headers or {})
+    return r
+
+
+class TestResponseCache:
+    """Unit Tests for the on-disk conditional response cache of make_request"""
+
+    @pytest.fixture(autouse=True)
+    def setup_api(self, tmp_path):
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            self.api = API()
+            self.api.account_data = AccountData({
+                'access_token': 'test_access_token',
+                'token_type': 'Bearer',
+                'expires': '2099-1-1T0:0:0Z',
+                'cms': {'policy': 'p', 'signature': 's', 'key_pair_id': 'k', 'bucket': '/US/M3'}
+            })
+            self.api.http_cache = ResponseCache(str(tmp_path), self.api.HTTP_CACHE_RULES)
+            self.url = self.api.SEASONS_ENDPOINT.format('/US/M3')
+
+    def _request(self):
+        return self.api.make_request("GET", self.url, params={"series_id": "G1", "locale": "en-US"})
+
+    def test_fresh_entry_is_served_without_request(self):
+        mock_http = Mock()
+        mock_http.request.return_value = _response(200, {"data": [1]}, {"ETag": '"v1"'})
+
+        with patch.object(API, 'http', mock_http):
+            assert self._request() == {"data": [1]}
+            assert self._request() == {"data": [1]}
+
+        assert mock_http.request.call_count == 1
+
+    def test_expired_entry_is_revalidated(self):
+        mock_http = Mock()
+        mock_http.request.side_effect = [
+            _response(200, {"data": [1]}, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}),
+            _response(304)
+        ]
+
+        with patch.object(API, 'http', mock_http):
+            self._request()
+            with patch('resources.lib.httpcache.time.time', return_value=time.time() + 3600):
+                result = self._request()
+
+        headers = mock_http.request.call_args_list[1].kwargs["headers"]
+        assert result == {"data": [1]}
+        assert headers["If-None-Match"] == '"v1"'
+        assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    def test_stale_entry_is_served_on_error(self):
+        mock_http = Mock()
+        # the first response, then the request and all its retries fail
+        mock_http.request.side_effect = [_response(200, {"data": [1]})] + [
+            requests.exceptions.ConnectionError("offline")
+        ] * 3
+
+        with patch.object(API, 'http', mock_http), \
+             patch('resources.lib.api.get_retry_delay', return_value=0):
+            self._request()
+            with patch('resources.lib.httpcache.time.time', return_value=time.time() + 3600):
+                assert self._request() == {"data": [1]}
+
+    def test_key_ignores_signing_params_but_not_profile(self):
+        key = ResponseCache.make_key(self.url, {"locale": "en-US", "Signature": "a"}, "profile1", "en-US")
+
+        assert key == ResponseCache.make_key(self.url, {"locale": "en-US", "Signature": "b"}, "profile1", "en-US")
+        assert key != ResponseCache.make_key(self.url, {"locale": "en-US"}, "profile2", "en-US")
+
+    def test_uncached_endpoints_and_methods_are_ignored(self):
+        assert self.api.http_cache.get_ttl("GET", self.api.HISTORY_ENDPOINT.format("acc")) is None
+        assert self.api.http_cache.get_ttl("POST", self.url) is None
+        assert self.api.http_cache.get_ttl("GET", self.api.CATEGORIES_ENDPOINT) == 24 * 60 * 60
+
+    def test_prune_keeps_recently_used_entries(self):
+        cache = self.api.http_cache
+        old = time.time() - httpcache.MAX_AGE - 60
+        for key in ("used", "unused"):
+            cache.store(key, self.url, _response(200), {"data": [key]}, 60)
+            os.utime(cache._get_file(key), (old, old))
+
+        assert cache.get("used").data == {"data": ["used"]}
+        cache.prune()
+
+        assert cache.get("used") is not None
+        assert cache.get("unused") is None
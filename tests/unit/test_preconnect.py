@@ -0,0 +1,111 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+from resources.lib.api import API
+from resources.lib.deadline import ROUTE_LISTING, ROUTE_PLAYBACK
+from resources.lib.preconnect import Preconnector, open_pooled_connection
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class _CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def get_request(self):
+        self.connections += 1
+        return super().get_request()
+
+
+@pytest.fixture
+def server():
+    httpd = _CountingServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestPreconnect:
+    """Unit Tests for speculative connects into the session pool"""
+
+    def test_request_uses_preconnected_connection(self, server):
+        url = "http://127.0.0.1:%d/" % server.server_address[1]
+        session = requests.Session()
+
+        assert open_pooled_connection(session, url, 5)
+        assert not open_pooled_connection(session, url, 5)
+        assert session.get(url).text == "ok"
+        assert session.get(url).text == "ok"
+
+        assert server.connections == 1
+
+    def test_request_waits_for_connect_in_progress(self, server):
+        url = "http://127.0.0.1:%d/" % server.server_address[1]
+        session = requests.Session()
+        preconnector = Preconnector()
+
+        preconnector.start(session, url).join(5)
+        preconnector.wait(session, "127.0.0.1")
+        assert session.get(url).text == "ok"
+
+        assert server.connections == 1
+
+    def test_failed_connect_frees_the_pool_slot(self):
+        session = requests.Session()
+        session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=1, pool_block=True))
+
+        with pytest.raises(Exception):
+            open_pooled_connection(session, "http://127.0.0.1:1/", 1)
+
+        # the slot was returned, otherwise the pool would block
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.get("http://127.0.0.1:1/", timeout=1)
+
+    def test_playback_warms_the_session_sending_its_requests(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}):
+            api = API()
+        scraper = requests.Session()
+
+        with patch.object(api, '_init_transport'), \
+             patch.object(api, 'get_scraper', return_value=scraper) as get_scraper, \
+             patch.object(api.preconnector, 'start') as start:
+            api.preconnect(ROUTE_PLAYBACK)
+
+        get_scraper.assert_called_once_with("device")
+        targets = {url: session for session, url, _ in (c.args for c in start.call_args_list)}
+        # the stream request to www goes through the pooled CloudScraper
+        assert targets["https://www.crunchyroll.com/"] is scraper
+        assert targets["https://cr-play-service.prd.crunchyrollsvc.com/"] is api.http
+
+    def test_only_warm_hosts_are_preconnected(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}):
+            api = API()
+        api.tls_sessions = Mock()
+        api.tls_sessions.get_warm_hosts.return_value = ["beta-api.crunchyroll.com"]
+
+        with patch.object(api, '_init_transport'), \
+             patch.object(api, 'get_scraper', return_value=None), \
+             patch.object(api.preconnector, 'start') as start:
+            api.preconnect(ROUTE_PLAYBACK)
+            # cr-play-service wasn't used lately
+            start.assert_not_called()
+
+            api.preconnect(ROUTE_LISTING)
+            assert start.call_args.args[1] == "https://beta-api.crunchyroll.com/"
@@ -0,0 +1,95 @@
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from resources.lib.api import API, date_to_str
+from resources.lib.model import AccountData, Cacheable, ProfileData
+from resources.lib.profilevault import ProfileVault
+
+
+def make_account(access_token: str, expires_in: float, account_id: str = "account") -> dict:
+    return {
+        "access_token": access_token,
+        "refresh_token": f"refresh-{access_token}",
+        "token_type": "Bearer",
+        "account_id": account_id,
+        "expires": date_to_str(datetime.utcnow() + timedelta(seconds=expires_in)),
+    }
+
+
+class TestProfileVault:
+    """Unit Tests for keeping the sessions of recently used profiles"""
+
+    def test_bundle_usable_while_access_token_is_valid(self, tmp_path):
+        vault = ProfileVault(str(tmp_path / "profile_vault.json"))
+        vault.store("kids", make_account("kids", 240), {"profile_id": "kids"}, time.time())
+
+        assert vault.get("account", "kids", time.time())["account"]["access_token"] == "kids"
+        assert vault.get("account", "kids", time.time() + 200) is None
+        assert vault.get("other-account", "kids", time.time()) is None
+        assert vault.get("account", "main", time.time()) is None
+
+    def test_refresh_keeps_profile_and_drops_expired_bundles(self, tmp_path):
+        vault = ProfileVault(str(tmp_path / "profile_vault.json"))
+        vault.store("old", make_account("old", -10), {"profile_id": "old"}, time.time())
+        vault.store("kids", make_account("kids", 240), {"profile_id": "kids"}, time.time())
+        vault.store("kids", make_account("kids-renewed", 300), None, time.time())
+
+        bundle = vault.get("account", "kids", time.time())
+        assert bundle["account"]["access_token"] == "kids-renewed"
+        assert bundle["profile"] == {"profile_id": "kids"}
+        assert set(vault._read()) == {"kids"}
+
+
+class TestProfileSwitch:
+    """Switching back to a recent profile is a local swap, the token exchange runs in the background"""
+
+    def setup_method(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}):
+            self.api = API()
+        self.api.account_data = AccountData(make_account("main", 240))
+        self.api.profile_data = ProfileData({"profile_id": "main"})
+
+    def test_switch_to_recent_profile_swaps_locally(self, tmp_path):
+        self.api.profile_vault = ProfileVault(str(tmp_path / "profile_vault.json"))
+        self.api.profile_vault.store("kids", make_account("kids", 240), {"profile_id": "kids"}, time.time())
+
+        with patch.object(Cacheable, 'write_to_storage'), \
+             patch.object(self.api, '_adopt_stored_session', return_value=False), \
+             patch.object(self.api.token_refresher, 'schedule') as schedule, \
+             patch.object(self.api, '_handle_profile_refresh_flow') as profile_refresh:
+            self.api.create_session(action="refresh_profile", profile_id="kids")
+
+        profile_refresh.assert_not_called()
+        schedule.assert_called_once_with(0, force=True)
+        assert self.api.profile_data.profile_id == "kids"
+        assert self.api.api_headers["Authorization"] == "Bearer kids"
+        # the spent refresh token of the bundle is replaced by the current one
+        assert self.api.account_data.refresh_token == "refresh-main"
+        assert self.api.account_data.pending_profile_id == "kids"
+
+        with patch.object(self.api, '_handle_profile_refresh_flow') as profile_refresh:
+            self.api._renew_session()
+        profile_refresh.assert_called_once_with("kids")
+
+    def test_switch_to_unknown_profile_exchanges_token(self, tmp_path):
+        self.api.profile_vault = ProfileVault(str(tmp_path / "profile_vault.json"))
+
+        with patch.object(self.api, '_adopt_stored_session', return_value=False), \
+             patch.object(self.api, '_handle_profile_refresh_flow') as profile_refresh:
+            self.api.create_session(action="refresh_profile", profile_id="kids")
+
+        profile_refresh.assert_called_once_with("kids")
+
+    def test_profile_exchange_completes_before_invocation_ends(self, tmp_path):
+        self.api.profile_vault = ProfileVault(str(tmp_path / "profile_vault.json"))
+        self.api.profile_vault.store("kids", make_account("kids", 240), {"profile_id": "kids"}, time.time())
+
+        with patch.object(Cacheable, 'write_to_storage'), \
+             patch.object(self.api, '_adopt_stored_session', return_value=False), \
+             patch.object(self.api, '_handle_profile_refresh_flow') as profile_refresh:
+            self.api.create_session(action="refresh_profile", profile_id="kids")
+            # what main() does before cancelling the invocation
+            self.api.finish_token_refresh()
+
+        profile_refresh.assert_called_once_with("kids")
@@ -0,0 +1,98 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from resources.lib.api import API
+from resources.lib.deadline import ROUTE_LISTING, DeadlineExceeded, clear_deadline, start_deadline
+from resources.lib.model import AccountData
+from resources.lib.ratelimit import RateLimiter, TokenBucket, get_retry_after
+
+URL = "https://beta-api.crunchyroll.com/content/v2/discover/seasonal_tags"
+
+
+def _response(status: int, headers=None) -> Mock:
+    r = Mock()
+    r.status_code = status
+    r.ok = status < 400
+    r.content = b'{"data": []}'
+    r.text = r.content.decode()
+    r.headers = headers or {"Content-Type": "application/json"}
+    return r
+
+
+class TestTokenBucket:
+    """Unit Tests for the client side rate limits"""
+
+    def test_burst_then_queue_in_order(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+
+        with patch('resources.lib.ratelimit.time.monotonic', return_value=bucket.updated):
+            delays = [bucket.reserve() for _ in range(4)]
+
+        assert delays == pytest.approx([0, 0, 0.1, 0.2])
+        assert bucket.get_state()["queued"] == 2
+
+    def test_pause_spaces_waiting_requests(self):
+        bucket = TokenBucket(rate=10, capacity=5)
+
+        with patch('resources.lib.ratelimit.time.monotonic', return_value=bucket.updated):
+            bucket.pause(3)
+            assert [bucket.reserve() for _ in range(2)] == pytest.approx([3.1, 3.2])
+
+    def test_retry_after_formats(self):
+        assert get_retry_after(_response(429, {"Retry-After": "7"})) == 7
+        assert get_retry_after(_response(429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+        assert get_retry_after(_response(429, {"Retry-After": "3600"})) == 60
+        assert get_retry_after(_response(429, {"Retry-After": "soon"})) is None
+
+    def test_families(self):
+        limiter = RateLimiter(API.RATE_LIMITS)
+
+        assert limiter.get_family(URL) == "content"
+        assert limiter.get_family("https://www.crunchyroll.com/content/v2/abc/playheads") == "playheads"
+        assert limiter.get_family("https://beta-api.crunchyroll.com/cms/v2/US/M3/-/videos/X/streams") == "streams"
+        assert limiter.get_family("https://static.crunchyroll.com/skip-events/production/X.json") == "static"
+        assert limiter.get_family("https://www.crunchyroll.com/auth/v1/token") is None
+
+
+class TestThrottledRequests:
+    """Requests queue behind the rate limit and wait out Retry-After"""
+
+    def setup_method(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            self.api = API()
+            self.api.account_data = AccountData({
+                'access_token': 'test_access_token',
+                'token_type': 'Bearer',
+                'expires': '2099-1-1T0:0:0Z',
+                'cms': {'policy': 'p', 'signature': 's', 'key_pair_id': 'k'}
+            })
+
+    def teardown_method(self):
+        clear_deadline()
+
+    def test_429_is_retried_after_retry_after(self):
+        mock_http = Mock()
+        mock_http.request.side_effect = [_response(429, {"Retry-After": "2"}), _response(200)]
+
+        with patch.object(API, 'http', mock_http), \
+             patch('resources.lib.cancellation.CancellationToken.wait', return_value=False) as wait:
+            assert self.api.make_request("GET", URL) == {"data": []}
+
+        assert mock_http.request.call_count == 2
+        assert wait.call_args.args[0] == pytest.approx(2, abs=0.2)
+        assert self.api.rate_limiter.get_state()["content"]["throttled"] == 1
+        # throttling is no outage
+        assert self.api.host_health.get_stats("beta-api.crunchyroll.com")["error_rate"] == 0
+
+    def test_queue_beyond_budget_fails_fast(self):
+        self.api.rate_limiter.observe(URL, _response(429, {"Retry-After": "30"}))
+        start_deadline(ROUTE_LISTING, budget=5)
+
+        mock_http = Mock()
+        with patch.object(API, 'http', mock_http):
+            with pytest.raises(DeadlineExceeded):
+                self.api.make_request("GET", URL)
+
+        mock_http.request.assert_not_called()
@@ -0,0 +1,194 @@
+import asyncio
+from unittest.mock import Mock, patch
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+from resources.lib import resilience
+from resources.lib.api import API
+from resources.lib.model import AccountData, CrunchyrollError
+from resources.lib.resilience import CircuitOpenError, HostHealth
+
+HOST = "beta-api.crunchyroll.com"
+URL = "https://beta-api.crunchyroll.com/content/v2/discover/seasonal_tags"
+
+
+def _response(status: int) -> Mock:
+    r = Mock()
+    r.status_code = status
+    r.ok = status < 400
+    r.text = '{"data": []}'
+    r.content = r.text.encode()
+    r.headers = {"Content-Type": "application/json"}
+    return r
+
+
+class TestHostHealth:
+    """Unit Tests for per-host latency tracking and the circuit breaker"""
+
+    def test_timeout_adapts_to_p95_latency(self):
+        health = HostHealth()
+        assert health.get_timeout(HOST) == resilience.DEFAULT_TIMEOUT
+
+        for latency in [0.5] * 18 + [3.0, 4.0]:
+            health.record_success(HOST, latency)
+
+        assert health.get_stats(HOST)["p95"] == 3.0
+        assert health.get_timeout(HOST) == 9.0
+
+    def test_circuit_opens_after_repeated_failures_and_closes_on_success(self):
+        health = HostHealth()
+        for _ in range(resilience.FAILURE_THRESHOLD):
+            health.record_failure(HOST)
+
+        with pytest.raises(CircuitOpenError):
+            health.check(HOST)
+
+        with patch('resources.lib.resilience.time.time', return_value=1e12):
+            health.check(HOST)
+
+        health.record_success(HOST, 0.2)
+        health.check(HOST)
+        assert health.get_stats(HOST)["error_rate"] == 0.75
+
+    def test_state_is_persisted(self, tmp_path):
+        health = HostHealth(str(tmp_path / "host_health.json"))
+        health.record_success(HOST, 0.4)
+        health.save()
+
+        restored = HostHealth(str(tmp_path / "host_health.json"))
+        restored.load()
+        assert restored.get_stats(HOST)["requests"] == 1
+
+
+class TestRetries:
+    """Idempotent requests are retried, others are not"""
+
+    def setup_method(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            self.api = API()
+            self.api.account_data = AccountData({
+                'access_token': 'test_access_token',
+                'token_type': 'Bearer',
+                'expires': '2099-1-1T0:0:0Z',
+                'cms': {'policy': 'p', 'signature': 's', 'key_pair_id': 'k'}
+            })
+
+    def test_get_is_retried_on_server_error(self):
+        mock_http = Mock()
+        mock_http.request.side_effect = [_response(503), _response(200)]
+
+        with patch.object(API, 'http', mock_http), patch('resources.lib.api.get_retry_delay', return_value=0):
+            assert self.api.make_request("GET", URL) == {"data": []}
+
+        assert mock_http.request.call_count == 2
+        assert mock_http.request.call_args.kwargs["timeout"] == resilience.DEFAULT_TIMEOUT
+
+    def test_retries_of_one_request_do_not_open_the_circuit(self):
+        mock_http = Mock()
+        mock_http.request.return_value = _response(503)
+
+        with patch.object(API, 'http', mock_http), patch('resources.lib.api.get_retry_delay', return_value=0):
+            with pytest.raises(CrunchyrollError):
+                self.api.make_request("GET", URL)
+
+        assert mock_http.request.call_count == 1 + resilience.MAX_RETRIES
+        assert not self.api.host_health.get_stats(HOST)["circuit_open"]
+        assert self.api.host_health.get_stats(HOST)["error_rate"] == 1.0
+        self.api.host_health.check(HOST)
+
+    def test_post_is_not_retried(self):
+        mock_http = Mock()
+        mock_http.request.side_effect = requests.exceptions.ConnectionError("reset")
+
+        with patch.object(API, 'http', mock_http), patch('resources.lib.api.get_retry_delay', return_value=0):
+            with pytest.raises(requests.exceptions.ConnectionError):
+                self.api.make_request("POST", URL)
+
+        assert mock_http.request.call_count == 1
+
+    def test_open_circuit_fails_fast(self):
+        for _ in range(resilience.FAILURE_THRESHOLD):
+            self.api.host_health.record_failure(HOST)
+
+        mock_http = Mock()
+        with patch.object(API, 'http', mock_http):
+            with pytest.raises(CircuitOpenError):
+                self.api.make_request("GET", URL)
+
+        mock_http.request.assert_not_called()
+
+
+class TestHedging:
+    """Slow requests to endpoints served by both hosts are hedged"""
+
+    PLAYHEADS_URL = "https://www.crunchyroll.com/content/v2/account/playheads"
+
+    def setup_method(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            self.api = API()
+            self.api.account_data = AccountData({
+                'access_token': 'test_access_token',
+                'token_type': 'Bearer',
+                'expires': '2099-1-1T0:0:0Z',
+                'cms': {'policy': 'p', 'signature': 's', 'key_pair_id': 'k'}
+            })
+
+        for _ in range(resilience.MIN_SAMPLES):
+            self.api.host_health.record_success("www.crunchyroll.com", 0.05)
+
+        self.cancelled = []
+
+    def _client(self, latencies):
+        async def request(method, url, **kwargs):
+            try:
+                await asyncio.sleep(latencies[urlsplit(url).hostname])
+            except asyncio.CancelledError:
+                self.cancelled.append(url)
+                raise
+            r = _response(200)
+            r.text = '{"data": ["%s"]}' % urlsplit(url).hostname
+            r.content = r.text.encode()
+            return r
+
+        return Mock(request=request)
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        client = self._client({"www.crunchyroll.com": 2.0, "beta-api.crunchyroll.com": 0.01})
+
+        with patch.object(API, 'get_async_client', return_value=client):
+            result = asyncio.run(self.api.make_request_async("GET", self.PLAYHEADS_URL))
+
+        assert result == {"data": ["beta-api.crunchyroll.com"]}
+        assert self.cancelled == [self.PLAYHEADS_URL]
+        assert self.api.host_health.get_stats("www.crunchyroll.com")["hedge_win_rate"] == 1.0
+
+    def test_hedge_win_rate_is_logged_on_close(self):
+        client = self._client({"www.crunchyroll.com": 2.0, "beta-api.crunchyroll.com": 0.01})
+
+        with patch.object(API, 'get_async_client', return_value=client):
+            asyncio.run(self.api.make_request_async("GET", self.PLAYHEADS_URL))
+
+        with patch('resources.lib.api.utils.crunchy_log') as log:
+            self.api.close()
+
+        logged = " ".join(str(call.args[0]) for call in log.call_args_list)
+        assert "'hedge_win_rate': 1.0" in logged
+
+    def test_fast_primary_is_not_hedged(self):
+        client = self._client({"www.crunchyroll.com": 0.0, "beta-api.crunchyroll.com": 0.0})
+
+        with patch.object(API, 'get_async_client', return_value=client):
+            result = asyncio.run(self.api.make_request_async("GET", self.PLAYHEADS_URL))
+
+        assert result == {"data": ["www.crunchyroll.com"]}
+        assert self.api.host_health.get_stats("www.crunchyroll.com")["hedge_win_rate"] is None
+
+    def test_only_shared_endpoints_are_hedged(self):
+        assert self.api._get_hedge_url("GET", URL) is None
+        assert self.api._get_hedge_url("POST", self.PLAYHEADS_URL) is None
+        assert self.api._get_hedge_url("GET", self.PLAYHEADS_URL + "?content_ids=1") == \
+            "https://beta-api.crunchyroll.com/content/v2/account/playheads?content_ids=1"
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from resources.lib.cancellation import CancellationToken, RequestCancelled
+from resources.lib.deadline import ROUTE_PLAYBACK, clear_deadline, start_deadline
+from resources.lib.scheduler import (
+    PRIORITY_BACKGROUND, PRIORITY_ENRICHMENT, PRIORITY_INTERACTIVE, PRIORITY_PLAYBACK, RequestScheduler,
+    get_request_priority, request_priority
+)
+
+
+class TestRequestScheduler:
+    """Unit Tests for priority classes and bounded concurrency"""
+
+    def teardown_method(self):
+        clear_deadline()
+
+    def test_foreground_does_not_queue_behind_enrichment(self):
+        scheduler = RequestScheduler()
+        for _ in range(scheduler.limits[PRIORITY_ENRICHMENT]):
+            scheduler.acquire(PRIORITY_ENRICHMENT)
+        for _ in range(scheduler.limits[PRIORITY_BACKGROUND]):
+            scheduler.acquire(PRIORITY_BACKGROUND)
+
+        # the lower classes are at their limits, foreground requests still run right away
+        started = time.monotonic()
+        scheduler.acquire(PRIORITY_INTERACTIVE)
+        scheduler.acquire(PRIORITY_PLAYBACK)
+        assert time.monotonic() - started < 0.1
+
+        state = scheduler.get_state()
+        assert state["enrichment"]["in_flight"] == 4
+        assert state["interactive"]["waited"] == 0
+
+    def test_freed_slot_goes_to_highest_priority(self):
+        scheduler = RequestScheduler(max_concurrent=1)
+        scheduler.acquire(PRIORITY_BACKGROUND)
+        order = []
+
+        def run(priority):
+            with scheduler.slot(priority):
+                order.append(priority)
+
+        threads = [
+            threading.Thread(target=run, args=(priority,)) for priority in (PRIORITY_ENRICHMENT, PRIORITY_INTERACTIVE)
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+
+        scheduler.release(PRIORITY_BACKGROUND)
+        for thread in threads:
+            thread.join(1)
+
+        assert order == [PRIORITY_INTERACTIVE, PRIORITY_ENRICHMENT]
+
+    def test_async_waiter_is_woken_from_another_thread(self):
+        scheduler = RequestScheduler(max_concurrent=1)
+        scheduler.acquire(PRIORITY_INTERACTIVE)
+        threading.Timer(0.05, scheduler.release, args=(PRIORITY_INTERACTIVE,)).start()
+
+        async def request():
+            async with scheduler.async_slot(PRIORITY_ENRICHMENT):
+                return scheduler.get_state()["enrichment"]["in_flight"]
+
+        assert asyncio.run(request()) == 1
+        assert scheduler.get_state()["enrichment"]["in_flight"] == 0
+
+    def test_cancelled_waiter_gives_up_its_place(self, monkeypatch):
+        token = CancellationToken()
+        monkeypatch.setattr('resources.lib.scheduler.get_cancel_token', lambda: token)
+        scheduler = RequestScheduler(max_concurrent=1)
+        scheduler.acquire(PRIORITY_INTERACTIVE)
+        threading.Timer(0.05, token.cancel).start()
+
+        with pytest.raises(RequestCancelled):
+            scheduler.acquire(PRIORITY_BACKGROUND)
+
+        assert scheduler.get_state()["background"]["waiting"] == 0
+
+    def test_priority_by_context_and_route(self):
+        assert get_request_priority() == PRIORITY_INTERACTIVE
+
+        start_deadline(ROUTE_PLAYBACK)
+        assert get_request_priority() == PRIORITY_PLAYBACK
+
+        with request_priority(PRIORITY_ENRICHMENT):
+            assert get_request_priority() == PRIORITY_ENRICHMENT
+        assert get_request_priority() == PRIORITY_PLAYBACK
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from resources.lib.api import API
+from resources.lib.model import AccountData
+from resources.lib.singleflight import SingleFlight, make_request_key
+
+
+class TestSingleFlight:
+    """Unit Tests for coalescing identical in-flight requests"""
+
+    def test_concurrent_threads_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"data": [1]}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("key", fetch))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [{"data": [1]}] * 4
+        assert flight.in_flight() == 0
+
+    def test_exception_is_shared_and_key_released(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.1)
+            raise ValueError("boom")
+
+        async def run():
+            return await asyncio.gather(flight.do_async("key", fail), flight.do_async("key", fail),
+                                        return_exceptions=True)
+
+        results = asyncio.run(run())
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.do("key", lambda: "next") == "next"
+
+    def test_cancelled_leader_hands_over_to_waiter(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return {"data": [1]}
+
+        async def run():
+            leader = asyncio.ensure_future(asyncio.wait_for(flight.do_async("key", fetch), 0.02))
+            await asyncio.sleep(0.005)
+            waiter = asyncio.ensure_future(flight.do_async("key", fetch))
+
+            with pytest.raises(asyncio.TimeoutError):
+                await leader
+            return await waiter
+
+        assert asyncio.run(run()) == {"data": [1]}
+        # the waiter re-issued the call of the cancelled leader
+        assert len(calls) == 2
+        assert flight.in_flight() == 0
+
+    def test_request_key_ignores_param_order(self):
+        assert make_request_key("get", "url", {"a": 1, "b": 2}) == make_request_key("GET", "url", {"b": 2, "a": 1})
+        assert make_request_key("GET", "url", {"a": 1}) != make_request_key("GET", "url", {"a": 2})
+
+
+class TestApiCoalescing:
+    """Identical GET requests through the API share one network call"""
+
+    def setup_method(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            self.api = API()
+            self.api.account_data = AccountData({})
+
+    @pytest.mark.parametrize("method, expected_calls", [("GET", 1), ("POST", 3)])
+    def test_only_get_requests_are_coalesced(self, method, expected_calls):
+        calls = []
+
+        def slow_request(*args, **kwargs):
+            calls.append(args)
+            time.sleep(0.2)
+            return {"data": []}
+
+        with patch.object(self.api, '_make_request', side_effect=slow_request):
+            threads = [
+                threading.Thread(target=self.api.make_request, args=(method, "https://example.com/x"))
+                for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert len(calls) == expected_calls
@@ -0,0 +1,68 @@
+import time
+from unittest.mock import Mock, patch
+
+from resources.lib.tlssession import ResumingSSLContext, TLSSessionStore, create_ssl_context
+
+HOST = "beta-api.crunchyroll.com"
+
+
+def _session(has_ticket: bool = True, timeout: int = 7200) -> Mock:
+    return Mock(has_ticket=has_ticket, time=int(time.time()), timeout=timeout)
+
+
+def _connection(session: Mock, reused: bool = False) -> Mock:
+    connection = Mock(session=session, session_reused=reused)
+    connection.version.return_value = "TLSv1.3"
+    return connection
+
+
+class TestTLSSessionStore:
+    """Unit Tests for TLS session reuse and the persisted warm state"""
+
+    def test_session_of_earlier_connection_is_resumed(self):
+        store = TLSSessionStore()
+        assert store.get(HOST) is None
+
+        # TLS 1.3: the ticket arrives after the handshake, on the live connection
+        connection = _connection(_session(has_ticket=False))
+        store.record(HOST, connection, 0.12)
+        connection.session = _session()
+
+        assert store.get(HOST) is connection.session
+
+    def test_expired_session_is_dropped(self):
+        store = TLSSessionStore()
+        session = _session(timeout=10)
+        store.record(HOST, _connection(session))
+
+        with patch('resources.lib.tlssession.time.time', return_value=session.time + 60):
+            assert store.get(HOST) is None
+
+    def test_warm_state_is_persisted(self, tmp_path):
+        store = TLSSessionStore(str(tmp_path / "tls_warm_state.json"))
+        store.record(HOST, _connection(_session()), 0.1)
+        store.record(HOST, _connection(_session(), reused=True), 0.03)
+        store.save()
+
+        restored = TLSSessionStore(str(tmp_path / "tls_warm_state.json"))
+        restored.load()
+
+        stats = restored.get_stats(HOST)
+        assert stats["connections"] == 2
+        assert stats["resumed"] == 1
+        assert stats["full_ms"] == 100.0
+        assert stats["resumed_ms"] == 30.0
+        assert restored.get_warm_hosts() == [HOST]
+
+    def test_context_passes_stored_session_to_new_connections(self):
+        store = TLSSessionStore()
+        context = create_ssl_context(store)
+        assert isinstance(context, ResumingSSLContext)
+
+        session = _session()
+        store.record(HOST, _connection(session))
+
+        with patch('ssl.SSLContext.wrap_bio') as wrap_bio:
+            context.wrap_bio(Mock(), Mock(), server_hostname=HOST)
+
+        assert wrap_bio.call_args.args[-1] is session
@@ -0,0 +1,242 @@
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+import pytest
+from requests import Response
+
+from resources.lib import tokenrefresh
+from resources.lib.api import API, date_to_str, get_date
+from resources.lib.cancellation import CancellationToken
+from resources.lib.model import AccountData, LoginError
+from resources.lib.tokenrefresh import TokenRefresher
+
+
+class TestTokenRefresher:
+    """Unit Tests for renewing the access token ahead of its expiry"""
+
+    def test_refreshes_in_background_when_expiry_is_near(self):
+        lifetime = {"left": tokenrefresh.REFRESH_AHEAD - 10}
+        refreshed = threading.Event()
+
+        def refresh():
+            lifetime["left"] = 300
+            refreshed.set()
+
+        refresher = TokenRefresher(refresh, lambda: lifetime["left"])
+        refresher.schedule()
+
+        assert refreshed.wait(1)
+        refresher.stop(1)
+
+    def test_fresh_token_is_not_refreshed_yet(self):
+        refresh = Mock()
+        refresher = TokenRefresher(refresh, lambda: 300)
+        refresher.schedule()
+        time.sleep(0.05)
+        refresher.stop(1)
+
+        refresh.assert_not_called()
+
+    def test_forced_refresh_runs_with_fresh_token(self):
+        refresh = Mock()
+        refresher = TokenRefresher(refresh, lambda: 300)
+        refresher._start(force=True)
+        refresher.stop(1)
+
+        refresh.assert_called_once()
+
+    def test_stop_runs_pending_forced_refresh(self):
+        refresh = Mock()
+        refresher = TokenRefresher(refresh, lambda: 300)
+        refresher.schedule(60, force=True)
+        refresher.stop(1)
+
+        refresh.assert_called_once()
+
+    def test_failed_refresh_is_retried_while_token_is_valid(self):
+        refresher = TokenRefresher(Mock(side_effect=Exception("offline")), lambda: 100)
+
+        with patch.object(TokenRefresher, 'schedule', wraps=refresher.schedule) as schedule:
+            refresher._start()
+
+        schedule.assert_called_once_with(tokenrefresh.RETRY_INTERVAL)
+        refresher.stop(1)
+
+
+class TestRequestPath:
+    """Requests wait for a background refresh instead of starting their own"""
+
+    def test_expired_token_waits_for_background_refresh(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            api = API()
+            api.account_data = AccountData({
+                'access_token': 'old',
+                'refresh_token': 'refresh',
+                'expires': date_to_str(get_date() - timedelta(seconds=1)),
+            })
+
+        started = threading.Event()
+
+        def background_refresh():
+            started.set()
+            time.sleep(0.1)
+            api.account_data = AccountData({
+                'access_token': 'new',
+                'refresh_token': 'refresh',
+                'expires': date_to_str(get_date() + timedelta(seconds=300)),
+            })
+
+        api.token_refresher._refresh = background_refresh
+        thread = threading.Thread(target=api.token_refresher._start)
+        thread.start()
+        started.wait(1)
+
+        with patch.object(api, '_handle_refresh_flow') as foreground_refresh:
+            api._refresh_if_expired("test")
+
+        foreground_refresh.assert_not_called()
+        assert api.account_data.access_token == 'new'
+        api.token_refresher.stop(1)
+
+    def test_concurrent_requests_share_one_refresh(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            api = API()
+            api.account_data = AccountData({
+                'access_token': 'old',
+                'refresh_token': 'refresh',
+                'expires': date_to_str(get_date() - timedelta(seconds=1)),
+            })
+
+        def refresh():
+            # the refresh token rotates, a second refresh with 'refresh' would fail
+            assert api.account_data.refresh_token == 'refresh'
+            time.sleep(0.05)
+            api.account_data = AccountData({
+                'access_token': 'new',
+                'refresh_token': 'rotated',
+                'expires': date_to_str(get_date() + timedelta(seconds=300)),
+            })
+
+        with patch.object(api, '_handle_refresh_flow', side_effect=refresh) as handle_refresh:
+            threads = [
+                threading.Thread(target=api._refresh_if_expired, args=("test",)) for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(1)
+
+        handle_refresh.assert_called_once()
+        assert api.refresh_attempts == 1
+        assert api.account_data.access_token == 'new'
+
+    def test_background_refresh_skips_token_renewed_meanwhile(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}), \
+             patch('resources.lib.globals.G'):
+            api = API()
+            api.account_data = AccountData({
+                'access_token': 'new',
+                'refresh_token': 'rotated',
+                'expires': date_to_str(get_date() + timedelta(seconds=300)),
+            })
+
+        with patch.object(api, '_handle_refresh_flow') as handle_refresh:
+            api._refresh_ahead_of_expiry()
+
+        handle_refresh.assert_not_called()
+
+
+class TestTokenValidity:
+    """Unit Tests for the per-request token check"""
+
+    def _api(self, expires: str) -> API:
+        with patch('resources.lib.api.default_request_headers', return_value={}):
+            api = API()
+        api.account_data = AccountData({'access_token': 'token', 'expires': expires})
+        return api
+
+    def test_validity_with_buffer(self):
+        assert self._api(date_to_str(get_date() + timedelta(seconds=120))).is_token_valid()
+        assert not self._api(date_to_str(get_date() + timedelta(seconds=30))).is_token_valid()
+        assert not self._api("not a date").is_token_valid()
+
+    def test_expiry_is_parsed_once_and_follows_updates(self):
+        api = self._api(date_to_str(get_date() + timedelta(seconds=300)))
+        assert api.is_token_valid()
+
+        with patch('resources.lib.model.time.strptime') as strptime:
+            assert api.is_token_valid()
+        strptime.assert_not_called()
+
+        # expiring the token by hand, as done on a 401
+        api.account_data.expires = date_to_str(get_date() - timedelta(seconds=1))
+        assert not api.is_token_valid()
+        assert api.get_token_lifetime_left() < 0
+
+
+class TestRefreshAfterCancel:
+    """A refresh that spent the refresh token always stores the new one"""
+
+    TOKEN_RESPONSE = {
+        'access_token': 'new',
+        'refresh_token': 'rotated',
+        'token_type': 'Bearer',
+        'expires_in': 300,
+        'account_id': 'account',
+        'profile_id': 'profile',
+    }
+
+    def setup_method(self):
+        with patch('resources.lib.api.default_request_headers', return_value={}):
+            self.api = API()
+        self.api.account_data = AccountData({
+            'access_token': 'old',
+            'refresh_token': 'refresh',
+            'token_type': 'Bearer',
+            'expires': date_to_str(get_date() + timedelta(seconds=100)),
+        })
+        token_response = Mock(ok=True, status_code=200, headers={})
+        token_response.json.return_value = self.TOKEN_RESPONSE
+        self.scraper = Mock()
+        self.scraper.post.return_value = token_response
+        self.written = []
+
+    def _record_write(self, account_data):
+        self.written.append(account_data.refresh_token)
+        return True
+
+    def test_refresh_completes_after_invocation_was_cancelled(self, monkeypatch):
+        token = CancellationToken()
+        token.cancel("invocation ended")
+        monkeypatch.setattr('resources.lib.cancellation._token', token)
+
+        payload = Response()
+        payload.status_code = 200
+        payload._content = b'{}'
+        mock_http = Mock()
+        mock_http.send.return_value = payload
+
+        with patch.object(API, 'http', mock_http), \
+             patch.object(self.api, 'get_scraper', return_value=self.scraper), \
+             patch.object(AccountData, 'load_from_storage', return_value={}), \
+             patch.object(AccountData, 'write_to_storage', autospec=True, side_effect=self._record_write):
+            self.api._renew_session()
+
+        assert mock_http.send.call_count == 2
+        assert self.written[-1] == 'rotated'
+        assert self.api.account_data.refresh_token == 'rotated'
+
+    def test_new_token_is_stored_before_payloads_are_fetched(self):
+        with patch.object(self.api, 'get_scraper', return_value=self.scraper), \
+             patch.object(self.api, '_get_account_payloads', side_effect=Exception("offline")), \
+             patch.object(AccountData, 'load_from_storage', return_value={}), \
+             patch.object(AccountData, 'write_to_storage', autospec=True, side_effect=self._record_write):
+            with pytest.raises(LoginError):
+                self.api._renew_session()
+
+        assert self.written == ['rotated']
+        assert self.api.account_data.refresh_token == 'rotated'
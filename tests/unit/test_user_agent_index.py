@@ -0,0 +1,77 @@
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from resources.modules.cloudscraper import user_agent
+from resources.modules.cloudscraper.user_agent import User_Agent
+
+DEVICE_UA = "Crunchyroll/ANDROIDTV/3.65.0_22347 (Android 14; en-US; Chromecast)"
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    """ isolate the on-disk index and reset the in-memory caches """
+    paths = [str(tmp_path / "browsers.index.json")]
+
+    with patch.object(user_agent, '_indexPaths', return_value=paths), \
+         patch.object(user_agent, '_index', None), \
+         patch.object(user_agent, '_browsers', None), \
+         patch.object(user_agent, '_joinedAgents', None):
+        yield tmp_path
+
+
+class TestUserAgentIndex:
+
+    def test_custom_ua_resolution_is_persisted(self, index_dir):
+        User_Agent(browser={'custom': DEVICE_UA})
+
+        index = json.loads((index_dir / "browsers.index.json").read_text())
+        assert DEVICE_UA in index["custom"]
+        assert "user_agents" not in index
+
+    def test_persisted_index_skips_browsers_json(self, index_dir):
+        User_Agent(browser={'custom': DEVICE_UA})
+
+        # a fresh process: memory caches empty, but the index is on disk
+        with patch.object(user_agent, '_index', None), \
+             patch.object(user_agent, '_browsers', None), \
+             patch.object(user_agent, 'loadBrowsers', side_effect=AssertionError("browsers.json parsed")):
+            agent = User_Agent(browser={'custom': DEVICE_UA})
+
+        assert agent.headers['User-Agent'] == DEVICE_UA
+
+    def test_stale_index_is_rebuilt(self, index_dir):
+        (index_dir / "browsers.index.json").write_text(json.dumps({"source": [0, 0, 0], "custom": {}}))
+
+        index = user_agent.loadIndex()
+
+        assert index["source"] == user_agent._sourceSignature()
+        assert "chrome" in index["headers"]
+
+    def test_custom_match_matches_legacy_lookup(self, index_dir):
+        browsers = user_agent.loadBrowsers()
+        known = browsers['user_agents']['desktop']['windows']['firefox'][0]
+
+        agent = User_Agent(browser={'custom': known})
+
+        assert agent.headers['User-Agent'] == known
+        assert agent.cipherSuite == browsers['cipherSuite']['firefox']
+        # the shared index must not be mutated by the instance
+        assert user_agent.loadIndex()['headers']['firefox'].get('User-Agent') != known
+
+    def test_index_is_written_to_the_store_set(self, tmp_path):
+        writer = Mock()
+
+        with patch.object(user_agent, '_index', None), \
+             patch.object(user_agent, '_indexDir', None), \
+             patch.object(user_agent, '_indexWriter', None):
+            # without a store, the index is kept in memory only
+            assert user_agent._indexPaths() == []
+            User_Agent(browser={'custom': DEVICE_UA})
+
+            user_agent.setIndexStore(str(tmp_path), writer)
+            user_agent.resolveCustom(DEVICE_UA + " (other)")
+
+        writer.assert_called_once()
+        assert writer.call_args.args[0] == str(tmp_path / "cloudscraper.browsers.index.json")